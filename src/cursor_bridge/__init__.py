@@ -9,11 +9,24 @@ __author__ = "maricoxu"
 __email__ = "maricoxu@gmail.com"
 __license__ = "MIT"
 
-from .server import CursorBridgeServer
-from .config.models import ServerConfig, MCPConfig, SecurityConfig
-from .connection.manager import ConnectionManager
-from .session.manager import SessionManager
-from .executor.command import CommandExecutor
+# 按需导入：cursor_bridge.shim 只依赖标准库，导入包时不应加载服务端模块
+_LAZY_IMPORTS = {
+    "CursorBridgeServer": ".server",
+    "ServerConfig": ".config.models",
+    "MCPConfig": ".config.models",
+    "SecurityConfig": ".config.models",
+    "ConnectionManager": ".connection.manager",
+    "SessionManager": ".session.manager",
+    "CommandExecutor": ".executor.command",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        import importlib
+        module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     "CursorBridgeServer",
@@ -184,12 +184,21 @@ security:
 
 
 @cli.command()
+@click.option('--transport', type=click.Choice(['stdio', 'http']), default='stdio', help='传输方式')
+@click.option('--host', help='HTTP监听地址（默认使用mcp.server.host）')
+@click.option('--port', type=int, help='HTTP监听端口（默认使用mcp.server.port）')
 @click.pass_context
-def mcp(ctx):
+def mcp(ctx, transport: str, host: Optional[str], port: Optional[int]):
     """启动MCP服务器（用于Cursor集成）"""
     async def _mcp():
         config_path = ctx.obj.get('config')
         
+        if transport == 'http':
+            # 一个HTTP守护进程可以同时服务多个客户端，共享tmux会话和缓存
+            from .http_transport import run_http_server
+            await run_http_server(config_path, host=host, port=port)
+            return
+        
         # 导入MCP服务器
         from .mcp_server import run_stdio_server
         
@@ -207,6 +216,19 @@ def mcp(ctx):
     asyncio.run(_mcp())
 
 
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(), help='Unix socket路径（默认按配置文件计算）')
+@click.pass_context
+def daemon(ctx, socket_path: Optional[str]):
+    """启动MCP守护进程（由cursor-bridge-shim按需自动启动）"""
+    from .daemon import run_daemon
+    
+    try:
+        asyncio.run(run_daemon(ctx.obj.get('config'), socket_path))
+    except KeyboardInterrupt:
+        pass
+
+
 @cli.command()
 def version():
     """显示版本信息"""
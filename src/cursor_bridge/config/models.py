@@ -40,6 +40,12 @@ class TmuxConfig(BaseModel):
     """本地tmux会话配置"""
     session_name: str
     window_name: str = "main"
+    # 输出获取方式：capture 轮询 capture-pane；stream 通过 pipe-pane 增量解析原始输出
+    capture_method: str = "capture"
+    # 自动重连时在本机shell中依次执行的命令，为空时按 ssh/proxy 配置生成
+    connect_commands: List[str] = Field(default_factory=list)
+    # 远程主机名（hostname 的输出），为空时从第一次成功执行的命令中学习
+    expected_hostname: Optional[str] = None
 
 
 class ServerConfig(BaseModel):
@@ -49,6 +55,7 @@ class ServerConfig(BaseModel):
     ssh: Optional[SSHConfig] = None
     tmux: Optional[TmuxConfig] = None
     session: SessionConfig
+    tags: List[str] = Field(default_factory=list)
 
 
 class MCPConfig(BaseModel):
@@ -69,6 +76,7 @@ class SecurityConfig(BaseModel):
     max_concurrent_commands: int = 10
     allowed_paths: List[str] = Field(default_factory=list)
     blocked_paths: List[str] = Field(default_factory=list)
+    read_only_commands: List[str] = Field(default_factory=list)
 
 
 class MonitoringConfig(BaseModel):
@@ -84,6 +92,7 @@ class PerformanceConfig(BaseModel):
     session_pool: Dict[str, Any] = Field(default_factory=dict)
     command_execution: Dict[str, Any] = Field(default_factory=dict)
     caching: Dict[str, Any] = Field(default_factory=dict)
+    file_transfer: Dict[str, Any] = Field(default_factory=dict)
 
 
 class CursorBridgeConfig(BaseModel):
@@ -0,0 +1,191 @@
+"""
+MCP守护进程
+
+在Unix socket上长期运行的MCP服务，tmux会话、命令历史、结果缓存等状态
+在所有连接之间共享。每个Cursor窗口通过 cursor_bridge.shim 连接进来，
+消息格式与stdio模式相同：每行一个JSON-RPC消息。
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .mcp_server import MCPServer, SimpleMCPHandler, configure_server_logging
+from .shim import connect, default_socket_path
+from .utils import setup_logging, get_logger
+
+
+# 守护进程的日志文件
+DAEMON_LOG_FILE = "/tmp/cursor-bridge-daemon.log"
+
+# 单条消息的最大长度
+MAX_LINE_SIZE = 16 * 1024 * 1024
+
+
+class MCPDaemon:
+    """基于Unix socket的MCP守护进程"""
+
+    def __init__(self, mcp_server: MCPServer, socket_path: str):
+        """初始化守护进程
+
+        Args:
+            mcp_server: 所有连接共享的MCP服务器实例
+            socket_path: 监听的socket路径
+        """
+        self.mcp_server = mcp_server
+        self.socket_path = socket_path
+        self.logger = get_logger("mcp-daemon")
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lock_file = None
+        self.connections = 0
+        self.total_connections = 0
+
+    def acquire_lock(self) -> bool:
+        """获取守护进程锁，同一socket只允许一个守护进程
+
+        多个shim同时启动守护进程时，只有拿到锁的一个继续运行。
+        """
+        socket_dir = Path(self.socket_path).parent
+        socket_dir.mkdir(parents=True, exist_ok=True)
+        os.chmod(socket_dir, 0o700)
+
+        self._lock_file = open(f"{self.socket_path}.lock", "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+        return True
+
+    async def start(self) -> None:
+        """开始监听"""
+        # 持有锁时残留的socket文件一定来自已退出的进程
+        if os.path.exists(self.socket_path):
+            sock = connect(self.socket_path)
+            if sock is not None:
+                sock.close()
+                raise RuntimeError(f"守护进程已在运行: {self.socket_path}")
+            os.unlink(self.socket_path)
+
+        self._server = await asyncio.start_unix_server(
+            self._handle_connection, path=self.socket_path, limit=MAX_LINE_SIZE
+        )
+        os.chmod(self.socket_path, 0o600)
+        self.logger.info("守护进程已启动", socket_path=self.socket_path, pid=os.getpid())
+
+    async def serve_forever(self) -> None:
+        """运行直到被取消"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        """停止监听并清理socket文件"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """处理一个客户端连接"""
+        self.connections += 1
+        self.total_connections += 1
+        write_lock = asyncio.Lock()
+
+        async def write_message(message: Dict[str, Any]) -> None:
+            data = json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+            async with write_lock:
+                writer.write(data)
+                await writer.drain()
+
+        handler = SimpleMCPHandler(self.mcp_server, notify=write_message)
+        pending: set = set()
+        self.logger.info("客户端已连接", connections=self.connections)
+
+        async def process(request: Dict[str, Any]) -> None:
+            try:
+                response = await handler.handle_request(request)
+                if response is not None and "id" in request:
+                    await write_message(response)
+            except ConnectionError:
+                pass
+            except Exception as e:
+                self.logger.error("处理请求失败", error=str(e))
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    # 客户端关闭写端：等待已收到的请求处理完成
+                    if pending:
+                        await asyncio.gather(*pending, return_exceptions=True)
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    self.logger.error("JSON解析失败", error=str(e))
+                    continue
+
+                # 并发处理，使 notifications/cancelled 能够取消正在执行的请求
+                task = asyncio.create_task(process(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            self.logger.error("处理客户端连接失败", error=str(e))
+        finally:
+            # 连接断开后客户端不再需要这些结果，取消并中断远程命令
+            for task in list(pending):
+                task.cancel()
+            await handler.close()
+            self.connections -= 1
+            writer.close()
+            self.logger.info("客户端已断开", connections=self.connections)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取守护进程统计信息"""
+        return {
+            "socket_path": self.socket_path,
+            "pid": os.getpid(),
+            "connections": self.connections,
+            "total_connections": self.total_connections
+        }
+
+
+async def run_daemon(config_path: Optional[str] = None, socket_path: Optional[str] = None) -> None:
+    """运行MCP守护进程"""
+    setup_logging(level="INFO", log_file=DAEMON_LOG_FILE, console=False, async_logs=True)
+
+    socket_path = socket_path or default_socket_path(config_path)
+    mcp_server = MCPServer(config_path)
+    daemon = MCPDaemon(mcp_server, socket_path)
+    if not daemon.acquire_lock():
+        # 另一个守护进程已经在运行或正在启动
+        return
+
+    configure_server_logging(mcp_server.config, DAEMON_LOG_FILE, console=False)
+    await mcp_server.start()
+    try:
+        await daemon.serve_forever()
+    finally:
+        await daemon.stop()
+        await mcp_server.stop()
@@ -8,6 +8,13 @@ from .models import (
     ExecutionOptions, ExecutionContext, CommandExecution,
     OutputCallback, StatusCallback, ProgressCallback
 )
+from .cache import ResultCache
+from .file_cache import FileCache
+from .singleflight import SingleFlight
+from .jobs import Job, JobManager, OutputBuffer
+from .parsers import OutputParser, ParserRegistry, default_registry
+from .filters import OutputFilter
+from .delta import OutputHistory
 
 __all__ = [
     # 数据模型
@@ -18,6 +25,23 @@ __all__ = [
     "ExecutionContext",
     "CommandExecution",
     
+    # 结果缓存与请求合并
+    "ResultCache",
+    "FileCache",
+    "SingleFlight",
+    
+    # 后台任务
+    "Job",
+    "JobManager",
+    "OutputBuffer",
+    
+    # 命令输出解析
+    "OutputParser",
+    "ParserRegistry",
+    "default_registry",
+    "OutputFilter",
+    "OutputHistory",
+    
     # 回调类型
     "OutputCallback",
     "StatusCallback", 
@@ -0,0 +1,138 @@
+"""
+命令结果缓存
+
+缓存只读命令的执行结果，按 (服务器, 工作目录, 命令) 作为键，
+使用短TTL和按字节数限制的LRU淘汰策略。
+"""
+
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+CacheKey = Tuple[str, str, str]
+
+
+class ResultCache:
+    """只读命令结果缓存"""
+    
+    def __init__(self, ttl: float = 5.0, max_bytes: int = 4 * 1024 * 1024):
+        """初始化缓存
+        
+        Args:
+            ttl: 缓存条目有效期（秒）
+            max_bytes: 缓存输出总字节数上限
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # key -> (写入时间, 条目字节数, 结果)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._bytes = 0
+        
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def make_key(server: str, working_directory: Optional[str], command: str) -> CacheKey:
+        """生成缓存键"""
+        return (server, working_directory or "", command.strip())
+    
+    def get(self, key: CacheKey) -> Optional[Tuple[Dict[str, Any], float]]:
+        """查询缓存
+        
+        Args:
+            key: 缓存键
+            
+        Returns:
+            (结果副本, 缓存年龄秒数)，未命中或已过期时返回None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        stored_at, size, result = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl:
+            self._remove(key)
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(result), age
+    
+    def put(self, key: CacheKey, result: Dict[str, Any]) -> None:
+        """写入缓存，超过字节上限时淘汰最久未使用的条目
+        
+        Args:
+            key: 缓存键
+            result: 命令执行结果
+        """
+        size = self._result_size(result)
+        if size > self.max_bytes:
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        
+        self._entries[key] = (time.monotonic(), size, copy.deepcopy(result))
+        self._bytes += size
+        
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+    
+    def invalidate_server(self, server: str) -> int:
+        """使某台服务器的全部缓存失效
+        
+        Args:
+            server: 服务器名称
+            
+        Returns:
+            失效的条目数量
+        """
+        keys = [key for key in self._entries if key[0] == server]
+        for key in keys:
+            self._remove(key)
+        if keys:
+            self.invalidations += 1
+        return len(keys)
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+        self._bytes = 0
+    
+    def _remove(self, key: CacheKey) -> None:
+        """删除条目"""
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+    
+    @staticmethod
+    def _result_size(result: Dict[str, Any]) -> int:
+        """计算结果占用的字节数"""
+        return (
+            len(result.get("stdout", "").encode("utf-8"))
+            + len(result.get("stderr", "").encode("utf-8"))
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
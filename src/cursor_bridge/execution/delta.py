@@ -0,0 +1,147 @@
+"""
+命令输出增量返回
+
+按 (服务器, 工作目录, 命令) 保存上一次的输出。同一命令再次执行时只
+返回与上次输出的 unified diff 和新输出的哈希，输出没有变化时只返回
+"unchanged"；完整输出仍可按哈希取回。适合轮询类的工作方式（反复执行
+git status、kubectl get pods、测试），减少返回的内容。
+"""
+
+import difflib
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+HistoryKey = Tuple[str, str, str]
+
+
+@dataclass
+class StoredOutput:
+    """保存的一次命令输出"""
+    text: str
+    sha256: str
+    size: int
+
+
+class OutputHistory:
+    """命令上一次输出的缓存"""
+
+    def __init__(
+        self,
+        max_bytes: int = 8 * 1024 * 1024,
+        context_lines: int = 3,
+        max_diff_bytes: int = 1024 * 1024
+    ):
+        """初始化缓存
+
+        Args:
+            max_bytes: 保存的输出总字节数上限，超过后按LRU淘汰
+            context_lines: diff 中变化行前后的上下文行数
+            max_diff_bytes: 新旧输出任一超过该大小时不计算 diff，返回完整输出
+        """
+        self.max_bytes = max_bytes
+        self.context_lines = context_lines
+        self.max_diff_bytes = max_diff_bytes
+        self._entries: "OrderedDict[HistoryKey, StoredOutput]" = OrderedDict()
+        self._bytes = 0
+
+        # 统计信息
+        self.unchanged = 0
+        self.diffs = 0
+        self.full = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def make_key(server: str, working_directory: Optional[str], command: str) -> HistoryKey:
+        """生成缓存键"""
+        return (server, working_directory or "", command.strip())
+
+    def record(self, key: HistoryKey, output: str) -> Dict[str, Any]:
+        """保存本次输出并与上一次比较
+
+        Args:
+            key: 缓存键
+            output: 本次的完整输出
+
+        Returns:
+            status 为 full（没有上一次输出或 diff 不比完整输出小）、diff 或
+            unchanged；hash 为本次输出的哈希，base_hash 为上一次输出的哈希，
+            status 为 diff 时 diff 中是 unified diff；stored 表示本次输出是否
+            已保存（超过字节上限时不保存，不能按哈希取回）
+        """
+        sha256 = hashlib.sha256(output.encode("utf-8")).hexdigest()
+        previous = self._entries.get(key)
+        stored = self._store(key, output, sha256)
+
+        if previous is None:
+            self.full += 1
+            return {"status": "full", "hash": sha256, "stored": stored}
+        delta: Dict[str, Any] = {"hash": sha256, "base_hash": previous.sha256, "stored": stored}
+        size = len(output.encode("utf-8"))
+        if previous.sha256 == sha256:
+            self.unchanged += 1
+            self.bytes_saved += size
+            return {**delta, "status": "unchanged"}
+
+        if previous.size <= self.max_diff_bytes and size <= self.max_diff_bytes:
+            diff = "\n".join(difflib.unified_diff(
+                previous.text.split("\n"), output.split("\n"),
+                fromfile=previous.sha256[:12], tofile=sha256[:12],
+                n=self.context_lines, lineterm=""
+            ))
+            diff_size = len(diff.encode("utf-8"))
+            if diff_size < size:
+                self.diffs += 1
+                self.bytes_saved += size - diff_size
+                return {**delta, "status": "diff", "diff": diff}
+        self.full += 1
+        return {**delta, "status": "full"}
+
+    def get(self, sha256: str) -> Optional[str]:
+        """按哈希取回保存的完整输出"""
+        for entry in self._entries.values():
+            if entry.sha256 == sha256:
+                return entry.text
+        return None
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def _store(self, key: HistoryKey, output: str, sha256: str) -> bool:
+        """保存输出，超过字节上限时淘汰最久未使用的条目
+
+        Returns:
+            是否已保存，输出本身超过字节上限时不保存
+        """
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        size = len(output.encode("utf-8"))
+        if size > self.max_bytes:
+            return False
+
+        self._entries[key] = StoredOutput(output, sha256, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, oldest = self._entries.popitem(last=False)
+            self._bytes -= oldest.size
+            self.evictions += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "unchanged": self.unchanged,
+            "diffs": self.diffs,
+            "full": self.full,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved
+        }
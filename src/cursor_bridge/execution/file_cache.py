@@ -0,0 +1,265 @@
+"""
+远程文件内容缓存
+
+缓存 read_file 读到的完整文件内容，按 (服务器, 绝对路径) 作为键。使用前
+向远程发送一次批量 stat 核对大小、修改时间和inode，一致时直接使用本地
+内容；不一致但大小相同时比较远程计算的 sha256，内容没变（touch、git
+checkout 等）仍然命中。总字节数有上限，超过后按LRU淘汰；可选持久化到
+本地目录，重启后继续使用。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+FileKey = Tuple[str, str]
+
+# (大小, 修改时间秒数, inode)
+FileStat = Tuple[int, int, int]
+
+# 持久化格式版本，格式不兼容时忽略旧文件
+CACHE_VERSION = 1
+
+
+@dataclass
+class CachedFile:
+    """缓存的文件内容"""
+    data: bytes
+    sha256: str
+    # 可信的远程元数据；修改时间距缓存时太近（同一秒内的修改无法从
+    # 修改时间上区分）或远程没有 stat 时为None，只能按内容哈希核对
+    stat: Optional[FileStat] = None
+
+
+class FileCache:
+    """远程文件内容缓存"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, persist_dir: Optional[str] = None):
+        """初始化缓存
+
+        Args:
+            max_bytes: 缓存内容总字节数上限
+            persist_dir: 持久化目录，None表示只保存在内存中
+        """
+        self.max_bytes = max_bytes
+        self.persist_dir = os.path.expanduser(persist_dir) if persist_dir else None
+        self._entries: "OrderedDict[FileKey, CachedFile]" = OrderedDict()
+        self._bytes = 0
+
+        # 统计信息
+        self.hits = 0
+        self.hash_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def make_key(server: str, path: str) -> FileKey:
+        """生成缓存键，path 为远程绝对路径"""
+        return (server, path)
+
+    @staticmethod
+    def trusted_stat(stat: Optional[FileStat], remote_time: Optional[int]) -> Optional[FileStat]:
+        """判断远程元数据能否用于核对
+
+        修改时间只精确到秒，文件在读取的同一秒内再次修改时修改时间可能
+        不变；修改时间早于远程当前时间超过一秒的元数据才可信。
+        """
+        if stat is None or remote_time is None or stat[1] >= remote_time - 1:
+            return None
+        return stat
+
+    def get(self, key: FileKey) -> Optional[CachedFile]:
+        """查询缓存，返回的条目还需要用 validate 核对"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+        return entry
+
+    def put(self, key: FileKey, data: bytes, stat: Optional[FileStat] = None) -> None:
+        """写入缓存，超过字节上限时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            data: 完整的文件内容
+            stat: 可信的远程元数据
+        """
+        self.invalidate(key)
+        if len(data) > self.max_bytes:
+            return
+
+        self._entries[key] = CachedFile(data, hashlib.sha256(data).hexdigest(), stat)
+        self._bytes += len(data)
+
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self.invalidate(oldest)
+            self.evictions += 1
+
+    def validate(
+        self,
+        key: FileKey,
+        stat: Optional[FileStat],
+        sha256: Optional[str],
+        remote_time: Optional[int]
+    ) -> Optional[CachedFile]:
+        """用远程核对结果验证缓存条目
+
+        Args:
+            key: 缓存键
+            stat: 远程当前的元数据，文件不存在时为None
+            sha256: 元数据不一致时远程计算的内容哈希
+            remote_time: 核对时的远程时间
+
+        Returns:
+            仍然有效的缓存条目，失效时删除条目并返回None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.stat is not None and stat == entry.stat:
+            self.hits += 1
+        elif sha256 and sha256 == entry.sha256:
+            # 元数据变了但内容没变，更新元数据
+            entry.stat = self.trusted_stat(stat, remote_time)
+            self.hash_hits += 1
+        else:
+            self.invalidate(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.bytes_saved += len(entry.data)
+        return entry
+
+    def invalidate(self, key: FileKey) -> bool:
+        """删除条目
+
+        Returns:
+            条目是否存在
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry.data)
+        return True
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def load(self) -> int:
+        """从持久化目录读取缓存
+
+        内容按sha256存放，读取时重新计算哈希，损坏的条目直接丢弃。
+
+        Returns:
+            读取的条目数量
+        """
+        if not self.persist_dir:
+            return 0
+        index_path = os.path.join(self.persist_dir, "index.json")
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取文件缓存索引失败，忽略: {index_path}, {e}")
+            return 0
+        if not isinstance(index, dict) or index.get("version") != CACHE_VERSION:
+            logger.warning(f"文件缓存版本不匹配，忽略: {index_path}")
+            return 0
+
+        loaded = 0
+        for item in index.get("entries", []):
+            try:
+                with open(os.path.join(self.persist_dir, "blobs", item["sha256"]), "rb") as f:
+                    data = f.read()
+            except (OSError, KeyError, TypeError):
+                continue
+            if hashlib.sha256(data).hexdigest() != item["sha256"]:
+                continue
+            stat = tuple(item["stat"]) if item.get("stat") else None
+            self.put((item["server"], item["path"]), data, stat)
+            loaded += 1
+        logger.info(f"读取文件缓存: {loaded} 个文件, {self._bytes} 字节")
+        return loaded
+
+    def save(self) -> bool:
+        """把缓存写入持久化目录
+
+        先写内容再原子替换索引，删除不再引用的内容文件。
+
+        Returns:
+            是否写入成功
+        """
+        if not self.persist_dir:
+            return False
+        blob_dir = os.path.join(self.persist_dir, "blobs")
+        try:
+            os.makedirs(blob_dir, mode=0o700, exist_ok=True)
+            for entry in self._entries.values():
+                blob_path = os.path.join(blob_dir, entry.sha256)
+                if not os.path.exists(blob_path):
+                    self._write_atomic(blob_path, entry.data)
+
+            index = {
+                "version": CACHE_VERSION,
+                # 按LRU顺序保存，读取时依次写入，顺序保持不变
+                "entries": [
+                    {"server": key[0], "path": key[1], "sha256": entry.sha256, "stat": entry.stat}
+                    for key, entry in self._entries.items()
+                ]
+            }
+            self._write_atomic(
+                os.path.join(self.persist_dir, "index.json"),
+                json.dumps(index, ensure_ascii=False).encode("utf-8")
+            )
+
+            referenced = {entry.sha256 for entry in self._entries.values()}
+            for name in os.listdir(blob_dir):
+                if name not in referenced:
+                    os.unlink(os.path.join(blob_dir, name))
+        except OSError as e:
+            logger.error(f"写入文件缓存失败: {self.persist_dir}, {e}")
+            return False
+        return True
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        """先写临时文件再原子替换"""
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.hits + self.hash_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "hash_hits": self.hash_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.hash_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved,
+            "persistent": self.persist_dir is not None
+        }
@@ -0,0 +1,162 @@
+"""
+命令输出过滤
+
+在输出流上逐行过滤：按正则保留或排除行，合并连续重复（或只有数字
+不同）的行，只保留开头和结尾若干行，限制总字节数。过滤在输出到达时
+进行，保留的内容只有过滤后的部分，内存占用与过滤后的大小成正比。
+"""
+
+import re
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+# 比较行是否"几乎相同"时忽略的部分：数字（进度、计数、时间戳）
+_VOLATILE = re.compile(r"\d+(?:[.:]\d+)*")
+
+
+class OutputFilter:
+    """逐行输出过滤器"""
+
+    def __init__(
+        self,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        head: Optional[int] = None,
+        tail: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        dedupe: bool = False
+    ):
+        """初始化过滤器
+
+        Args:
+            include: 保留匹配任一正则的行，为空表示全部保留
+            exclude: 排除匹配任一正则的行
+            head: 只保留开头的行数
+            tail: 只保留结尾的行数（与 head 同时指定时保留首尾两段）
+            max_bytes: 返回内容的最大字节数
+            dedupe: 是否合并连续重复或只有数字不同的行
+
+        Raises:
+            re.error: 正则表达式无效
+        """
+        self.include = [re.compile(pattern) for pattern in include or []]
+        self.exclude = [re.compile(pattern) for pattern in exclude or []]
+        self.head = head
+        self.tail = tail
+        self.max_bytes = max_bytes
+        self.dedupe = dedupe
+
+        self._partial = ""
+        self._head: List[str] = []
+        self._tail: Deque[str] = deque()
+        self._bytes = 0
+        self._tail_bytes = 0
+        # 合并重复行：(比较键, 最近的一行, 重复次数)
+        self._run: Optional[Tuple[str, str, int]] = None
+
+        # 统计信息
+        self.lines_in = 0
+        self.lines_matched = 0
+        self.lines_collapsed = 0
+        self.lines_omitted = 0
+        self.bytes_in = 0
+
+    @property
+    def active(self) -> bool:
+        """是否设置了任何过滤条件"""
+        return bool(
+            self.include or self.exclude or self.dedupe
+            or self.head is not None or self.tail is not None or self.max_bytes is not None
+        )
+
+    def feed(self, text: str) -> None:
+        """输入一段输出，不完整的最后一行等下一段到达后再处理"""
+        self.bytes_in += len(text.encode("utf-8"))
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line.rstrip("\r"))
+
+    def finish(self) -> str:
+        """处理剩余的输出并返回过滤结果"""
+        if self._partial:
+            self._line(self._partial.rstrip("\r"))
+            self._partial = ""
+        self._flush_run()
+
+        lines = list(self._head)
+        if self.lines_omitted and self.head is not None and self.tail is not None:
+            lines.append(f"... 省略 {self.lines_omitted} 行 ...")
+        lines.extend(self._tail)
+        return "\n".join(lines)
+
+    def _line(self, line: str) -> None:
+        """过滤一行"""
+        self.lines_in += 1
+        if self.include and not any(pattern.search(line) for pattern in self.include):
+            return
+        if any(pattern.search(line) for pattern in self.exclude):
+            return
+        self.lines_matched += 1
+
+        if not self.dedupe:
+            self._emit(line)
+            return
+        key = _VOLATILE.sub("#", line)
+        if self._run is not None and self._run[0] == key:
+            # 保留最近的一行，进度类输出最后一行最有用
+            self._run = (key, line, self._run[2] + 1)
+            self.lines_collapsed += 1
+            return
+        self._flush_run()
+        self._run = (key, line, 1)
+
+    def _flush_run(self) -> None:
+        """输出合并后的重复行"""
+        if self._run is None:
+            return
+        _, line, count = self._run
+        self._run = None
+        self._emit(f"{line} [x{count}]" if count > 1 else line)
+
+    def _emit(self, line: str) -> None:
+        """把通过过滤的行放入开头或结尾段"""
+        size = len(line.encode("utf-8")) + 1
+        if self.head is not None and len(self._head) < self.head:
+            if not self.lines_omitted and self._fits(self._bytes + size):
+                self._head.append(line)
+                self._bytes += size
+            else:
+                self.lines_omitted += 1
+            return
+        if self.tail is not None:
+            # tail=0 时追加后立即移出，所有结尾的行都计为省略
+            self._tail.append(line)
+            self._tail_bytes += size
+            while len(self._tail) > self.tail or (
+                self._tail and not self._fits(self._bytes + self._tail_bytes)
+            ):
+                self._tail_bytes -= len(self._tail.popleft().encode("utf-8")) + 1
+                self.lines_omitted += 1
+            return
+        if self.head is None and not self.lines_omitted and self._fits(self._bytes + size):
+            self._head.append(line)
+            self._bytes += size
+            return
+        self.lines_omitted += 1
+
+    def _fits(self, size: int) -> bool:
+        """是否不超过字节上限"""
+        return self.max_bytes is None or size <= self.max_bytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取过滤统计信息"""
+        return {
+            "lines_in": self.lines_in,
+            "lines_matched": self.lines_matched,
+            "lines_collapsed": self.lines_collapsed,
+            "lines_omitted": self.lines_omitted,
+            "bytes_in": self.bytes_in,
+            "truncated": self.lines_omitted > 0
+        }
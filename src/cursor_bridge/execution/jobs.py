@@ -0,0 +1,299 @@
+"""
+后台任务
+
+长时间运行的命令（构建、测试、数据处理）作为后台任务启动：调用方立即拿到
+任务ID，之后按偏移量增量读取输出、等待结束或取消。任务的输出写入有界缓冲区，
+超过上限时丢弃最早的部分，读取只返回偏移量之后的新内容。
+"""
+
+import asyncio
+import bisect
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import logging
+
+from .models import CommandExecution, ExecutionContext, ExecutionOptions, ExecutionStatus
+
+logger = logging.getLogger(__name__)
+
+
+class OutputBuffer:
+    """按绝对偏移量寻址的有界输出缓冲区
+
+    偏移量按字符计算，从任务开始时的0一直递增；超过 max_size 后丢弃最早
+    的数据块，start 随之前移，已发出的偏移量仍然有效。
+    """
+
+    def __init__(self, max_size: int = 1024 * 1024):
+        """初始化缓冲区
+
+        Args:
+            max_size: 保留的最大字符数
+        """
+        self.max_size = max_size
+        self._chunks: List[str] = []
+        self._offsets: List[int] = []
+        self._start = 0
+        self._end = 0
+
+    @property
+    def start(self) -> int:
+        """最早仍可读取的偏移量"""
+        return self._start
+
+    @property
+    def end(self) -> int:
+        """已写入的总字符数"""
+        return self._end
+
+    def append(self, text: str) -> None:
+        """追加输出"""
+        if not text:
+            return
+        self._chunks.append(text)
+        self._offsets.append(self._end)
+        self._end += len(text)
+
+        # 整块丢弃最早的数据，只有单块超过上限时才截断块内容
+        while self._end - self._offsets[0] > self.max_size:
+            if len(self._chunks) == 1:
+                excess = self._end - self._offsets[0] - self.max_size
+                self._chunks[0] = self._chunks[0][excess:]
+                self._offsets[0] += excess
+                break
+            self._chunks.pop(0)
+            self._offsets.pop(0)
+        self._start = self._offsets[0]
+
+    def read(self, offset: int = 0, limit: Optional[int] = None) -> Tuple[str, int, bool]:
+        """从偏移量开始读取
+
+        Args:
+            offset: 起始偏移量
+            limit: 最多读取的字符数，None表示读到末尾
+
+        Returns:
+            (输出, 下一次读取的偏移量, offset之前的部分输出是否已被丢弃)
+        """
+        dropped = offset < self._start
+        offset = min(max(offset, self._start), self._end)
+        stop = self._end if limit is None else min(self._end, offset + limit)
+        if offset >= stop:
+            return "", offset, dropped
+
+        parts = []
+        index = bisect.bisect_right(self._offsets, offset) - 1
+        while index < len(self._chunks) and self._offsets[index] < stop:
+            chunk_start = self._offsets[index]
+            chunk = self._chunks[index]
+            parts.append(chunk[max(0, offset - chunk_start):stop - chunk_start])
+            index += 1
+        return "".join(parts), stop, dropped
+
+
+class Job:
+    """一个后台任务"""
+
+    def __init__(self, execution: CommandExecution, server: str, max_output_size: int):
+        """初始化任务
+
+        Args:
+            execution: 命令执行记录
+            server: 服务器名称
+            max_output_size: 输出缓冲区保留的最大字符数
+        """
+        self.execution = execution
+        self.server = server
+        self.output = OutputBuffer(max_output_size)
+        # 执行任务的面板（托管会话名），开始执行后设置
+        self.pane: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.task: Optional[asyncio.Task] = None
+        self._done = asyncio.Event()
+
+    @property
+    def job_id(self) -> str:
+        """任务ID"""
+        return self.execution.context.execution_id
+
+    @property
+    def done(self) -> bool:
+        """任务是否已结束"""
+        return self._done.is_set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        execution = self.execution
+        started_at = execution.started_at
+        end_time = execution.completed_at or time.time()
+        return {
+            "job_id": self.job_id,
+            "server": self.server,
+            "command": execution.command,
+            "status": execution.status.value,
+            "exit_code": execution.exit_code,
+            "stderr": execution.stderr,
+            "error_message": execution.error_message,
+            "created_at": execution.context.created_at,
+            "started_at": started_at,
+            "completed_at": execution.completed_at,
+            "elapsed": end_time - started_at if started_at else 0.0,
+            "working_directory": execution.options.working_directory,
+            "pane": self.pane,
+            "output_start": self.output.start,
+            "output_size": self.output.end
+        }
+
+
+# 任务执行函数：在面板中执行任务并把输出写入 job.output，返回执行结果
+JobRunner = Callable[[Job], Awaitable[Dict[str, Any]]]
+
+
+class JobManager:
+    """后台任务表
+
+    以 CommandExecution 记录每个任务的状态；已结束的任务最多保留
+    max_finished 个，超过后丢弃最早结束的任务。
+    """
+
+    def __init__(self, max_output_size: int = 1024 * 1024, max_finished: int = 50):
+        """初始化任务表
+
+        Args:
+            max_output_size: 每个任务输出缓冲区保留的最大字符数
+            max_finished: 保留的已结束任务数
+        """
+        self.max_output_size = max_output_size
+        self.max_finished = max_finished
+        self._jobs: Dict[str, Job] = {}
+
+        # 统计信息
+        self.started = 0
+        self.cancelled = 0
+
+    def submit(
+        self,
+        command: str,
+        server: str,
+        runner: JobRunner,
+        options: Optional[ExecutionOptions] = None
+    ) -> Job:
+        """创建任务并在后台开始执行
+
+        Args:
+            command: 要执行的命令
+            server: 服务器名称
+            runner: 任务执行函数
+            options: 执行选项（超时、工作目录）
+
+        Returns:
+            新创建的任务
+        """
+        execution = CommandExecution(
+            context=ExecutionContext(execution_id=uuid.uuid4().hex[:12], session_name=server),
+            command=command,
+            options=options or ExecutionOptions()
+        )
+        job = Job(execution, server, self.max_output_size)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job, runner))
+        self.started += 1
+        self._prune()
+        logger.info(f"启动后台任务: {job.job_id} on {server}: {command}")
+        return job
+
+    async def _run(self, job: Job, runner: JobRunner) -> None:
+        """执行任务并记录结果"""
+        execution = job.execution
+        execution.status = ExecutionStatus.RUNNING
+        execution.started_at = time.time()
+        try:
+            result = await runner(job)
+            job.result = result
+            execution.exit_code = result.get("exit_code")
+            execution.stderr = result.get("stderr", "")
+            if "status" in result:
+                execution.status = ExecutionStatus(result["status"])
+            elif execution.exit_code == 0:
+                execution.status = ExecutionStatus.COMPLETED
+            else:
+                execution.status = ExecutionStatus.FAILED
+        except asyncio.CancelledError:
+            execution.status = ExecutionStatus.CANCELLED
+            execution.error_message = "任务已取消"
+        except Exception as e:
+            logger.error(f"后台任务执行异常: {job.job_id}, {e}")
+            execution.status = ExecutionStatus.FAILED
+            execution.error_message = str(e)
+        finally:
+            execution.completed_at = time.time()
+            job._done.set()
+            logger.info(f"后台任务结束: {job.job_id}, 状态 {execution.status.value}")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """获取任务"""
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, server: Optional[str] = None) -> List[Dict[str, Any]]:
+        """列出任务，可按服务器过滤"""
+        return [
+            job.to_dict() for job in self._jobs.values()
+            if server is None or job.server == server
+        ]
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """等待任务结束，超时后返回仍在运行的任务
+
+        Returns:
+            任务，不存在时返回None
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        try:
+            await asyncio.wait_for(job._done.wait(), timeout=max(0.0, timeout))
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """取消任务并等待面板上的命令被中断
+
+        Returns:
+            任务，不存在时返回None
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if not job.done and job.task is not None:
+            job.task.cancel()
+            await asyncio.wait({job.task})
+            self.cancelled += 1
+        return job
+
+    async def cancel_all(self) -> None:
+        """取消所有正在运行的任务"""
+        for job_id, job in list(self._jobs.items()):
+            if not job.done:
+                await self.cancel(job_id)
+
+    def _prune(self) -> None:
+        """丢弃超出保留数量的已结束任务"""
+        finished = [job for job in self._jobs.values() if job.done]
+        excess = len(finished) - self.max_finished
+        if excess <= 0:
+            return
+        finished.sort(key=lambda job: job.execution.completed_at or 0)
+        for job in finished[:excess]:
+            del self._jobs[job.job_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取任务统计信息"""
+        running = sum(1 for job in self._jobs.values() if not job.done)
+        return {
+            "running": running,
+            "finished": len(self._jobs) - running,
+            "started": self.started,
+            "cancelled": self.cancelled
+        }
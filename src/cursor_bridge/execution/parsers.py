@@ -0,0 +1,298 @@
+"""
+命令输出解析
+
+把常见命令（ls -l、ps、df、free、git status、nvidia-smi）的文本输出
+解析为紧凑的JSON结构，逐行一遍处理。能使用命令自带的机器可读参数时
+（df -P、git status --porcelain、nvidia-smi --format=csv）先改写命令，
+解析更可靠，输出也更小。
+"""
+
+import csv
+import re
+import shlex
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# 含管道、重定向、命令组合或替换的命令不解析
+_SHELL_SYNTAX = re.compile(r"[|;&<>`]|\$\(")
+
+# ls -l 的文件类型
+_LS_TYPES = {"-": "file", "d": "dir", "l": "link", "c": "char", "b": "block", "p": "fifo", "s": "socket"}
+
+# ls -l 的时间：默认格式（Jan  2 10:00 / Jan  2  2024）或 long-iso / full-iso
+_LS_TIME = r"(?:\w{3}\s+\d{1,2}\s+(?:\d{1,2}:\d{2}|\d{4})|\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}(?::\S+)?(?:\s+[+-]\d{4})?)"
+_LS_LINE = re.compile(
+    r"^(?P<mode>[-dlcbps][-rwxsStTl.+@]{9,})\s+(?P<links>\d+)\s+(?P<owner>\S+)\s+(?P<group>\S+)\s+"
+    r"(?P<size>\d+,\s*\d+|\S+)\s+(?P<modified>" + _LS_TIME + r")\s(?P<name>.+)$"
+)
+
+# git status --porcelain -b 的分支行
+_GIT_BRANCH = re.compile(
+    r"^## (?:No commits yet on |Initial commit on )?(?P<branch>.+?)(?:\.\.\.(?P<upstream>\S+))?"
+    r"(?: \[(?P<tracking>[^\]]*)\])?$"
+)
+
+# nvidia-smi 不带参数时改写为的查询
+NVIDIA_SMI_QUERY = "index,name,utilization.gpu,memory.used,memory.total,temperature.gpu,power.draw"
+
+
+def _number(value: str) -> Any:
+    """能转换为数字的字段转换为数字"""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_ls(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """解析 ls -l 的输出"""
+    entries = []
+    for line in lines:
+        match = _LS_LINE.match(line)
+        if match is None:
+            # total 行、多个目录时的目录标题行
+            continue
+        name = match.group("name")
+        entry: Dict[str, Any] = {
+            "name": name,
+            "type": _LS_TYPES.get(match.group("mode")[0], "other"),
+            "mode": match.group("mode"),
+            "links": int(match.group("links")),
+            "owner": match.group("owner"),
+            "group": match.group("group"),
+            "size": _number(match.group("size")),
+            "modified": re.sub(r"\s+", " ", match.group("modified"))
+        }
+        if entry["type"] == "link" and " -> " in name:
+            entry["name"], entry["target"] = name.split(" -> ", 1)
+        entries.append(entry)
+    return entries
+
+
+def parse_table(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """解析表头加空白分隔列的输出（ps 等），最后一列包含剩余的全部内容"""
+    rows = []
+    header: Optional[List[str]] = None
+    for line in lines:
+        if not line.strip():
+            continue
+        if header is None:
+            header = [name.lower() for name in line.split()]
+            continue
+        values = line.split(None, len(header) - 1)
+        if len(values) != len(header):
+            continue
+        rows.append({name: _number(value) for name, value in zip(header, values)})
+    return rows
+
+
+def parse_df(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """解析 df -P 的输出"""
+    rows = []
+    for index, line in enumerate(lines):
+        values = line.split(None, 5)
+        if index == 0 or len(values) != 6:
+            continue
+        filesystem, size, used, available, capacity, mounted_on = values
+        rows.append({
+            "filesystem": filesystem,
+            "size": _number(size),
+            "used": _number(used),
+            "available": _number(available),
+            "use_percent": _number(capacity.rstrip("%")),
+            "mounted_on": mounted_on
+        })
+    return rows
+
+
+def parse_free(lines: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """解析 free 的输出，按行名（mem、swap）分组"""
+    result: Dict[str, Dict[str, Any]] = {}
+    header: Optional[List[str]] = None
+    for line in lines:
+        if not line.strip():
+            continue
+        if header is None:
+            header = line.split()
+            continue
+        name, _, rest = line.partition(":")
+        values = rest.split()
+        if not values:
+            continue
+        result[name.strip().lower().replace("-/+ ", "")] = {
+            column: _number(value) for column, value in zip(header, values)
+        }
+    return result
+
+
+def parse_git_status(lines: Iterable[str]) -> Dict[str, Any]:
+    """解析 git status --porcelain -b 的输出"""
+    result: Dict[str, Any] = {"branch": None, "upstream": None, "ahead": 0, "behind": 0, "files": []}
+    for line in lines:
+        if line.startswith("## "):
+            match = _GIT_BRANCH.match(line)
+            if match:
+                result["branch"] = match.group("branch")
+                result["upstream"] = match.group("upstream")
+                for part in (match.group("tracking") or "").split(","):
+                    key, _, count = part.strip().partition(" ")
+                    if key in ("ahead", "behind") and count.isdigit():
+                        result[key] = int(count)
+            continue
+        if len(line) < 4:
+            continue
+        path = line[3:]
+        entry = {"path": path, "index": line[0], "worktree": line[1]}
+        if " -> " in path:
+            entry["orig_path"], entry["path"] = path.split(" -> ", 1)
+        result["files"].append(entry)
+    return result
+
+
+def parse_csv(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """解析 nvidia-smi --format=csv 的输出，列名去掉单位"""
+    reader = csv.reader(line for line in lines if line.strip())
+    header: Optional[List[str]] = None
+    rows = []
+    for values in reader:
+        values = [value.strip() for value in values]
+        if header is None:
+            header = [re.sub(r"\s*\[.*?\]$", "", name) for name in values]
+            continue
+        rows.append({
+            name: _number(re.sub(r"\s+(%|MiB|W|C)$", "", value)) for name, value in zip(header, values)
+        })
+    return rows
+
+
+def _rewrite_df(args: List[str]) -> List[str]:
+    """df 使用POSIX输出格式，长设备名不会折行"""
+    return args if "-P" in args or "--portability" in args else ["-P", *args]
+
+
+def _rewrite_git_status(args: List[str]) -> Optional[List[str]]:
+    """git status 改用 porcelain（v1）格式，带分支信息
+
+    用户指定的输出格式（--porcelain=v2、-z、--long 等）统一换成解析器
+    能识别的格式，-s/-b/-z 的组合短参数（如 -sb）一起去掉。
+    """
+    if args[:1] != ["status"]:
+        return None
+    end = args.index("--") if "--" in args else len(args)
+    options = [
+        arg for arg in args[1:end]
+        if arg not in ("--short", "--branch", "--long")
+        and not arg.startswith("--porcelain")
+        and not re.fullmatch(r"-[sbz]+", arg)
+    ]
+    return ["status", "--porcelain", "-b", *options, *args[end:]]
+
+
+def _rewrite_nvidia_smi(args: List[str]) -> Optional[List[str]]:
+    """不带参数的 nvidia-smi 改为CSV查询"""
+    if not args:
+        return [f"--query-gpu={NVIDIA_SMI_QUERY}", "--format=csv,nounits"]
+    if any(arg.startswith("--format=csv") for arg in args):
+        return args
+    return None
+
+
+def _is_long_listing(args: List[str]) -> bool:
+    """ls 是否带 -l 参数"""
+    return any(arg.startswith("-") and not arg.startswith("--") and "l" in arg for arg in args)
+
+
+@dataclass
+class OutputParser:
+    """一种命令输出的解析器"""
+    name: str
+    # 适用的程序名
+    programs: Tuple[str, ...]
+    # 逐行解析输出
+    parse: Callable[[Iterable[str]], Any]
+    # 改写命令参数以使用机器可读的输出，返回None表示不适用
+    rewrite: Optional[Callable[[List[str]], Optional[List[str]]]] = None
+    # 检查命令参数是否适用（不改写时使用）
+    accepts: Optional[Callable[[List[str]], bool]] = None
+
+    def prepare(self, args: List[str]) -> Optional[List[str]]:
+        """检查并改写命令参数
+
+        Returns:
+            实际执行的参数，不适用时返回None
+        """
+        if self.accepts is not None and not self.accepts(args):
+            return None
+        if self.rewrite is not None:
+            return self.rewrite(list(args))
+        return args
+
+
+class ParserRegistry:
+    """命令输出解析器注册表"""
+
+    def __init__(self):
+        self._parsers: Dict[str, OutputParser] = {}
+
+    def register(self, parser: OutputParser) -> None:
+        """注册解析器，同名的解析器被替换"""
+        self._parsers[parser.name] = parser
+
+    def prepare(self, command: str) -> Tuple[str, Optional[OutputParser]]:
+        """查找适用的解析器并改写命令
+
+        只处理单个简单命令；含管道、重定向或命令组合的命令原样返回。
+
+        Args:
+            command: 命令文本
+
+        Returns:
+            (实际执行的命令, 解析器)，没有适用的解析器时解析器为None
+        """
+        if _SHELL_SYNTAX.search(command):
+            return command, None
+        try:
+            words = shlex.split(command)
+        except ValueError:
+            return command, None
+        if not words:
+            return command, None
+
+        program = words[0].rsplit("/", 1)[-1]
+        for parser in self._parsers.values():
+            if program not in parser.programs:
+                continue
+            args = parser.prepare(words[1:])
+            if args is None:
+                continue
+            if args == words[1:]:
+                return command, parser
+            return " ".join(shlex.quote(word) for word in [words[0], *args]), parser
+        return command, None
+
+    @staticmethod
+    def parse(parser: OutputParser, output: str) -> Any:
+        """解析命令输出"""
+        return parser.parse(line.rstrip("\r") for line in output.split("\n"))
+
+    @property
+    def names(self) -> List[str]:
+        """已注册的解析器名称"""
+        return list(self._parsers)
+
+
+def default_registry() -> ParserRegistry:
+    """创建包含内置解析器的注册表"""
+    registry = ParserRegistry()
+    registry.register(OutputParser("ls", ("ls",), parse_ls, accepts=_is_long_listing))
+    registry.register(OutputParser("ps", ("ps",), parse_table))
+    registry.register(OutputParser("df", ("df",), parse_df, rewrite=_rewrite_df))
+    registry.register(OutputParser("free", ("free",), parse_free))
+    registry.register(OutputParser("git_status", ("git",), parse_git_status, rewrite=_rewrite_git_status))
+    registry.register(OutputParser("nvidia_smi", ("nvidia-smi",), parse_csv, rewrite=_rewrite_nvidia_smi))
+    return registry
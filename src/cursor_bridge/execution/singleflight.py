@@ -0,0 +1,86 @@
+"""
+请求合并
+
+相同键的并发请求共享同一次执行（single-flight），执行结果分发给所有等待者。
+"""
+
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Flight:
+    """一次进行中的执行"""
+    
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """相同请求的并发合并器"""
+    
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        
+        # 统计信息
+        self.executions = 0
+        self.coalesced = 0
+    
+    async def do(
+        self, key: Hashable, func: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """执行或加入进行中的相同请求
+        
+        执行在独立任务中进行，单个等待者被取消不会影响其他等待者；
+        只有全部等待者都取消时才会取消底层执行。
+        
+        Args:
+            key: 请求键
+            func: 产生结果的协程函数
+            
+        Returns:
+            (结果, 是否复用了其他请求的执行)
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        flight.waiters -= 1
+        
+        # 每个调用方（包括发起执行的一方）都拿到独立的副本：调用方会原地
+        # 改写结果（增量、解析），其他等待者可能还没有取走结果
+        return copy.deepcopy(result), shared
+    
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        """执行完成后移除记录"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+    
+    @property
+    def in_flight(self) -> int:
+        """进行中的执行数量"""
+        return len(self._flights)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "in_flight": self.in_flight,
+            "executions": self.executions,
+            "coalesced": self.coalesced
+        }
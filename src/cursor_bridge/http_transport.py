@@ -0,0 +1,494 @@
+"""
+MCP Streamable HTTP传输
+
+在一个守护进程中通过HTTP为多个客户端提供MCP服务。所有客户端共享同一个
+MCPServer实例，因此tmux面板、结果缓存和面板队列在客户端之间复用。
+
+- POST 发送JSON-RPC消息，响应为JSON或SSE流（请求处理期间产生的通知
+  和最终响应都通过该流返回）
+- GET 打开SSE流，接收服务端主动推送的通知
+- DELETE 结束会话
+"""
+
+import asyncio
+import contextvars
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .mcp_server import MCPServer, SimpleMCPHandler, configure_server_logging
+from .utils import setup_logging, get_logger
+
+
+# HTTP模式下的日志文件
+HTTP_LOG_FILE = "/tmp/cursor-bridge-http.log"
+
+SESSION_HEADER = "mcp-session-id"
+MAX_BODY_SIZE = 16 * 1024 * 1024
+KEEPALIVE_INTERVAL = 15.0
+# 工具调用带 timeout 参数时，传输层在该时间之外额外等待的秒数
+TOOL_TIMEOUT_MARGIN = 10.0
+
+_REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 403: "Forbidden",
+    404: "Not Found", 405: "Method Not Allowed", 406: "Not Acceptable",
+    413: "Payload Too Large", 503: "Service Unavailable",
+}
+
+# 当前POST请求的SSE流，处理期间产生的通知优先写入该流
+_current_stream: "contextvars.ContextVar[Optional[asyncio.Queue]]" = contextvars.ContextVar(
+    "cursor_bridge_current_stream", default=None
+)
+
+
+class HttpRequest:
+    """解析后的HTTP请求"""
+
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        """连接是否保持"""
+        return self.headers.get("connection", "").lower() != "close"
+
+    def accepts(self, mime_type: str) -> bool:
+        """客户端是否接受指定的内容类型"""
+        accept = self.headers.get("accept", "")
+        return mime_type in accept or "*/*" in accept
+
+
+class HttpSession:
+    """一个MCP客户端会话"""
+
+    def __init__(self, session_id: str, mcp_server: MCPServer):
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.last_activity = time.time()
+        # GET流的消息队列，服务端主动推送的通知写入这里
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.handler = SimpleMCPHandler(mcp_server, notify=self._notify)
+
+    async def _notify(self, message: Dict[str, Any]) -> None:
+        """发送通知：优先写入当前POST的SSE流，否则写入GET流"""
+        stream = _current_stream.get()
+        await (stream if stream is not None else self.outbox).put(message)
+
+    def touch(self) -> None:
+        """更新最后活动时间"""
+        self.last_activity = time.time()
+
+    async def close(self) -> None:
+        """结束会话，取消资源订阅"""
+        await self.handler.close()
+
+
+class MCPHttpTransport:
+    """MCP Streamable HTTP传输服务"""
+
+    def __init__(
+        self,
+        mcp_server: MCPServer,
+        host: Optional[str] = None,
+        port: Optional[int] = None
+    ):
+        """初始化HTTP传输
+
+        Args:
+            mcp_server: 共享的MCP服务器实例
+            host: 监听地址，默认使用mcp.server.host
+            port: 监听端口，默认使用mcp.server.port
+        """
+        server_config = mcp_server.config.mcp.server
+        self.mcp_server = mcp_server
+        self.host = host or server_config.get("host", "localhost")
+        self.port = port or server_config.get("port", 8082)
+        self.path = server_config.get("path", "/mcp")
+        self.max_connections = server_config.get("max_connections", 100)
+        self.request_timeout = server_config.get("request_timeout", 30)
+        self.session_timeout = server_config.get("session_timeout", 3600)
+
+        self.logger = get_logger("mcp-http")
+        self.sessions: Dict[str, HttpSession] = {}
+        self._connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+        # 统计信息
+        self.rejected_connections = 0
+        self.timed_out_requests = 0
+
+    async def start(self) -> None:
+        """开始监听"""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        sockets = self._server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+        self.logger.info("HTTP传输已启动", host=self.host, port=self.port, path=self.path)
+
+    async def serve_forever(self) -> None:
+        """运行直到被取消"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        """停止监听"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions.clear()
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """处理一个TCP连接"""
+        if self._connections >= self.max_connections:
+            self.rejected_connections += 1
+            await self._write_response(writer, 503, b"", {"retry-after": "1"}, keep_alive=False)
+            writer.close()
+            return
+
+        self._connections += 1
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                keep_alive = await self._dispatch(request, writer)
+                if not keep_alive or not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            self.logger.error("处理HTTP连接失败", error=str(e))
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> Optional[HttpRequest]:
+        """读取并解析一个HTTP请求"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            await self._write_response(writer, 400, b"", keep_alive=False)
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            await self._write_response(writer, 400, b"", keep_alive=False)
+            return None
+
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self._write_response(writer, 400, b"", keep_alive=False)
+            return None
+        if length > MAX_BODY_SIZE:
+            await self._write_response(writer, 413, b"", keep_alive=False)
+            return None
+        body = await reader.readexactly(length) if length else b""
+
+        return HttpRequest(method.upper(), urlsplit(target).path, headers, body)
+
+    async def _dispatch(self, request: HttpRequest, writer: asyncio.StreamWriter) -> bool:
+        """分发请求，返回连接是否可以复用"""
+        if request.path != self.path:
+            await self._write_response(writer, 404, b"")
+            return True
+
+        if not self._origin_allowed(request):
+            await self._write_response(writer, 403, b"")
+            return True
+
+        if request.method == "POST":
+            return await self._handle_post(request, writer)
+        if request.method == "GET":
+            return await self._handle_get(request, writer)
+        if request.method == "DELETE":
+            session = self.sessions.pop(request.headers.get(SESSION_HEADER) or "", None)
+            if session is not None:
+                await session.close()
+            await self._write_response(writer, 200 if session else 404, b"")
+            return True
+
+        await self._write_response(writer, 405, b"", {"allow": "GET, POST, DELETE"})
+        return True
+
+    def _origin_allowed(self, request: HttpRequest) -> bool:
+        """防止DNS重绑定：只接受本机来源或无Origin的请求"""
+        origin = request.headers.get("origin")
+        if not origin:
+            return True
+        hostname = urlsplit(origin).hostname or ""
+        return hostname in ("localhost", "127.0.0.1", "::1", self.host)
+
+    async def _handle_post(self, request: HttpRequest, writer: asyncio.StreamWriter) -> bool:
+        """处理客户端发送的JSON-RPC消息"""
+        try:
+            payload = json.loads(request.body.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            body = self._json_bytes(self._parse_error(str(e)))
+            await self._write_response(writer, 400, body, {"content-type": "application/json"})
+            return True
+
+        messages = payload if isinstance(payload, list) else [payload]
+        is_initialize = any(m.get("method") == "initialize" for m in messages if isinstance(m, dict))
+
+        session, status = self._get_session(request, create=is_initialize)
+        if session is None:
+            await self._write_response(writer, status, b"")
+            return True
+        session.touch()
+        extra_headers = {SESSION_HEADER: session.session_id}
+
+        requests = [m for m in messages if isinstance(m, dict) and "method" in m and "id" in m]
+        if not requests:
+            # 只有通知或响应：处理后返回202
+            for message in messages:
+                if isinstance(message, dict) and "method" in message:
+                    await session.handler.handle_request(message)
+            await self._write_response(writer, 202, b"", extra_headers)
+            return True
+
+        if request.accepts("text/event-stream"):
+            return await self._respond_with_stream(session, messages, writer, extra_headers)
+
+        responses = await asyncio.gather(
+            *[self._process(session, message) for message in messages]
+        )
+        responses = [r for r in responses if r is not None]
+        if not responses:
+            # 请求已被客户端取消，没有响应
+            await self._write_response(writer, 202, b"", extra_headers)
+            return True
+        result = responses if isinstance(payload, list) else responses[0]
+        extra_headers["content-type"] = "application/json"
+        await self._write_response(writer, 200, self._json_bytes(result), extra_headers)
+        return True
+
+    async def _respond_with_stream(
+        self,
+        session: HttpSession,
+        messages: List[Any],
+        writer: asyncio.StreamWriter,
+        extra_headers: Dict[str, str]
+    ) -> bool:
+        """以SSE流返回处理期间的通知和最终响应"""
+        stream: asyncio.Queue = asyncio.Queue()
+
+        async def process(message: Any) -> None:
+            _current_stream.set(stream)
+            response = await self._process(session, message)
+            if response is not None:
+                await stream.put(response)
+
+        tasks = [asyncio.create_task(process(message)) for message in messages]
+        done_marker = object()
+
+        async def close_when_done() -> None:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await stream.put(done_marker)
+
+        closer = asyncio.create_task(close_when_done())
+        await self._write_stream_head(writer, extra_headers)
+        try:
+            while True:
+                message = await stream.get()
+                if message is done_marker:
+                    break
+                await self._write_event(writer, message)
+        except ConnectionError:
+            for task in tasks:
+                task.cancel()
+            closer.cancel()
+            return False
+
+        # SSE响应没有Content-Length，结束后关闭连接
+        return False
+
+    async def _handle_get(self, request: HttpRequest, writer: asyncio.StreamWriter) -> bool:
+        """打开服务端推送的SSE流"""
+        if not request.accepts("text/event-stream"):
+            await self._write_response(writer, 406, b"")
+            return True
+
+        session, status = self._get_session(request, create=False)
+        if session is None:
+            await self._write_response(writer, status, b"")
+            return True
+
+        await self._write_stream_head(writer, {SESSION_HEADER: session.session_id})
+        try:
+            while session.session_id in self.sessions:
+                try:
+                    message = await asyncio.wait_for(session.outbox.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    # 注释行作为心跳，同时用于发现已断开的连接
+                    writer.write(b": keepalive\n\n")
+                    await writer.drain()
+                    continue
+                session.touch()
+                await self._write_event(writer, message)
+        except ConnectionError:
+            pass
+        return False
+
+    async def _process(self, session: HttpSession, message: Any) -> Optional[Dict[str, Any]]:
+        """在请求超时限制内处理单条消息"""
+        if not isinstance(message, dict):
+            return session.handler._error_response(None, -32600, "Invalid Request")
+
+        deadline = self._request_deadline(message)
+        try:
+            response = await asyncio.wait_for(session.handler.handle_request(message), timeout=deadline)
+            # 通知没有响应
+            return response if "id" in message else None
+        except asyncio.TimeoutError:
+            self.timed_out_requests += 1
+            self.logger.warning("请求超时", method=message.get("method"), request_id=message.get("id"))
+            return session.handler._error_response(
+                message.get("id"), -32001, f"Request timed out after {deadline}s"
+            )
+
+    def _request_deadline(self, message: Dict[str, Any]) -> Optional[float]:
+        """请求的处理时限，None表示不限制
+
+        工具调用自己执行超时控制，超时后中断远程命令并返回部分输出；传输层
+        提前取消会打断远程命令。带 timeout 参数的工具调用在其超时之外留出
+        余量，不带时由工具按自己的默认超时处理。
+        """
+        if message.get("method") != "tools/call":
+            return self.request_timeout
+        params = message.get("params")
+        arguments = params.get("arguments") if isinstance(params, dict) else None
+        timeout = arguments.get("timeout") if isinstance(arguments, dict) else None
+        if isinstance(timeout, (int, float)) and not isinstance(timeout, bool) and timeout > 0:
+            return timeout + TOOL_TIMEOUT_MARGIN
+        return None
+
+    def _get_session(self, request: HttpRequest, create: bool) -> Tuple[Optional[HttpSession], int]:
+        """按请求头查找或创建会话，失败时返回HTTP状态码"""
+        self._prune_sessions()
+
+        if create:
+            session = HttpSession(uuid.uuid4().hex, self.mcp_server)
+            self.sessions[session.session_id] = session
+            return session, 200
+
+        session_id = request.headers.get(SESSION_HEADER)
+        if not session_id:
+            return None, 400
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None, 404
+        return session, 200
+
+    def _prune_sessions(self) -> None:
+        """清理长时间无活动的会话"""
+        now = time.time()
+        expired = [
+            session_id for session_id, session in self.sessions.items()
+            if now - session.last_activity > self.session_timeout
+        ]
+        for session_id in expired:
+            # 在后台取消过期会话的资源订阅
+            asyncio.ensure_future(self.sessions.pop(session_id).close())
+
+    @staticmethod
+    def _parse_error(message: str) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": f"Parse error: {message}"}}
+
+    @staticmethod
+    def _json_bytes(data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    async def _write_response(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+        keep_alive: bool = True
+    ) -> None:
+        """写出完整的HTTP响应"""
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+        all_headers = {"content-length": str(len(body))}
+        if not keep_alive:
+            all_headers["connection"] = "close"
+        all_headers.update(headers or {})
+        lines.extend(f"{name}: {value}" for name, value in all_headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _write_stream_head(self, writer: asyncio.StreamWriter, headers: Dict[str, str]) -> None:
+        """写出SSE响应头"""
+        lines = [
+            "HTTP/1.1 200 OK",
+            "content-type: text/event-stream",
+            "cache-control: no-cache",
+            "connection: close",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def _write_event(self, writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+        """写出一条SSE事件"""
+        data = json.dumps(message, ensure_ascii=False)
+        writer.write(f"event: message\ndata: {data}\n\n".encode("utf-8"))
+        await writer.drain()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取传输层统计信息"""
+        return {
+            "connections": self._connections,
+            "max_connections": self.max_connections,
+            "sessions": len(self.sessions),
+            "rejected_connections": self.rejected_connections,
+            "timed_out_requests": self.timed_out_requests
+        }
+
+
+async def run_http_server(
+    config_path: Optional[str] = None,
+    host: Optional[str] = None,
+    port: Optional[int] = None
+) -> None:
+    """运行基于Streamable HTTP的MCP服务器"""
+    setup_logging(level="INFO", log_file=HTTP_LOG_FILE, async_logs=True)
+
+    mcp_server = MCPServer(config_path)
+    configure_server_logging(mcp_server.config, HTTP_LOG_FILE, console=True)
+
+    transport = MCPHttpTransport(mcp_server, host=host, port=port)
+    await mcp_server.start()
+    try:
+        await transport.serve_forever()
+    finally:
+        await transport.stop()
+        await mcp_server.stop()
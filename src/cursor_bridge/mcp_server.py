@@ -5,9 +5,19 @@ Cursor Bridge MCP服务器实现
 """
 
 import asyncio
+import base64
+import binascii
+import fnmatch
+import hashlib
 import json
+import posixpath
+import re
+import shlex
+import socket
 import sys
-from typing import Any, Dict, List, Optional, Sequence
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TYPE_CHECKING
 from pathlib import Path
 import logging
 
@@ -17,9 +27,45 @@ import logging
 # from mcp.server.stdio import stdio_server
 # from mcp.types import Tool, TextContent, ImageContent, EmbeddedResource
 
-from .config import ConfigLoader, CursorBridgeConfig
-from .utils import setup_logging, get_logger, LoggerMixin
+from .config import ConfigLoader, CursorBridgeConfig, ServerConfig
+from .utils import setup_logging, get_logger, get_log_stats, LoggerMixin
 from .connection import ConnectionManager
+from .execution import (
+    ExecutionOptions, ExecutionStatus, FileCache, Job, JobManager, OutputFilter, OutputFormat,
+    OutputHistory, OutputParser, ResultCache, SingleFlight, default_registry
+)
+from .execution.file_cache import CachedFile
+from .security import CommandClass, SecurityPolicy
+from .subscriptions import JobTailSource, PaneLogSource, ResourceSubscriptions
+from .session import SessionConfig, SessionManager, SessionType
+from .session.registry import default_registry_path
+from .session.terminal import clean_pane_log
+from .utils.log_pipeline import parse_size
+
+if TYPE_CHECKING:
+    from .session.tmux_backend import TmuxSession
+
+
+# stdio模式下的日志文件
+STDIO_LOG_FILE = "/tmp/cursor-bridge-mcp.log"
+
+# 托管会话的tmux会话名前缀，与用户手动创建的会话区分
+MANAGED_SESSION_PREFIX = "cb-"
+
+# 执行后台任务的托管会话名前缀，后接服务器名
+JOB_SESSION_PREFIX = "job-"
+
+# list_tree 默认跳过的目录
+DEFAULT_TREE_IGNORE = [".git", "node_modules", "__pycache__", ".venv"]
+
+# delta 模式下完整输出的资源地址前缀，后接输出的sha256
+OUTPUT_URI_PREFIX = "cursor-bridge://output/"
+
+# 面板日志资源地址前缀，后接服务器名，可选再接 /托管会话ID
+SESSION_LOG_URI_PREFIX = "cursor-bridge://session-logs/"
+
+# 远程文件末尾资源地址前缀，后接服务器名和文件的绝对路径
+FILE_TAIL_URI_PREFIX = "cursor-bridge://file-tail/"
 
 
 class MCPServer(LoggerMixin):
@@ -44,13 +90,150 @@ class MCPServer(LoggerMixin):
             except FileNotFoundError:
                 self.logger.warning("未找到配置文件，使用默认配置")
                 self.config = CursorBridgeConfig(servers={})
+        
+        # 命令分类策略与只读命令结果缓存
+        self.policy = SecurityPolicy(self.config.security)
+        cache_config = self.config.performance.caching.get("result_cache", {})
+        self.cache_enabled = cache_config.get("enabled", False)
+        self.result_cache = ResultCache(
+            ttl=cache_config.get("ttl", 5.0),
+            max_bytes=parse_size(cache_config.get("max_bytes", "4MB"))
+        )
+        
+        # 相同只读命令的并发请求合并为一次执行
+        execution_config = self.config.performance.command_execution
+        self.coalesce_enabled = execution_config.get("coalesce_identical", True)
+        self.singleflight = SingleFlight()
+        
+        # 常见命令的输出解析器（output_format 为 json/structured 时使用）
+        self.parsers = default_registry()
+        
+        # 命令上一次的输出，delta 模式下只返回与上次输出的差异
+        history_config = self.config.performance.caching.get("output_history", {})
+        self.output_history = OutputHistory(
+            max_bytes=parse_size(history_config.get("max_bytes", "8MB")),
+            context_lines=history_config.get("context_lines", 3)
+        )
+        
+        # 托管会话：按需创建的tmux会话，空闲超时后由后台任务回收；
+        # 会话记录在注册表中，重启后直接接管仍然存在的面板
+        session_pool = self.config.performance.session_pool
+        self.session_manager = SessionManager({
+            **session_pool,
+            "registry_file": session_pool.get("registry_file") or default_registry_path(config_path),
+            "backend_config": {"session_prefix": MANAGED_SESSION_PREFIX}
+        })
+        
+        # 后台任务：在独立的托管面板中执行，交互命令使用的面板不被占用
+        self.job_timeout = execution_config.get("job_timeout", 3600)
+        self.jobs = JobManager(
+            max_output_size=parse_size(execution_config.get("job_output_size", "1MB")),
+            max_finished=execution_config.get("max_finished_jobs", 50)
+        )
+        
+        # 文件读写：内容编码后经面板传输，单次读写的大小有上限
+        transfer_config = self.config.performance.file_transfer
+        self.file_max_bytes = parse_size(transfer_config.get("max_bytes", "8MB"))
+        self.file_compress = transfer_config.get("compress", True)
+        self.tree_max_entries = transfer_config.get("tree_max_entries", 5000)
+        self.search_max_matches = transfer_config.get("search_max_matches", 200)
+        self.search_max_bytes = parse_size(transfer_config.get("search_max_bytes", "256KB"))
+        
+        # 文件内容缓存：读取前用一次批量 stat 核对，文件没变时不再传输内容
+        file_cache_config = transfer_config.get("cache", {})
+        self.file_cache_enabled = file_cache_config.get("enabled", True)
+        self.file_cache = FileCache(
+            max_bytes=parse_size(file_cache_config.get("max_bytes", "64MB")),
+            persist_dir=file_cache_config.get("persist_dir")
+        )
+        
+        # 可订阅的资源：面板日志和远程文件末尾
+        features = self.config.mcp.features
+        self.file_tail_timeout = features.get("file_tail_timeout", 86400)
+        self.resource_tail_lines = features.get("resource_tail_lines", 200)
+    
+    async def start(self) -> None:
+        """启动后台任务：接管注册表中的会话并开始空闲回收，读取持久化的文件缓存"""
+        if self.file_cache_enabled:
+            self.file_cache.load()
+        await self.session_manager.start()
+    
+    async def stop(self) -> None:
+        """中断仍在运行的后台任务，停止空闲回收并保存会话注册表和文件缓存"""
+        await self.jobs.cancel_all()
+        await self.session_manager.stop()
+        if self.file_cache_enabled:
+            self.file_cache.save()
+    
+    def _error_result(self, command: str, server: str, message: str) -> Dict[str, Any]:
+        """生成命令执行失败的结果"""
+        return {
+            "stdout": "",
+            "stderr": message,
+            "exit_code": 1,
+            "execution_time": 0,
+            "command": command,
+            "server": server
+        }
+    
+    def _timeout_result(self, command: str, server: str, message: str) -> Dict[str, Any]:
+        """生成超时结果"""
+        result = self._error_result(command, server, message)
+        result["exit_code"] = 124
+        result["status"] = ExecutionStatus.TIMEOUT.value
+        return result
+    
+    def _pane_not_ready_result(self, command: str, server: str) -> Dict[str, Any]:
+        """面板上一次中断后仍卡在前台程序中时的结果"""
+        return self._error_result(
+            command, server, "面板上一次中断后仍未回到提示符，命令未执行，请检查面板中的前台程序"
+        )
+    
+    async def _acquire_pane(self, tmux_session: "TmuxSession", timeout: float) -> bool:
+        """在截止时间内获取面板锁
+        
+        Returns:
+            是否获取成功
+        """
+        try:
+            await asyncio.wait_for(tmux_session.lock.acquire(), timeout=max(0.0, timeout))
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    def _resolve_server(self, server: str) -> Optional[str]:
+        """解析服务器名称，"default"解析为默认服务器
+        
+        Args:
+            server: 服务器名称
+            
+        Returns:
+            实际的服务器名称，未配置任何服务器时返回None
+        """
+        if server != "default":
+            return server
+        
+        # 使用配置中的默认服务器
+        if hasattr(self.config, 'default_server') and self.config.default_server:
+            return self.config.default_server
+        
+        # 如果没有指定默认服务器，使用第一个服务器
+        if self.config.servers:
+            return list(self.config.servers.keys())[0]
+        return None
     
     async def execute_command(
         self, 
         command: str, 
         server: str = "default",
         timeout: int = 30,
-        working_directory: Optional[str] = None
+        working_directory: Optional[str] = None,
+        use_cache: Optional[bool] = None,
+        refresh: bool = False,
+        session_id: Optional[str] = None,
+        output_format: str = "raw",
+        output_filter: Optional[Dict[str, Any]] = None,
+        delta: bool = False
     ) -> Dict[str, Any]:
         """执行远程命令
         
@@ -59,53 +242,276 @@ class MCPServer(LoggerMixin):
             server: 服务器名称
             timeout: 超时时间（秒）
             working_directory: 工作目录
+            use_cache: 是否使用只读命令结果缓存，None表示使用配置
+            refresh: 忽略并清除该服务器的缓存结果
+            session_id: 托管会话ID，None表示使用服务器配置的会话
+            output_format: 输出格式，raw 原样返回；structured 在 data 中附加
+                解析结果；json 只返回解析结果（stdout 置空）；filtered 按
+                output_filter 过滤输出
+            output_filter: 输出过滤条件：include/exclude（正则列表）、
+                head/tail（行数）、max_bytes、dedupe（合并重复行）
+            delta: 只返回与同一命令上一次成功输出的差异（unified diff），没有
+                变化时 stdout 为空；完整输出可按 delta.uri 读取（输出过大未保存
+                时没有 uri）
             
         Returns:
             命令执行结果
         """
-        self.logger.info("执行命令", command=command, server=server)
+        try:
+            fmt = OutputFormat(output_format)
+        except ValueError:
+            return self._error_result(command, server, f"不支持的输出格式: {output_format}")
+        
+        output_filter_obj = None
+        if output_filter or fmt is OutputFormat.FILTERED:
+            if fmt not in (OutputFormat.RAW, OutputFormat.FILTERED):
+                return self._error_result(command, server, "output_filter 只能用于 raw 或 filtered 格式")
+            try:
+                output_filter_obj = OutputFilter(**(output_filter or {}))
+            except (TypeError, re.error) as e:
+                return self._error_result(command, server, f"输出过滤条件无效: {e}")
+            if not output_filter_obj.active:
+                return self._error_result(command, server, "filtered 格式需要指定 output_filter")
+        
+        if delta:
+            if fmt not in (OutputFormat.RAW, OutputFormat.FILTERED):
+                return self._error_result(command, server, "delta 只能用于 raw 或 filtered 格式")
+            result = await self.execute_command(
+                command, server, timeout, working_directory, use_cache, refresh, session_id,
+                output_format, output_filter
+            )
+            return self._apply_delta(result, command, server, working_directory, session_id, output_filter)
+        
+        if fmt in (OutputFormat.JSON, OutputFormat.STRUCTURED):
+            # 能解析的命令改用机器可读的参数执行，缓存和请求合并按改写后的命令进行
+            prepared, parser = self.parsers.prepare(command)
+            result = await self.execute_command(
+                prepared, server, timeout, working_directory, use_cache, refresh, session_id
+            )
+            return self._apply_parser(result, fmt, parser)
+        
+        self.logger.info("执行命令", command=command, server=server, session_id=session_id)
+        
+        resolved = self._resolve_server(server) or server
+        read_only = self.policy.is_read_only(command)
+        # 托管会话有各自的shell状态，结果不与服务器会话共享
+        shared = session_id is None
+        cacheable = shared and read_only and (self.cache_enabled if use_cache is None else use_cache)
+        cache_key = ResultCache.make_key(resolved, working_directory, command)
+        
+        # 可能修改远程状态的命令或显式刷新会使该服务器的缓存失效
+        if refresh or not read_only:
+            self.result_cache.invalidate_server(resolved)
+        elif cacheable:
+            cached = self.result_cache.get(cache_key)
+            if cached:
+                result, age = cached
+                result["cached"] = True
+                result["cache_age"] = age
+                if output_filter_obj is not None:
+                    output_filter_obj.feed(result.get("stdout", ""))
+                    self._apply_filter(result, output_filter_obj)
+                return result
+        
+        # 过滤在输出到达时逐行进行；过滤条件因请求而异，不与其他请求合并
+        on_output = output_filter_obj.feed if output_filter_obj is not None else None
+        
+        async def run() -> Dict[str, Any]:
+            result = await self._execute_on_pane(
+                command, server, working_directory, timeout, session_id, on_output=on_output
+            )
+            if cacheable and result.get("exit_code") == 0:
+                self.result_cache.put(cache_key, result)
+            return result
+        
+        if shared and read_only and self.coalesce_enabled and on_output is None:
+            result, coalesced = await self.singleflight.do(cache_key, run)
+        else:
+            result, coalesced = await run(), False
+        
+        if not read_only:
+            # 执行期间并发的只读命令可能缓存了修改前的结果
+            self.result_cache.invalidate_server(resolved)
+        if output_filter_obj is not None:
+            self._apply_filter(result, output_filter_obj)
+        result["cached"] = False
+        result["coalesced"] = coalesced
+        return result
+    
+    def _apply_delta(
+        self,
+        result: Dict[str, Any],
+        command: str,
+        server: str,
+        working_directory: Optional[str],
+        session_id: Optional[str],
+        output_filter: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """用与上一次输出的差异替换 stdout
+        
+        只保存成功执行的输出：失败、超时的输出为空或不完整，作为比较基准
+        会让下一次成功执行返回一整份 diff。
+        """
+        if result.get("exit_code") != 0 or result.get("timed_out"):
+            result["delta"] = {"status": "full", "recorded": False}
+            return result
+        
+        scope = self._resolve_server(server) or server
+        if session_id:
+            # 托管会话有各自的shell状态，与服务器会话分开比较
+            scope = f"{scope}#{session_id}"
+        if output_filter:
+            # 过滤条件不同的输出不能互相比较
+            command = f"{command}\n{json.dumps(output_filter, sort_keys=True)}"
+        key = OutputHistory.make_key(scope, working_directory, command)
+        
+        delta = self.output_history.record(key, result.get("stdout", ""))
+        if delta.pop("stored"):
+            delta["uri"] = f"{OUTPUT_URI_PREFIX}{delta['hash']}"
+        if delta["status"] == "unchanged":
+            result["stdout"] = ""
+        elif delta["status"] == "diff":
+            result["stdout"] = delta.pop("diff")
+        result["delta"] = delta
+        return result
+    
+    @staticmethod
+    def _apply_filter(result: Dict[str, Any], output_filter: OutputFilter) -> Dict[str, Any]:
+        """用过滤后的输出替换 stdout"""
+        result["stdout"] = output_filter.finish()
+        result["filter"] = output_filter.get_stats()
+        return result
+    
+    def _apply_parser(
+        self, result: Dict[str, Any], fmt: OutputFormat, parser: Optional[OutputParser]
+    ) -> Dict[str, Any]:
+        """把命令输出解析为结构化数据"""
+        result["parser"] = parser.name if parser else None
+        if parser is None or result.get("exit_code") != 0:
+            return result
+        try:
+            result["data"] = self.parsers.parse(parser, result.get("stdout", ""))
+        except Exception as e:
+            self.logger.warning("解析命令输出失败", parser=parser.name, error=str(e))
+            result["parse_error"] = str(e)
+            return result
+        if fmt is OutputFormat.JSON:
+            result["stdout"] = ""
+        return result
+    
+    async def _execute_on_pane(
+        self,
+        command: str,
+        server: str,
+        working_directory: Optional[str],
+        timeout: float = 30,
+        session_id: Optional[str] = None,
+        on_output: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """在服务器对应的tmux面板中执行命令
+        
+        timeout 是整个请求的截止时间，包括等待面板空闲的时间。超时的命令
+        会被中断，面板确认回到提示符后才释放给后续请求。on_output 逐段
+        接收命令的全部输出，不受屏幕捕获行数的限制。
+        """
+        deadline = time.time() + timeout
+        tmux_session, error = await self._get_tmux_session(command, server, session_id)
+        if error:
+            return error
+        server = self._resolve_server(server)
+        
+        # 同一面板上的命令串行执行，避免并发请求的输出互相干扰
+        if not await self._acquire_pane(tmux_session, deadline - time.time()):
+            return self._timeout_result(command, server, f"等待面板空闲超时（{timeout}秒）")
+        
+        if session_id:
+            self.session_manager.touch(session_id)
+        try:
+            # 中断后未恢复的面板先确认回到提示符，否则命令会输入到卡住的程序中
+            if not await tmux_session.ensure_ready(max(0.0, deadline - time.time())):
+                return self._pane_not_ready_result(command, server)
+            # 工作目录和环境变量与命令一起发送，面板状态已满足时跳过设置
+            result = await tmux_session.run_command(
+                command,
+                timeout=max(0.0, deadline - time.time()),
+                working_directory=working_directory,
+                environment=self._session_environment(server, session_id),
+                on_output=on_output,
+                stream_output=on_output is not None
+            )
+            
+            # 添加服务器信息
+            result["server"] = server
+            result["working_directory"] = working_directory
+            
+            return result
+            
+        except Exception as e:
+            self.logger.error("执行命令失败", error=str(e))
+            return self._error_result(command, server, f"执行命令失败: {str(e)}")
+        finally:
+            tmux_session.lock.release()
+            if session_id:
+                self.session_manager.touch(session_id, commands=1, working_directory=tmux_session.cwd)
+    
+    def _session_environment(self, server: str, session_id: Optional[str]) -> Dict[str, str]:
+        """命令执行前需要导出的环境变量
+        
+        托管会话创建时已经带上了会话配置的环境变量；服务器配置的会话
+        是用户建立的面板，需要在第一次执行命令时导出。
+        """
+        if session_id:
+            return {}
+        return dict(self.config.servers[server].session.environment)
+    
+    async def _get_tmux_session(
+        self, command: str, server: str, session_id: Optional[str] = None
+    ) -> Tuple[Optional["TmuxSession"], Optional[Dict[str, Any]]]:
+        """获取服务器对应的tmux会话
         
+        Args:
+            command: 要执行的命令（用于生成错误结果）
+            server: 服务器名称
+            session_id: 托管会话ID，None表示服务器配置的会话
+            
+        Returns:
+            (tmux会话, None)，失败时返回 (None, 错误结果)
+        """
         # 获取服务器配置
-        if server == "default":
-            # 使用配置中的默认服务器
-            if hasattr(self.config, 'default_server') and self.config.default_server:
-                server = self.config.default_server
-            else:
-                # 如果没有指定默认服务器，使用第一个服务器
-                if self.config.servers:
-                    server = list(self.config.servers.keys())[0]
-                else:
-                    return {
-                        "stdout": "",
-                        "stderr": "未配置任何服务器",
-                        "exit_code": 1,
-                        "execution_time": 0,
-                        "command": command,
-                        "server": server
-                    }
+        resolved = self._resolve_server(server)
+        if resolved is None:
+            return None, self._error_result(command, server, "未配置任何服务器")
+        server = resolved
         
         if server not in self.config.servers:
-            return {
-                "stdout": "",
-                "stderr": f"服务器 '{server}' 不存在",
-                "exit_code": 1,
-                "execution_time": 0,
-                "command": command,
-                "server": server
-            }
+            return None, self._error_result(command, server, f"服务器 '{server}' 不存在")
         
         server_config = self.config.servers[server]
         
         # 检查服务器类型，目前只支持local_tmux
         if server_config.type != "local_tmux":
-            return {
-                "stdout": "",
-                "stderr": f"服务器类型 '{server_config.type}' 暂不支持",
-                "exit_code": 1,
-                "execution_time": 0,
-                "command": command,
-                "server": server
-            }
+            return None, self._error_result(
+                command, server, f"服务器类型 '{server_config.type}' 暂不支持"
+            )
+        
+        if session_id:
+            info = self.session_manager.get_session(session_id)
+            if info is None or info.server_name != server:
+                return None, self._error_result(
+                    command, server, f"会话 '{session_id}' 不存在，请先调用 create_session"
+                )
+            backend = self.session_manager.backend
+            tmux_config = getattr(server_config, 'tmux', None)
+            tmux_session = backend.get_session(
+                backend.full_name(session_id),
+                backend.WINDOW_NAME,
+                getattr(tmux_config, 'capture_method', 'capture')
+            )
+            # 托管会话的shell在本机启动，确认它会在服务器上执行命令
+            refusal = await self._prepare_managed_pane(server, tmux_session)
+            if refusal:
+                return None, self._error_result(command, server, refusal)
+            return tmux_session, None
         
         try:
             # 导入tmux后端
@@ -114,60 +520,261 @@ class MCPServer(LoggerMixin):
             # 获取tmux配置
             tmux_config = getattr(server_config, 'tmux', None)
             if not tmux_config:
-                return {
-                    "stdout": "",
-                    "stderr": f"服务器 '{server}' 缺少tmux配置",
-                    "exit_code": 1,
-                    "execution_time": 0,
-                    "command": command,
-                    "server": server
-                }
+                return None, self._error_result(command, server, f"服务器 '{server}' 缺少tmux配置")
             
             session_name = tmux_config.session_name
             window_name = getattr(tmux_config, 'window_name', 'main')
+            capture_method = getattr(tmux_config, 'capture_method', 'capture')
             
             # 获取tmux会话
-            tmux_session = tmux_backend.get_session(session_name, window_name)
+            tmux_session = tmux_backend.get_session(session_name, window_name, capture_method)
+            
+            # 面板内的SSH断开后按配置的连接方式自动重连
+            if self.config.mcp.features.get("auto_reconnect", False):
+                connect_commands = self._connect_commands(server_config)
+                if connect_commands:
+                    connection = server_config.ssh or server_config.proxy
+                    tmux_session.configure_reconnect(
+                        connect_commands,
+                        tmux_config.expected_hostname,
+                        connection.timeout if connection else 30
+                    )
             
             # 检查会话是否存在
             if not await tmux_session.check_session_exists():
-                return {
-                    "stdout": "",
-                    "stderr": f"tmux会话 '{session_name}' 不存在，请先手动创建并连接到远程服务器",
-                    "exit_code": 1,
-                    "execution_time": 0,
-                    "command": command,
-                    "server": server
-                }
+                return None, self._error_result(
+                    command, server,
+                    f"tmux会话 '{session_name}' 不存在，请先手动创建并连接到远程服务器"
+                )
+            
+            return tmux_session, None
             
-            # 如果指定了工作目录，先切换目录
-            if working_directory:
-                cd_command = f"cd {working_directory}"
-                await tmux_session.send_command(cd_command, wait_time=0.5)
+        except Exception as e:
+            self.logger.error("获取tmux会话失败", error=str(e))
+            return None, self._error_result(command, server, f"执行命令失败: {str(e)}")
+    
+    def _connect_commands(self, server_config: ServerConfig) -> List[str]:
+        """生成在本机shell中连接远程主机的命令
+        
+        优先使用 tmux.connect_commands；否则按 ssh 配置生成 ssh 命令，
+        或按 proxy 配置生成代理工具命令。连接需要免交互认证（密钥）。
+        """
+        tmux_config = server_config.tmux
+        if tmux_config and tmux_config.connect_commands:
+            return list(tmux_config.connect_commands)
+        
+        ssh_config = server_config.ssh
+        if ssh_config:
+            args = ["ssh", "-o", "ServerAliveInterval=15", "-o", "ServerAliveCountMax=3"]
+            if ssh_config.port != 22:
+                args += ["-p", str(ssh_config.port)]
+            if ssh_config.key_file:
+                args += ["-i", ssh_config.key_file]
+            args.append(f"{ssh_config.username}@{ssh_config.host}")
+            return [" ".join(shlex.quote(arg) for arg in args)]
+        
+        proxy_config = server_config.proxy
+        if proxy_config:
+            args = [
+                proxy_config.command, *proxy_config.extra_args,
+                f"{proxy_config.username}@{proxy_config.target_host}"
+            ]
+            return [" ".join(shlex.quote(arg) for arg in args)]
+        
+        return []
+    
+    async def execute_batch(
+        self,
+        commands: List[str],
+        server: str = "default",
+        stop_on_error: bool = True,
+        timeout: int = 60,
+        working_directory: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """在同一面板中一次性执行一组命令
+        
+        Args:
+            commands: 按顺序执行的命令列表
+            server: 服务器名称
+            stop_on_error: 某一步失败后是否跳过后续命令
+            timeout: 整批命令的超时时间（秒）
+            working_directory: 工作目录，与命令一起发送
+            session_id: 托管会话ID，None表示使用服务器配置的会话
             
-            # 执行命令
-            result = await tmux_session.send_command(command, wait_time=1.0)
+        Returns:
+            整批执行结果，包含每一步的输出、退出码和耗时
+        """
+        joined = " && ".join(commands)
+        self.logger.info("批量执行命令", count=len(commands), server=server)
+        
+        if not commands:
+            return self._error_result(joined, server, "命令列表为空")
+        
+        tmux_session, error = await self._get_tmux_session(joined, server, session_id)
+        if error:
+            return error
+        server = self._resolve_server(server)
+        
+        # 批量命令中任一步可能修改状态都会使缓存失效，执行前后各一次
+        mutating = self.policy.classify_all(commands) is CommandClass.MUTATING
+        if mutating:
+            self.result_cache.invalidate_server(server)
+        
+        deadline = time.time() + timeout
+        if not await self._acquire_pane(tmux_session, timeout):
+            return self._timeout_result(joined, server, f"等待面板空闲超时（{timeout}秒）")
+        
+        if session_id:
+            self.session_manager.touch(session_id)
+        try:
+            if not await tmux_session.ensure_ready(max(0.0, deadline - time.time())):
+                return self._pane_not_ready_result(joined, server)
+            result = await tmux_session.execute_batch(
+                commands,
+                stop_on_error=stop_on_error,
+                timeout=max(0.0, deadline - time.time()),
+                working_directory=working_directory,
+                environment=self._session_environment(server, session_id)
+            )
             
-            # 添加服务器信息
             result["server"] = server
             result["working_directory"] = working_directory
-            
             return result
             
         except Exception as e:
-            self.logger.error("执行命令失败", error=str(e))
-            return {
-                "stdout": "",
-                "stderr": f"执行命令失败: {str(e)}",
-                "exit_code": 1,
-                "execution_time": 0,
-                "command": command,
-                "server": server
-            }
+            self.logger.error("批量执行命令失败", error=str(e))
+            return self._error_result(joined, server, f"执行命令失败: {str(e)}")
+        finally:
+            tmux_session.lock.release()
+            if mutating:
+                self.result_cache.invalidate_server(server)
+            if session_id:
+                self.session_manager.touch(
+                    session_id, commands=len(commands), working_directory=tmux_session.cwd
+                )
+    
+    def select_servers(
+        self,
+        servers: Optional[List[str]] = None,
+        selector: Optional[str] = None,
+        tags: Optional[List[str]] = None
+    ) -> List[str]:
+        """按名称列表、通配符或标签选择服务器
+        
+        Args:
+            servers: 服务器名称列表
+            selector: 服务器名称通配符，如 "gpu-*"
+            tags: 标签列表，匹配任一标签的服务器都会被选中
+            
+        Returns:
+            按配置顺序排列的服务器名称列表
+        """
+        selected = []
+        for name, server_config in self.config.servers.items():
+            if servers and name in servers:
+                selected.append(name)
+            elif selector and fnmatch.fnmatchcase(name, selector):
+                selected.append(name)
+            elif tags and set(tags) & set(server_config.tags):
+                selected.append(name)
+        return selected
+    
+    async def execute_on_servers(
+        self,
+        command: str,
+        servers: Optional[List[str]] = None,
+        selector: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: int = 30,
+        working_directory: Optional[str] = None,
+        on_result: Optional[Callable[[Dict[str, Any], int, int], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """在多台服务器上并发执行同一命令
+        
+        Args:
+            command: 要执行的命令
+            servers: 服务器名称列表
+            selector: 服务器名称通配符
+            tags: 服务器标签
+            max_concurrency: 最大并发数，默认使用security.max_concurrent_commands
+            timeout: 单台服务器的超时时间（秒）
+            working_directory: 工作目录
+            on_result: 每台服务器完成时的回调 (result, completed, total)
+            
+        Returns:
+            各服务器结果（按完成顺序）及按输出分组的汇总
+        """
+        targets = self.select_servers(servers, selector, tags)
+        unknown = [name for name in (servers or []) if name not in self.config.servers]
+        self.logger.info("并发执行命令", command=command, targets=len(targets))
+        
+        start_time = time.time()
+        limit = max_concurrency or self.config.security.max_concurrent_commands
+        semaphore = asyncio.Semaphore(max(1, limit))
+        
+        async def run_one(name: str) -> Dict[str, Any]:
+            async with semaphore:
+                # execute_command自身执行截止时间，超时的命令会被中断
+                result = await self.execute_command(
+                    command, server=name, timeout=timeout,
+                    working_directory=working_directory
+                )
+                if result.get("status") != ExecutionStatus.TIMEOUT.value:
+                    result["status"] = "completed" if result.get("exit_code") == 0 else "failed"
+                return result
+        
+        results = []
+        tasks = [asyncio.create_task(run_one(name)) for name in targets]
+        for future in asyncio.as_completed(tasks):
+            result = await future
+            results.append(result)
+            if on_result:
+                try:
+                    await on_result(result, len(results), len(targets))
+                except Exception as e:
+                    self.logger.warning("结果回调失败", error=str(e))
+        
+        return {
+            "command": command,
+            "targets": targets,
+            "unknown_servers": unknown,
+            "results": results,
+            "summary": self._summarize_results(results),
+            "execution_time": time.time() - start_time
+        }
+    
+    def _summarize_results(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """按退出码和输出对结果分组"""
+        groups: Dict[Any, Dict[str, Any]] = {}
+        counts = {"completed": 0, "failed": 0, "timeout": 0}
+        
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            key = (result["status"], result.get("exit_code"), result.get("stdout"), result.get("stderr"))
+            if key not in groups:
+                groups[key] = {
+                    "servers": [],
+                    "status": result["status"],
+                    "exit_code": result.get("exit_code"),
+                    "stdout": result.get("stdout", ""),
+                    "stderr": result.get("stderr", "")
+                }
+            groups[key]["servers"].append(result["server"])
+        
+        return {
+            "total": len(results),
+            **counts,
+            "groups": sorted(groups.values(), key=lambda g: len(g["servers"]), reverse=True)
+        }
     
     async def list_sessions(self, server: Optional[str] = None) -> List[Dict[str, Any]]:
         """列出会话
         
+        包括每台服务器配置的tmux会话（managed 为 False）和通过
+        create_session 创建的托管会话。
+        
         Args:
             server: 服务器名称，None表示所有服务器
             
@@ -176,30 +783,44 @@ class MCPServer(LoggerMixin):
         """
         self.logger.info("列出会话", server=server)
         
-        # TODO: 实现真正的会话列表逻辑
-        sessions = []
-        
         if server:
-            if server in self.config.servers:
-                sessions.append({
-                    "server": server,
-                    "session_id": f"{server}-session",
-                    "status": "active",
-                    "created_at": "2024-01-01T00:00:00Z",
-                    "last_activity": "2024-01-01T00:00:00Z"
-                })
+            resolved = self._resolve_server(server)
+            if resolved not in self.config.servers:
+                return []
+            server_names = [resolved]
         else:
-            for server_name in self.config.servers.keys():
-                sessions.append({
-                    "server": server_name,
-                    "session_id": f"{server_name}-session",
-                    "status": "active",
-                    "created_at": "2024-01-01T00:00:00Z",
-                    "last_activity": "2024-01-01T00:00:00Z"
-                })
+            server_names = list(self.config.servers.keys())
+        
+        sessions = []
+        for server_name in server_names:
+            sessions.append(await self._configured_session_status(server_name))
+            for info in self.session_manager.list_sessions(server_name):
+                sessions.append({"server": server_name, "session_id": info["name"], "managed": True, **info})
         
         return sessions
     
+    async def _configured_session_status(self, server: str) -> Dict[str, Any]:
+        """获取服务器配置的tmux会话的实时状态"""
+        server_config = self.config.servers[server]
+        tmux_config = getattr(server_config, 'tmux', None)
+        session_name = tmux_config.session_name if tmux_config else server_config.session.name
+        status = {"server": server, "session_id": session_name, "managed": False}
+        
+        if server_config.type != "local_tmux" or not tmux_config:
+            status["status"] = "unsupported"
+            return status
+        
+        from .session.tmux_backend import tmux_backend
+        
+        tmux_session = tmux_backend.get_session(session_name, tmux_config.window_name)
+        info = await tmux_session.get_session_info()
+        status["status"] = "active" if info.get("exists") else "missing"
+        if info.get("exists"):
+            status["created_at"] = float(info["created"])
+            status["attached"] = info["attached"]
+            status["busy"] = tmux_session.lock.locked()
+        return status
+    
     async def create_session(
         self, 
         server: str, 
@@ -208,6 +829,10 @@ class MCPServer(LoggerMixin):
     ) -> Dict[str, Any]:
         """创建新会话
         
+        按服务器的会话配置（工作目录、环境变量、shell）创建一个托管tmux
+        会话，空闲超过 performance.session_pool.session_idle_timeout 后
+        自动回收。
+        
         Args:
             server: 服务器名称
             session_name: 会话名称
@@ -218,23 +843,47 @@ class MCPServer(LoggerMixin):
         """
         self.logger.info("创建会话", server=server, session_name=session_name)
         
-        if server not in self.config.servers:
+        resolved = self._resolve_server(server)
+        if resolved not in self.config.servers:
             raise ValueError(f"服务器 {server} 不存在")
+        server = resolved
         
-        # TODO: 实现真正的会话创建逻辑
-        session_id = session_name or f"{server}-session-{int(asyncio.get_event_loop().time())}"
+        # 回收任务在第一次创建托管会话时启动
+        await self.session_manager.start()
         
-        return {
-            "server": server,
-            "session_id": session_id,
-            "status": "created",
-            "working_directory": working_directory or "/home",
-            "created_at": "2024-01-01T00:00:00Z"
-        }
+        session_config = self.config.servers[server].session
+        # tmux会话名不能包含 . 和 :
+        session_id = re.sub(r"[.:]", "-", session_name or f"{server}-{uuid.uuid4().hex[:8]}")
+        info = await self.session_manager.create_session(SessionConfig(
+            name=session_id,
+            server_name=server,
+            working_directory=working_directory or session_config.working_directory,
+            environment=dict(session_config.environment),
+            shell=session_config.shell
+        ))
+        
+        # 托管会话的shell在本机启动：按连接方式登录服务器，无法登录时不保留会话
+        backend = self.session_manager.backend
+        tmux_config = self.config.servers[server].tmux
+        tmux_session = backend.get_session(
+            backend.full_name(session_id),
+            backend.WINDOW_NAME,
+            getattr(tmux_config, 'capture_method', 'capture')
+        )
+        refusal = await self._prepare_managed_pane(server, tmux_session)
+        if refusal is None and tmux_session.connect_commands and not await tmux_session.reconnect():
+            refusal = f"托管会话无法登录服务器 '{server}'，请检查连接配置"
+        if refusal:
+            await self.session_manager.destroy_session(session_id)
+            raise RuntimeError(refusal)
+        
+        return {"server": server, "session_id": session_id, "managed": True, **info.to_dict()}
     
     async def destroy_session(self, server: str, session_id: str) -> bool:
         """销毁会话
         
+        只能销毁托管会话，服务器配置的会话由用户自行管理。
+        
         Args:
             server: 服务器名称
             session_id: 会话ID
@@ -244,8 +893,11 @@ class MCPServer(LoggerMixin):
         """
         self.logger.info("销毁会话", server=server, session_id=session_id)
         
-        # TODO: 实现真正的会话销毁逻辑
-        return True
+        info = self.session_manager.get_session(session_id)
+        if info is None or info.server_name != self._resolve_server(server):
+            return False
+        
+        return await self.session_manager.destroy_session(session_id)
     
     async def get_session_status(self, server: str, session_id: str) -> Dict[str, Any]:
         """获取会话状态
@@ -259,96 +911,1135 @@ class MCPServer(LoggerMixin):
         """
         self.logger.info("获取会话状态", server=server, session_id=session_id)
         
-        # TODO: 实现真正的会话状态查询逻辑
-        return {
-            "server": server,
-            "session_id": session_id,
-            "status": "active",
-            "uptime": 3600,
-            "last_activity": "2024-01-01T00:00:00Z",
-            "working_directory": "/home",
-            "environment": {}
-        }
+        resolved = self._resolve_server(server)
+        if resolved not in self.config.servers:
+            return {"server": server, "session_id": session_id, "status": "not_found"}
+        
+        info = self.session_manager.get_session(session_id)
+        if info is not None and info.server_name == resolved:
+            status = {"server": resolved, "session_id": session_id, "managed": True, **info.to_dict()}
+            live = await self.session_manager.backend.get_session_info(session_id, resolved)
+            if live is None:
+                status["status"] = "missing"
+            else:
+                status["pid"] = live.pid
+                status["working_directory"] = live.working_directory
+            status["busy"] = self.session_manager.backend.is_busy(session_id)
+            return status
+        
+        status = await self._configured_session_status(resolved)
+        if status["session_id"] != session_id:
+            return {"server": resolved, "session_id": session_id, "status": "not_found"}
+        return status
     
-    async def get_server_status(self) -> Dict[str, Any]:
-        """获取服务器状态
+    async def read_file(
+        self,
+        path: str,
+        server: str = "default",
+        session_id: Optional[str] = None,
+        offset: int = 0,
+        length: Optional[int] = None,
+        timeout: int = 60
+    ) -> Dict[str, Any]:
+        """读取远程文件
+        
+        内容在面板中压缩编码后传输，完整取回并校验，不受屏幕捕获行数的
+        限制。超过单次上限的文件按 offset/length 分段读取。读过的文件
+        在本地缓存，核对远程没有变化时直接返回缓存的内容。
         
+        Args:
+            path: 远程文件路径
+            server: 服务器名称
+            session_id: 托管会话ID，None表示使用服务器配置的会话
+            offset: 起始字节偏移
+            length: 读取的字节数，None表示读到文件末尾（不超过单次上限）
+            timeout: 超时时间（秒），包括等待面板空闲的时间
+            
         Returns:
-            服务器状态信息
+            读取结果，eof 为False时用 next_offset 继续读取
         """
-        self.logger.info("获取服务器状态")
+        self.logger.info("读取文件", path=path, server=server, offset=offset)
         
-        servers_status = {}
-        for server_name, server_config in self.config.servers.items():
-            servers_status[server_name] = {
-                "type": server_config.type,
-                "status": "connected",  # TODO: 实现真正的连接状态检查
-                "last_check": "2024-01-01T00:00:00Z"
-            }
+        resolved = self._resolve_server(server)
         
-        return {
-            "total_servers": len(self.config.servers),
-            "active_servers": len(self.config.servers),
-            "servers": servers_status
-        }
-
-
-# 简化的MCP协议处理器（不依赖mcp包）
-class SimpleMCPHandler:
-    """简化的MCP协议处理器"""
-    
-    def __init__(self, mcp_server: MCPServer):
-        self.mcp_server = mcp_server
-        self.logger = get_logger("mcp-handler")
-        self.initialized = False
+        async def transfer(tmux_session: "TmuxSession", remaining: float) -> Dict[str, Any]:
+            results = await self._read_files_on_pane(
+                tmux_session, resolved, [(path, max(0, offset), length)], remaining
+            )
+            return results[0]
+        
+        return await self._transfer_on_pane(
+            f"read_file {path}", server, session_id, timeout, transfer, paths=[path]
+        )
     
-    async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """处理MCP请求
+    async def read_files(
+        self,
+        paths: List[str],
+        server: str = "default",
+        session_id: Optional[str] = None,
+        timeout: int = 60
+    ) -> Dict[str, Any]:
+        """一次读取多个远程文件
+        
+        所有缓存过的文件用一次批量 stat 核对，只传输有变化或没有缓存的
+        文件。返回内容的总大小不超过单次上限，超出部分的文件 eof 为False，
+        用 read_file 按 next_offset 继续读取。
         
         Args:
-            request: MCP请求
+            paths: 远程文件路径
+            server: 服务器名称
+            session_id: 托管会话ID，None表示使用服务器配置的会话
+            timeout: 超时时间（秒），包括等待面板空闲的时间
             
         Returns:
-            MCP响应
+            每个文件的读取结果
         """
-        method = request.get("method")
-        params = request.get("params", {})
-        request_id = request.get("id")
+        self.logger.info("批量读取文件", count=len(paths), server=server)
         
-        self.logger.info("处理MCP请求", method=method, request_id=request_id)
+        resolved = self._resolve_server(server)
+        start_time = time.time()
         
-        try:
-            if method == "initialize":
-                return await self._handle_initialize(request_id, params)
-            elif method == "initialized":
-                return await self._handle_initialized(request_id)
-            elif method == "tools/list":
-                return await self._handle_tools_list(request_id)
-            elif method == "tools/call":
-                return await self._handle_tools_call(request_id, params)
-            elif method == "resources/list":
-                return await self._handle_resources_list(request_id)
-            elif method == "resources/read":
-                return await self._handle_resources_read(request_id, params)
-            else:
-                return self._error_response(request_id, -32601, f"Method not found: {method}")
-                
-        except Exception as e:
-            self.logger.error("处理请求失败", method=method, error=str(e))
-            return self._error_response(request_id, -32603, f"Internal error: {str(e)}")
+        async def transfer(tmux_session: "TmuxSession", remaining: float) -> Dict[str, Any]:
+            results = await self._read_files_on_pane(
+                tmux_session, resolved, [(path, 0, None) for path in paths], remaining
+            )
+            failed = [result for result in results if result["exit_code"] != 0]
+            return {
+                "files": results,
+                "cached": sum(1 for result in results if result.get("cached")),
+                "exit_code": failed[0]["exit_code"] if failed else 0,
+                "status": ExecutionStatus.FAILED.value if failed else ExecutionStatus.COMPLETED.value,
+                "execution_time": time.time() - start_time
+            }
+        
+        return await self._transfer_on_pane(
+            f"read_files {' '.join(paths)}", server, session_id, timeout, transfer, paths=paths
+        )
     
-    async def _handle_initialize(self, request_id: Any, params: Dict[str, Any]) -> Dict[str, Any]:
-        """处理初始化请求"""
-        self.logger.info("处理初始化请求", params=params)
+    async def list_tree(
+        self,
+        path: str = ".",
+        server: str = "default",
+        session_id: Optional[str] = None,
+        max_depth: int = 3,
+        patterns: Optional[List[str]] = None,
+        ignore: Optional[List[str]] = None,
+        max_entries: Optional[int] = None,
+        timeout: int = 60
+    ) -> Dict[str, Any]:
+        """列出远程目录树
         
-        return {
+        一次往返取回整棵目录树的类型、大小和修改时间。安全策略禁止访问的
+        路径在远程遍历时直接跳过。
+        
+        Args:
+            path: 远程目录，相对路径按面板当前目录解析
+            server: 服务器名称
+            session_id: 托管会话ID，None表示使用服务器配置的会话
+            max_depth: 最大深度
+            patterns: 文件名通配符（如 *.py），None表示不过滤
+            ignore: 跳过的文件名通配符，None表示使用默认列表
+            max_entries: 最多返回的条数，None表示使用配置
+            timeout: 超时时间（秒），包括等待面板空闲的时间
+            
+        Returns:
+            目录树，truncated 为True表示超过条数上限被截断
+        """
+        self.logger.info("列出目录树", path=path, server=server, max_depth=max_depth)
+        
+        command = f"list_tree {path}"
+        limit = min(max_entries or self.tree_max_entries, self.tree_max_entries)
+        
+        async def transfer(tmux_session: "TmuxSession", remaining: float) -> Dict[str, Any]:
+            root = self._absolute_path(tmux_session, path)
+            prune_paths = self.policy.blocked_paths_under(root) if root is not None else []
+            return await tmux_session.list_tree(
+                root or path,
+                max_depth=max_depth,
+                patterns=patterns,
+                ignore=DEFAULT_TREE_IGNORE if ignore is None else ignore,
+                prune_paths=prune_paths,
+                max_entries=limit,
+                compress=self.file_compress,
+                timeout=remaining
+            )
+        
+        return await self._transfer_on_pane(command, server, session_id, timeout, transfer, paths=[path])
+    
+    async def search(
+        self,
+        pattern: str,
+        path: str = ".",
+        server: str = "default",
+        session_id: Optional[str] = None,
+        globs: Optional[List[str]] = None,
+        ignore: Optional[List[str]] = None,
+        ignore_case: bool = False,
+        fixed_strings: bool = False,
+        max_matches: Optional[int] = None,
+        timeout: int = 60,
+        on_file: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """在远程目录中搜索代码
+        
+        远程有 ripgrep 时使用 rg，否则使用 grep；匹配按文件分组返回，
+        条数和字节数有上限。安全策略禁止访问的路径下的匹配不返回。
+        
+        Args:
+            pattern: 正则表达式（fixed_strings 为True时为普通字符串）
+            path: 搜索的目录或文件，相对路径按面板当前目录解析
+            server: 服务器名称
+            session_id: 托管会话ID，None表示使用服务器配置的会话
+            globs: 只搜索匹配这些通配符的文件（如 *.py）
+            ignore: 跳过的目录名，None表示使用默认列表
+            ignore_case: 是否忽略大小写
+            fixed_strings: 是否按普通字符串匹配
+            max_matches: 最多返回的匹配条数，None表示使用配置
+            timeout: 超时时间（秒），包括等待面板空闲的时间
+            on_file: 每个文件的匹配取回后调用，用于流式推送结果
+            
+        Returns:
+            搜索结果，truncated 为True表示达到条数或字节数上限
+        """
+        self.logger.info("搜索代码", pattern=pattern, path=path, server=server)
+        
+        command = f"search {pattern} {path}"
+        limit = min(max_matches or self.search_max_matches, self.search_max_matches)
+        pending: List["asyncio.Task[None]"] = []
+        
+        async def transfer(tmux_session: "TmuxSession", remaining: float) -> Dict[str, Any]:
+            root = self._absolute_path(tmux_session, path)
+            
+            def allowed(group: Dict[str, Any]) -> bool:
+                if not self.policy.restricts_paths:
+                    return True
+                absolute = self._absolute_path(tmux_session, group["path"])
+                return absolute is not None and self.policy.check_path(absolute) is None
+            
+            def forward(group: Dict[str, Any]) -> None:
+                if on_file is not None and allowed(group):
+                    pending.append(asyncio.create_task(on_file(group)))
+            
+            result = await tmux_session.search(
+                pattern,
+                root or path,
+                globs=globs,
+                ignore=DEFAULT_TREE_IGNORE if ignore is None else ignore,
+                ignore_case=ignore_case,
+                fixed_strings=fixed_strings,
+                max_matches=limit,
+                max_bytes=self.search_max_bytes,
+                on_file=forward,
+                timeout=remaining
+            )
+            if "files" in result:
+                result["files"] = [group for group in result["files"] if allowed(group)]
+                result["file_count"] = len(result["files"])
+                result["match_count"] = sum(len(group["matches"]) for group in result["files"])
+            return result
+        
+        try:
+            return await self._transfer_on_pane(command, server, session_id, timeout, transfer, paths=[path])
+        finally:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _read_files_on_pane(
+        self,
+        tmux_session: "TmuxSession",
+        server: str,
+        requests: List[Tuple[str, int, Optional[int]]],
+        timeout: float
+    ) -> List[Dict[str, Any]]:
+        """在已持有锁的面板上读取文件，优先使用核对过的缓存
+        
+        Args:
+            tmux_session: 面板
+            server: 服务器名称
+            requests: 每个文件的 (路径, 起始偏移, 读取字节数)，字节数为None表示读到末尾
+            timeout: 超时时间（秒）
+            
+        Returns:
+            与 requests 一一对应的读取结果，返回内容的总大小不超过单次上限
+        """
+        start_time = time.time()
+        deadline = start_time + timeout
+        # 传输使用检查过的绝对路径，结果中保留请求的路径
+        remote_paths = [self._remote_path(tmux_session, path) for path, _, _ in requests]
+        keys = [self._file_cache_key(server, tmux_session, path) for path, _, _ in requests]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        
+        # 缓存过的文件一起核对，一次往返
+        entries = {}
+        for index, key in enumerate(keys):
+            entry = self.file_cache.get(key) if key else None
+            if entry is not None:
+                entries[index] = entry
+        if entries:
+            indexes = list(entries)
+            check = await tmux_session.check_files(
+                [remote_paths[index] for index in indexes],
+                [(len(entries[index].data), entries[index].stat) for index in indexes],
+                max(0.0, deadline - time.time())
+            )
+            if check["exit_code"] == 0:
+                for index, info in zip(indexes, check["files"]):
+                    entries[index] = self.file_cache.validate(
+                        keys[index], info["stat"], info["sha256"], check["remote_time"]
+                    )
+            else:
+                self.logger.warning("核对文件缓存失败", error=check.get("stderr"))
+                entries = {}
+        
+        budget = self.file_max_bytes
+        for index, (path, offset, length) in enumerate(requests):
+            limit = max(0, min(length, budget) if length is not None else budget)
+            entry = entries.get(index)
+            if entry is not None:
+                result = self._cached_read_result(path, entry, offset, limit, start_time)
+            else:
+                result = await tmux_session.read_file(
+                    remote_paths[index], offset, limit, self.file_compress, max(0.0, deadline - time.time())
+                )
+                result["path"] = path
+                result["cached"] = False
+                stat, remote_time = result.pop("stat", None), result.pop("remote_time", None)
+                if keys[index] and result["exit_code"] == 0 and offset == 0 and result["eof"]:
+                    self.file_cache.put(
+                        keys[index], self._decode_content(result), FileCache.trusted_stat(stat, remote_time)
+                    )
+            budget -= result.get("length", 0)
+            results[index] = result
+        return results
+    
+    def _file_cache_key(self, server: str, tmux_session: "TmuxSession", path: str) -> Optional[Tuple[str, str]]:
+        """生成文件缓存键，无法确定绝对路径时不缓存"""
+        if not self.file_cache_enabled:
+            return None
+        absolute = self._absolute_path(tmux_session, path)
+        return FileCache.make_key(server, absolute) if absolute else None
+    
+    @staticmethod
+    def _absolute_path(tmux_session: "TmuxSession", path: str) -> Optional[str]:
+        """相对路径按面板当前目录解析为绝对路径，无法确定时返回None"""
+        if not path.startswith("/"):
+            if not tmux_session.cwd or path.startswith("~"):
+                return None
+            path = posixpath.join(tmux_session.cwd, path)
+        return posixpath.normpath(path)
+    
+    @classmethod
+    def _remote_path(cls, tmux_session: "TmuxSession", path: str) -> str:
+        """传输时使用的远程路径：与安全策略检查的绝对路径一致，无法确定时原样使用"""
+        return cls._absolute_path(tmux_session, path) or path
+    
+    def _check_paths(self, tmux_session: "TmuxSession", paths: Iterable[str]) -> Optional[str]:
+        """按安全策略检查远程路径，返回拒绝的原因
+        
+        配置了路径限制时，无法确定绝对路径的路径（~、面板目录未知时的
+        相对路径）也被拒绝。
+        """
+        for path in paths:
+            absolute = self._absolute_path(tmux_session, path)
+            if absolute is None:
+                if self.policy.restricts_paths:
+                    return f"无法确定 '{path}' 的绝对路径，请使用绝对路径"
+                continue
+            denied = self.policy.check_path(absolute)
+            if denied:
+                return denied
+        return None
+    
+    @staticmethod
+    def _decode_content(result: Dict[str, Any]) -> bytes:
+        """取出读取结果中的原始字节"""
+        if result.get("encoding") == "base64":
+            return base64.b64decode(result["content"])
+        return result["content"].encode("utf-8")
+    
+    @staticmethod
+    def _cached_read_result(
+        path: str, entry: CachedFile, offset: int, limit: int, start_time: float
+    ) -> Dict[str, Any]:
+        """用缓存的内容生成读取结果，字段与 TmuxSession.read_file 一致"""
+        size = len(entry.data)
+        data = entry.data[offset:offset + limit]
+        try:
+            content, encoding = data.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            content, encoding = base64.b64encode(data).decode("ascii"), "base64"
+        next_offset = min(offset, size) + len(data)
+        return {
+            "path": path,
+            "content": content,
+            "encoding": encoding,
+            "offset": offset,
+            "length": len(data),
+            "size": size,
+            "next_offset": next_offset,
+            "eof": next_offset >= size,
+            "sha256": entry.sha256 if len(data) == size else hashlib.sha256(data).hexdigest(),
+            "verified": True,
+            "transfer_bytes": 0,
+            "mtime": entry.stat[1] if entry.stat else None,
+            "cached": True,
+            "exit_code": 0,
+            "status": ExecutionStatus.COMPLETED.value,
+            "execution_time": time.time() - start_time
+        }
+    
+    async def write_file(
+        self,
+        path: str,
+        content: str,
+        server: str = "default",
+        session_id: Optional[str] = None,
+        encoding: str = "utf-8",
+        append: bool = False,
+        timeout: int = 60
+    ) -> Dict[str, Any]:
+        """写入远程文件
+        
+        内容在面板中分块传输，远程校验通过后才写入目标文件。
+        
+        Args:
+            path: 远程文件路径
+            content: 文件内容
+            server: 服务器名称
+            session_id: 托管会话ID，None表示使用服务器配置的会话
+            encoding: content 的编码，utf-8 或 base64（二进制内容）
+            append: 是否追加到文件末尾
+            timeout: 超时时间（秒），包括等待面板空闲的时间
+            
+        Returns:
+            写入结果
+        """
+        self.logger.info("写入文件", path=path, server=server, append=append)
+        
+        command = f"write_file {path}"
+        if encoding == "base64":
+            try:
+                data = base64.b64decode(content, validate=True)
+            except (binascii.Error, ValueError) as e:
+                return self._error_result(command, server, f"base64内容无效: {e}")
+        elif encoding == "utf-8":
+            data = content.encode("utf-8")
+        else:
+            return self._error_result(command, server, f"不支持的编码: {encoding}")
+        if len(data) > self.file_max_bytes:
+            return self._error_result(
+                command, server, f"内容大小 {len(data)} 字节超过上限 {self.file_max_bytes} 字节"
+            )
+        
+        async def transfer(tmux_session: "TmuxSession", remaining: float) -> Dict[str, Any]:
+            result = await tmux_session.write_file(
+                self._remote_path(tmux_session, path), data, append, self.file_compress, remaining
+            )
+            result["path"] = path
+            key = self._file_cache_key(resolved, tmux_session, path)
+            if key and result["exit_code"] == 0 and not append:
+                # 写入的内容就是文件的新内容；修改时间未知，下次读取时按哈希核对
+                self.file_cache.put(key, data)
+            elif key:
+                self.file_cache.invalidate(key)
+            return result
+        
+        resolved = self._resolve_server(server)
+        result = await self._transfer_on_pane(command, server, session_id, timeout, transfer, paths=[path])
+        if resolved:
+            self.result_cache.invalidate_server(resolved)
+        return result
+    
+    async def _transfer_on_pane(
+        self,
+        command: str,
+        server: str,
+        session_id: Optional[str],
+        timeout: float,
+        transfer: Callable[["TmuxSession", float], Awaitable[Dict[str, Any]]],
+        paths: Iterable[str] = ()
+    ) -> Dict[str, Any]:
+        """获取面板锁后执行文件传输，超时与 execute_command 一致
+        
+        paths 中的远程路径先按安全策略检查，任一路径被禁止时不执行传输。
+        """
+        deadline = time.time() + timeout
+        tmux_session, error = await self._get_tmux_session(command, server, session_id)
+        if error:
+            return error
+        server = self._resolve_server(server)
+        
+        if not await self._acquire_pane(tmux_session, deadline - time.time()):
+            return self._timeout_result(command, server, f"等待面板空闲超时（{timeout}秒）")
+        
+        if session_id:
+            self.session_manager.touch(session_id)
+        try:
+            # 相对路径按面板当前目录解析，需要在持有面板锁时检查
+            denied = self._check_paths(tmux_session, paths)
+            if denied:
+                return self._error_result(command, server, denied)
+            if not await tmux_session.ensure_ready(max(0.0, deadline - time.time())):
+                return self._pane_not_ready_result(command, server)
+            result = await transfer(tmux_session, max(0.0, deadline - time.time()))
+            result["server"] = server
+            return result
+        except Exception as e:
+            self.logger.error("文件传输失败", error=str(e))
+            return self._error_result(command, server, f"文件传输失败: {str(e)}")
+        finally:
+            tmux_session.lock.release()
+            if session_id:
+                self.session_manager.touch(session_id, commands=1, working_directory=tmux_session.cwd)
+    
+    async def start_job(
+        self,
+        command: str,
+        server: str = "default",
+        working_directory: Optional[str] = None,
+        timeout: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """启动后台任务
+        
+        命令在服务器的任务面板（托管会话）中执行，立即返回任务ID；之后用
+        job_output 按偏移量读取输出，用 job_wait 等待结束。
+        
+        Args:
+            command: 要执行的命令
+            server: 服务器名称
+            working_directory: 工作目录
+            timeout: 超时时间（秒），超时后中断命令，None表示使用配置
+            
+        Returns:
+            任务信息
+        """
+        self.logger.info("启动后台任务", command=command, server=server)
+        
+        resolved = self._resolve_server(server)
+        if resolved is None:
+            return self._error_result(command, server, "未配置任何服务器")
+        if resolved not in self.config.servers:
+            return self._error_result(command, resolved, f"服务器 '{resolved}' 不存在")
+        if self.config.servers[resolved].type != "local_tmux":
+            return self._error_result(
+                command, resolved, f"服务器类型 '{self.config.servers[resolved].type}' 暂不支持"
+            )
+        
+        # 任务面板的shell在本机启动，不能登录服务器时不创建任务面板
+        refusal = await self._prepare_managed_pane(resolved)
+        if refusal:
+            return self._error_result(command, resolved, refusal)
+        
+        if not self.policy.is_read_only(command):
+            self.result_cache.invalidate_server(resolved)
+        
+        options = ExecutionOptions(
+            timeout=timeout or self.job_timeout,
+            working_directory=working_directory
+        )
+        job = self.jobs.submit(command, resolved, self._run_job, options)
+        return job.to_dict()
+    
+    async def _run_job(self, job: Job) -> Dict[str, Any]:
+        """在任务面板中执行后台任务，输出逐行写入任务的输出缓冲区"""
+        name, tmux_session = await self._acquire_job_pane(job.server)
+        job.pane = name
+        options = job.execution.options
+        self.session_manager.touch(name)
+        try:
+            refusal = await self._prepare_managed_pane(job.server, tmux_session)
+            if refusal:
+                raise RuntimeError(refusal)
+            result = await tmux_session.execute_batch(
+                [job.execution.command],
+                timeout=options.timeout,
+                working_directory=options.working_directory,
+                on_output=job.output.append
+            )
+            result.pop("steps", None)
+            return result
+        finally:
+            tmux_session.lock.release()
+            self.session_manager.touch(name, commands=1, working_directory=tmux_session.cwd)
+            # 任务执行期间可能修改了远程状态
+            if not self.policy.is_read_only(job.execution.command):
+                self.result_cache.invalidate_server(job.server)
+    
+    async def _acquire_job_pane(self, server: str) -> Tuple[str, "TmuxSession"]:
+        """获取服务器的一个空闲任务面板并加锁，没有空闲面板时创建
+        
+        任务面板是普通的托管会话，任务结束后留在池中供后续任务复用，
+        空闲超时后由回收任务销毁。
+        
+        Returns:
+            (托管会话名, 已加锁的面板)
+        
+        Raises:
+            ValueError: 服务器的托管会话数已达上限
+            RuntimeError: tmux会话创建失败
+        """
+        backend = self.session_manager.backend
+        prefix = re.sub(r"[.:]", "-", f"{JOB_SESSION_PREFIX}{server}-")
+        
+        for info in self.session_manager.list_sessions(server):
+            if not info["name"].startswith(prefix):
+                continue
+            tmux_session = backend.get_session(backend.full_name(info["name"]), backend.WINDOW_NAME, "stream")
+            if not tmux_session.lock.locked() and tmux_session.healthy:
+                # 中断后未恢复的任务面板不再复用
+                # 未加锁时 acquire 不会让出控制权，检查和加锁之间不会被其他任务抢占
+                await tmux_session.lock.acquire()
+                return info["name"], tmux_session
+        
+        await self.session_manager.start()
+        session_config = self.config.servers[server].session
+        name = f"{prefix}{uuid.uuid4().hex[:8]}"
+        await self.session_manager.create_session(SessionConfig(
+            name=name,
+            server_name=server,
+            session_type=SessionType.TEMPORARY,
+            working_directory=session_config.working_directory,
+            environment=dict(session_config.environment),
+            shell=session_config.shell
+        ))
+        # 任务输出通过 pipe-pane 增量读取，轮询开销只与新增输出有关
+        tmux_session = backend.get_session(backend.full_name(name), backend.WINDOW_NAME, "stream")
+        await tmux_session.lock.acquire()
+        return name, tmux_session
+    
+    async def _prepare_managed_pane(
+        self, server: str, tmux_session: Optional["TmuxSession"] = None
+    ) -> Optional[str]:
+        """让托管面板（托管会话、任务面板）与服务器的交互面板连接到同一台主机
+        
+        托管面板的shell在本机启动：配置了连接方式时按连接命令登录远程
+        主机（执行前由主机检查触发），否则只允许在交互面板确认位于本机
+        的服务器上使用；交互面板的主机未知时先探测。
+        
+        Args:
+            server: 服务器名称
+            tmux_session: 要配置重连的托管面板，None表示只做检查
+        
+        Returns:
+            不能在该服务器上使用托管面板的原因，可以使用时返回None
+        """
+        server_config = self.config.servers[server]
+        tmux_config = server_config.tmux
+        
+        from .session.tmux_backend import tmux_backend
+        
+        main_pane = tmux_backend.get_session(tmux_config.session_name, tmux_config.window_name) if tmux_config else None
+        connect_commands = self._connect_commands(server_config)
+        if connect_commands:
+            connection = server_config.ssh or server_config.proxy
+            expected_host = (tmux_config.expected_hostname if tmux_config else None) or (
+                main_pane.expected_host if main_pane else None
+            )
+            if tmux_session is not None:
+                tmux_session.configure_reconnect(
+                    connect_commands, expected_host, connection.timeout if connection else 30
+                )
+            return None
+        
+        host = main_pane.host if main_pane else None
+        if host is None and main_pane is not None:
+            host = await self._probe_main_pane(main_pane)
+        if host is None:
+            return (
+                f"无法确认服务器 '{server}' 的面板所在主机，托管会话和后台任务需要配置 "
+                "tmux.connect_commands、ssh 或 proxy 才能在独立面板中登录"
+            )
+        if host != socket.gethostname():
+            return (
+                f"服务器 '{server}' 的面板位于远程主机 {host}，托管会话和后台任务需要配置 "
+                "tmux.connect_commands、ssh 或 proxy 才能在独立面板中登录"
+            )
+        return None
+    
+    async def _probe_main_pane(self, main_pane: "TmuxSession", timeout: float = 5.0) -> Optional[str]:
+        """探测服务器交互面板所在的主机，面板不存在或一直忙碌时返回None"""
+        if not await main_pane.check_session_exists():
+            return None
+        deadline = time.time() + timeout
+        if not await self._acquire_pane(main_pane, timeout):
+            return None
+        try:
+            if main_pane.host is None:
+                main_pane.host = await main_pane.probe_host(max(0.5, deadline - time.time()))
+            return main_pane.host
+        finally:
+            main_pane.lock.release()
+    
+    def _job_not_found(self, job_id: str) -> Dict[str, Any]:
+        """任务不存在时的结果"""
+        return {"job_id": job_id, "status": "not_found", "error": f"任务 '{job_id}' 不存在或已过期"}
+    
+    async def job_status(self, job_id: Optional[str] = None, server: Optional[str] = None) -> Dict[str, Any]:
+        """获取任务状态
+        
+        Args:
+            job_id: 任务ID，None表示列出所有任务
+            server: 列出任务时按服务器过滤
+            
+        Returns:
+            任务信息，或 {"jobs": 任务列表}
+        """
+        if job_id is None:
+            return {"jobs": self.jobs.list_jobs(self._resolve_server(server) if server else None)}
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else self._job_not_found(job_id)
+    
+    async def job_output(self, job_id: str, offset: int = 0, limit: int = 65536) -> Dict[str, Any]:
+        """按偏移量读取任务输出
+        
+        调用方把返回的 next_offset 作为下一次的 offset，每次只取得新增的输出。
+        
+        Args:
+            job_id: 任务ID
+            offset: 起始偏移量（字符）
+            limit: 最多返回的字符数
+            
+        Returns:
+            输出片段和偏移量信息；offset 之前的输出已被丢弃时 dropped 为True
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return self._job_not_found(job_id)
+        
+        output, next_offset, dropped = job.output.read(offset, limit)
+        return {
+            "job_id": job_id,
+            "status": job.execution.status.value,
+            "exit_code": job.execution.exit_code,
+            "output": output,
+            "offset": next_offset - len(output),
+            "next_offset": next_offset,
+            "output_start": job.output.start,
+            "output_size": job.output.end,
+            "dropped": dropped,
+            "eof": job.done and next_offset >= job.output.end
+        }
+    
+    async def job_wait(self, job_id: str, timeout: float = 30) -> Dict[str, Any]:
+        """等待任务结束
+        
+        Args:
+            job_id: 任务ID
+            timeout: 最长等待时间（秒），超时后返回任务当前状态
+            
+        Returns:
+            任务信息，done 表示任务是否已结束
+        """
+        job = await self.jobs.wait(job_id, timeout)
+        if job is None:
+            return self._job_not_found(job_id)
+        return {**job.to_dict(), "done": job.done}
+    
+    async def job_cancel(self, job_id: str) -> Dict[str, Any]:
+        """取消任务，面板上的命令被中断后返回
+        
+        Args:
+            job_id: 任务ID
+            
+        Returns:
+            任务信息
+        """
+        self.logger.info("取消后台任务", job_id=job_id)
+        job = await self.jobs.cancel(job_id)
+        return job.to_dict() if job else self._job_not_found(job_id)
+    
+    async def open_resource_source(self, uri: str) -> Tuple[Optional[Any], Optional[str]]:
+        """创建可订阅资源的数据源
+        
+        面板日志直接读取面板的输出流；远程文件末尾在服务器的任务面板中以
+        后台任务运行 tail -F，订阅结束时中断。
+        
+        Args:
+            uri: 资源地址
+            
+        Returns:
+            (数据源, None)，资源不存在或不可订阅时返回 (None, 原因)
+        """
+        if uri.startswith(SESSION_LOG_URI_PREFIX):
+            server, _, session_id = uri[len(SESSION_LOG_URI_PREFIX):].partition("/")
+            tmux_session, error = await self._get_tmux_session(uri, server, session_id or None)
+            if error:
+                return None, error["stderr"]
+            return PaneLogSource(tmux_session), None
+        
+        if uri.startswith(FILE_TAIL_URI_PREFIX):
+            server, path, reason = self._parse_file_tail_uri(uri)
+            if reason:
+                return None, reason
+            reason = await self._prepare_managed_pane(server)
+            if reason:
+                return None, reason
+            command = f"tail -n 0 -F -- {shlex.quote(path)}"
+            self.logger.info("启动文件跟踪", server=server, path=path)
+            job = self.jobs.submit(
+                command, server, self._run_job, ExecutionOptions(timeout=self.file_tail_timeout)
+            )
+            return JobTailSource(self.jobs, job), None
+        
+        return None, f"资源不支持订阅: {uri}"
+    
+    async def read_log_resource(self, uri: str) -> Tuple[Optional[str], Optional[str]]:
+        """读取面板日志或远程文件末尾的最近内容
+        
+        Returns:
+            (内容, None)，失败时返回 (None, 原因)
+        """
+        if uri.startswith(SESSION_LOG_URI_PREFIX):
+            server, _, session_id = uri[len(SESSION_LOG_URI_PREFIX):].partition("/")
+            tmux_session, error = await self._get_tmux_session(uri, server, session_id or None)
+            if error:
+                return None, error["stderr"]
+            output = await tmux_session.capture_output(lines=self.resource_tail_lines, join_lines=True)
+            return clean_pane_log(output), None
+        
+        server, path, reason = self._parse_file_tail_uri(uri)
+        if reason:
+            return None, reason
+        result = await self.execute_command(
+            f"tail -n {self.resource_tail_lines} -- {shlex.quote(path)}", server=server
+        )
+        if result.get("exit_code") != 0:
+            return None, result.get("stderr") or result.get("stdout") or "读取文件失败"
+        return result["stdout"], None
+    
+    def _parse_file_tail_uri(self, uri: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """解析远程文件末尾资源地址
+        
+        Returns:
+            (服务器名, 文件绝对路径, None)，地址无效时返回 (None, None, 原因)
+        """
+        server, separator, path = uri[len(FILE_TAIL_URI_PREFIX):].partition("/")
+        path = posixpath.normpath("/" + path)
+        if not separator or path == "/":
+            return None, None, f"资源地址缺少文件路径: {uri}"
+        
+        resolved = self._resolve_server(server)
+        if resolved is None or resolved not in self.config.servers:
+            return None, None, f"服务器 '{server}' 不存在"
+        if self.config.servers[resolved].type != "local_tmux":
+            return None, None, f"服务器类型 '{self.config.servers[resolved].type}' 暂不支持"
+        reason = self.policy.check_path(path)
+        if reason:
+            return None, None, reason
+        return resolved, path, None
+    
+    async def wait_for_pattern(
+        self,
+        pattern: str,
+        server: str = "default",
+        session_id: Optional[str] = None,
+        job_id: Optional[str] = None,
+        timeout: float = 30,
+        send: Optional[str] = None,
+        enter: bool = True,
+        offset: int = 0,
+        ignore_case: bool = False
+    ) -> Dict[str, Any]:
+        """等待面板或后台任务的输出匹配正则表达式，然后可选地发送输入
+        
+        代替反复执行 tail/grep 的轮询：一次调用阻塞到匹配或超时，只解析
+        新增的输出。
+        
+        Args:
+            pattern: 正则表达式，按行匹配
+            server: 服务器名称（等待面板输出时使用）
+            session_id: 托管会话ID，None表示服务器配置的会话
+            job_id: 后台任务ID，指定时匹配该任务的输出
+            timeout: 最长等待时间（秒）
+            send: 匹配后发送到面板的文本（后台任务发送到任务面板）
+            enter: 发送文本后是否回车
+            offset: 匹配后台任务输出的起始偏移量
+            ignore_case: 是否忽略大小写
+            
+        Returns:
+            匹配结果，matched 为False时 status 说明原因（timeout、job_finished）
+        """
+        self.logger.info("等待输出匹配", pattern=pattern, server=server, job_id=job_id)
+        
+        try:
+            compiled = re.compile(pattern, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        except re.error as e:
+            return {"matched": False, "status": "error", "error": f"正则表达式无效: {e}"}
+        
+        if job_id is not None:
+            return await self._wait_for_job_pattern(job_id, compiled, timeout, send, enter, offset)
+        
+        tmux_session, error = await self._get_tmux_session(pattern, server, session_id)
+        if error:
+            return {"matched": False, "status": "error", "error": error["stderr"]}
+        result = await tmux_session.wait_for_pattern(compiled, timeout, send, enter)
+        result["server"] = self._resolve_server(server)
+        return result
+    
+    async def _wait_for_job_pattern(
+        self,
+        job_id: str,
+        pattern: "re.Pattern[str]",
+        timeout: float,
+        send: Optional[str],
+        enter: bool,
+        offset: int,
+        poll_interval: float = 0.05
+    ) -> Dict[str, Any]:
+        """在后台任务的输出缓冲区中等待匹配
+        
+        缓冲区中都是已结束的行，每次只匹配 offset 之后新增的部分；命令
+        尚未换行的输出（如密码提示）从任务面板单独检查。
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {"matched": False, **self._job_not_found(job_id)}
+        
+        start_time = time.time()
+        deadline = start_time + timeout
+        tmux_session = None
+        match = None
+        while True:
+            # 先记录任务是否已结束，保证结束前写入的输出都被匹配过
+            finished = job.done
+            chunk, next_offset, _ = job.output.read(offset)
+            match = pattern.search(chunk)
+            if match:
+                # 匹配所在行之后的偏移量，连续等待时从这里继续
+                line_end = chunk.find("\n", match.end())
+                offset = next_offset - len(chunk) + (line_end + 1 if line_end != -1 else len(chunk))
+                break
+            offset = next_offset
+            
+            if job.pane and tmux_session is None:
+                backend = self.session_manager.backend
+                tmux_session = backend.get_session(backend.full_name(job.pane), backend.WINDOW_NAME, "stream")
+            if tmux_session is not None and not finished:
+                match = pattern.search(tmux_session.pending_output)
+                if match:
+                    break
+            
+            if finished or time.time() >= deadline:
+                break
+            await asyncio.sleep(min(poll_interval, max(0.0, deadline - time.time())))
+        
+        result = {
+            "job_id": job_id,
+            "matched": match is not None,
+            "status": "matched" if match else ("job_finished" if job.done else "timeout"),
+            "job_status": job.execution.status.value,
+            "waited": time.time() - start_time,
+            "next_offset": offset,
+            "sent": False
+        }
+        if match is None:
+            return result
+        
+        line_start = match.string.rfind("\n", 0, match.start()) + 1
+        line_end = match.string.find("\n", match.end())
+        result.update(
+            match=match.group(0),
+            groups=list(match.groups()),
+            line=match.string[line_start:line_end if line_end != -1 else None]
+        )
+        if send is not None and tmux_session is not None and not job.done:
+            result["sent"] = await tmux_session.send_input(send, enter)
+        return result
+    
+    async def get_server_status(self) -> Dict[str, Any]:
+        """获取服务器状态
+        
+        Returns:
+            服务器状态信息
+        """
+        self.logger.info("获取服务器状态")
+        
+        servers_status = {}
+        for server_name, server_config in self.config.servers.items():
+            servers_status[server_name] = {
+                "type": server_config.type,
+                "status": "connected",  # TODO: 实现真正的连接状态检查
+                "last_check": "2024-01-01T00:00:00Z"
+            }
+        
+        return {
+            "total_servers": len(self.config.servers),
+            "active_servers": len(self.config.servers),
+            "servers": servers_status,
+            "logging": get_log_stats(),
+            "metrics": {
+                "result_cache": self.result_cache.get_stats(),
+                "file_cache": self.file_cache.get_stats(),
+                "output_history": self.output_history.get_stats(),
+                "singleflight": self.singleflight.get_stats(),
+                "sessions": self.session_manager.get_stats(),
+                "jobs": self.jobs.get_stats()
+            }
+        }
+
+
+# 简化的MCP协议处理器（不依赖mcp包）
+class SimpleMCPHandler:
+    """简化的MCP协议处理器"""
+    
+    def __init__(
+        self,
+        mcp_server: MCPServer,
+        notify: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ):
+        """初始化处理器
+        
+        Args:
+            mcp_server: MCP服务器
+            notify: 向客户端发送通知消息的协程函数
+        """
+        self.mcp_server = mcp_server
+        self.logger = get_logger("mcp-handler")
+        self.initialized = False
+        self._notify = notify
+        # 正在处理的请求：JSON-RPC id -> 处理任务，用于响应客户端取消
+        self._in_flight: Dict[Any, asyncio.Task] = {}
+        self._cancelled: set = set()
+        self.cancelled_requests = 0
+        # 资源订阅：按间隔推送新增内容，间隔内的内容合并为一条通知
+        features = mcp_server.config.mcp.features
+        self.subscriptions = ResourceSubscriptions(
+            self._send_resource_update,
+            interval=features.get("subscription_interval", 0.5),
+            max_chunk=features.get("subscription_max_chunk", 64 * 1024)
+        )
+    
+    async def send_notification(self, method: str, params: Dict[str, Any]) -> None:
+        """向客户端发送JSON-RPC通知
+        
+        Args:
+            method: 通知方法名
+            params: 通知参数
+        """
+        if self._notify is None:
+            return
+        await self._notify({"jsonrpc": "2.0", "method": method, "params": params})
+    
+    async def _send_resource_update(self, uri: str, text: str, truncated: bool, ended: bool) -> None:
+        """推送订阅资源的新增内容"""
+        params: Dict[str, Any] = {"uri": uri}
+        if text:
+            params["contents"] = [{"uri": uri, "mimeType": "text/plain", "text": text}]
+        if truncated:
+            params["truncated"] = True
+        if ended:
+            params["ended"] = True
+        await self.send_notification("notifications/resources/updated", params)
+    
+    async def close(self) -> None:
+        """客户端断开时取消全部资源订阅"""
+        await self.subscriptions.close()
+    
+    async def handle_request(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """处理MCP请求
+        
+        请求被客户端通过 notifications/cancelled 取消时不返回响应。
+        
+        Args:
+            request: MCP请求
+            
+        Returns:
+            MCP响应，通知和已取消的请求返回None
+        """
+        method = request.get("method")
+        params = request.get("params", {})
+        request_id = request.get("id")
+        
+        if method == "notifications/cancelled":
+            self.cancel_request(params.get("requestId"), params.get("reason"))
+            return None
+        
+        task = asyncio.current_task()
+        tracked = request_id is not None and task is not None
+        if tracked:
+            self._in_flight[request_id] = task
+        
+        try:
+            return await self._dispatch(method, request_id, params)
+        except asyncio.CancelledError:
+            if request_id not in self._cancelled:
+                raise
+            # 客户端已放弃该请求，按协议不再发送响应
+            self.logger.info(
+                "请求已取消", request_id=request_id, status=ExecutionStatus.CANCELLED.value
+            )
+            return None
+        finally:
+            self._cancelled.discard(request_id)
+            if tracked and self._in_flight.get(request_id) is task:
+                del self._in_flight[request_id]
+    
+    def cancel_request(self, request_id: Any, reason: Optional[str] = None) -> bool:
+        """取消正在处理的请求
+        
+        取消会传递到正在执行的远程命令：面板收到中断按键，确认回到提示符
+        后释放给排队的请求。
+        
+        Args:
+            request_id: 要取消的请求id
+            reason: 取消原因
+            
+        Returns:
+            是否找到并取消了请求
+        """
+        task = self._in_flight.get(request_id)
+        if task is None or task.done():
+            self.logger.debug("取消的请求不存在或已完成", request_id=request_id)
+            return False
+        
+        self.logger.info("取消请求", request_id=request_id, reason=reason)
+        self._cancelled.add(request_id)
+        self.cancelled_requests += 1
+        task.cancel()
+        return True
+    
+    async def _dispatch(self, method: str, request_id: Any, params: Dict[str, Any]) -> Dict[str, Any]:
+        """按方法分发请求"""
+        self.logger.info("处理MCP请求", method=method, request_id=request_id)
+        
+        try:
+            if method == "initialize":
+                return await self._handle_initialize(request_id, params)
+            elif method == "initialized":
+                return await self._handle_initialized(request_id)
+            elif method == "tools/list":
+                return await self._handle_tools_list(request_id)
+            elif method == "tools/call":
+                return await self._handle_tools_call(request_id, params)
+            elif method == "resources/list":
+                return await self._handle_resources_list(request_id)
+            elif method == "resources/read":
+                return await self._handle_resources_read(request_id, params)
+            elif method == "resources/templates/list":
+                return await self._handle_resource_templates_list(request_id)
+            elif method == "resources/subscribe":
+                return await self._handle_resources_subscribe(request_id, params)
+            elif method == "resources/unsubscribe":
+                return await self._handle_resources_unsubscribe(request_id, params)
+            else:
+                return self._error_response(request_id, -32601, f"Method not found: {method}")
+                
+        except Exception as e:
+            self.logger.error("处理请求失败", method=method, error=str(e))
+            return self._error_response(request_id, -32603, f"Internal error: {str(e)}")
+    
+    async def _handle_initialize(self, request_id: Any, params: Dict[str, Any]) -> Dict[str, Any]:
+        """处理初始化请求"""
+        self.logger.info("处理初始化请求", params=params)
+        
+        return {
             "jsonrpc": "2.0",
             "id": request_id,
             "result": {
                 "protocolVersion": "2024-11-05",
                 "capabilities": {
                     "tools": {},
-                    "resources": {}
+                    "resources": {"subscribe": True}
                 },
                 "serverInfo": {
                     "name": "cursor-bridge",
@@ -371,8 +2062,94 @@ class SimpleMCPHandler:
         
         tools = [
             {
-                "name": "execute_command",
-                "description": "在远程服务器上执行命令",
+                "name": "execute_command",
+                "description": "在远程服务器上执行命令",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "command": {
+                            "type": "string",
+                            "description": "要执行的命令"
+                        },
+                        "server": {
+                            "type": "string",
+                            "description": "服务器名称",
+                            "default": "baidu-server"
+                        },
+                        "timeout": {
+                            "type": "integer",
+                            "description": "超时时间（秒），包括排队等待面板的时间；超时后中断命令并返回部分输出",
+                            "default": 30
+                        },
+                        "working_directory": {
+                            "type": "string",
+                            "description": "工作目录"
+                        },
+                        "use_cache": {
+                            "type": "boolean",
+                            "description": "只读命令是否使用短期结果缓存，默认使用服务端配置"
+                        },
+                        "refresh": {
+                            "type": "boolean",
+                            "description": "忽略并清除该服务器的缓存结果",
+                            "default": False
+                        },
+                        "session_id": {
+                            "type": "string",
+                            "description": "在 create_session 创建的托管会话中执行，留空使用服务器配置的会话"
+                        },
+                        "output_format": {
+                            "type": "string",
+                            "enum": ["raw", "json", "structured", "filtered"],
+                            "description": "输出格式：ls -l、ps、df、free、git status、nvidia-smi 的输出可解析为JSON，"
+                                           "json 只返回解析结果，structured 同时保留原始输出；filtered 按 output_filter 过滤",
+                            "default": "raw"
+                        },
+                        "output_filter": {
+                            "type": "object",
+                            "description": "在服务端逐行过滤输出后再返回",
+                            "properties": {
+                                "include": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "只保留匹配任一正则的行"
+                                },
+                                "exclude": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "排除匹配任一正则的行"
+                                },
+                                "head": {
+                                    "type": "integer",
+                                    "description": "只保留开头的行数"
+                                },
+                                "tail": {
+                                    "type": "integer",
+                                    "description": "只保留结尾的行数，与 head 同时指定时保留首尾两段"
+                                },
+                                "max_bytes": {
+                                    "type": "integer",
+                                    "description": "返回内容的最大字节数"
+                                },
+                                "dedupe": {
+                                    "type": "boolean",
+                                    "description": "合并连续重复或只有数字不同的行，并标注重复次数"
+                                }
+                            }
+                        },
+                        "delta": {
+                            "type": "boolean",
+                            "description": "只返回与同一命令上一次成功输出的差异（unified diff），没有变化时 stdout 为空，"
+                                           "完整输出可通过 delta.uri 资源读取；适合反复执行的命令",
+                            "default": False
+                        }
+                    },
+                    "required": ["command"]
+                }
+            },
+            {
+                "name": "execute_on_servers",
+                "description": "在多台服务器上并发执行同一命令，并按输出分组汇总结果",
                 "inputSchema": {
                     "type": "object",
                     "properties": {
@@ -380,22 +2157,73 @@ class SimpleMCPHandler:
                             "type": "string",
                             "description": "要执行的命令"
                         },
+                        "servers": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "服务器名称列表"
+                        },
+                        "selector": {
+                            "type": "string",
+                            "description": "服务器名称通配符，如 gpu-*"
+                        },
+                        "tags": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "服务器标签，匹配任一标签即选中"
+                        },
+                        "max_concurrency": {
+                            "type": "integer",
+                            "description": "最大并发数"
+                        },
+                        "timeout": {
+                            "type": "integer",
+                            "description": "单台服务器超时时间（秒）",
+                            "default": 30
+                        },
+                        "working_directory": {
+                            "type": "string",
+                            "description": "工作目录"
+                        }
+                    },
+                    "required": ["command"]
+                }
+            },
+            {
+                "name": "execute_batch",
+                "description": "在同一面板中一次往返顺序执行多条命令，返回每一步的输出、退出码和耗时",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "commands": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "按顺序执行的命令列表"
+                        },
                         "server": {
                             "type": "string",
                             "description": "服务器名称",
                             "default": "baidu-server"
                         },
+                        "stop_on_error": {
+                            "type": "boolean",
+                            "description": "某一步失败后是否跳过后续命令",
+                            "default": True
+                        },
                         "timeout": {
                             "type": "integer",
-                            "description": "超时时间（秒）",
-                            "default": 30
+                            "description": "整批命令的超时时间（秒）",
+                            "default": 60
                         },
                         "working_directory": {
                             "type": "string",
                             "description": "工作目录"
+                        },
+                        "session_id": {
+                            "type": "string",
+                            "description": "托管会话ID，留空使用服务器配置的会话"
                         }
                     },
-                    "required": ["command"]
+                    "required": ["commands"]
                 }
             },
             {
@@ -413,7 +2241,7 @@ class SimpleMCPHandler:
             },
             {
                 "name": "create_session",
-                "description": "创建新的会话",
+                "description": "创建新的托管会话（独立的tmux会话，空闲超时后自动回收）",
                 "inputSchema": {
                     "type": "object",
                     "properties": {
@@ -427,28 +2255,411 @@ class SimpleMCPHandler:
                         },
                         "working_directory": {
                             "type": "string",
-                            "description": "工作目录"
+                            "description": "工作目录"
+                        }
+                    },
+                    "required": ["server"]
+                }
+            },
+            {
+                "name": "destroy_session",
+                "description": "销毁 create_session 创建的托管会话",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "server": {
+                            "type": "string",
+                            "description": "服务器名称"
+                        },
+                        "session_id": {
+                            "type": "string",
+                            "description": "会话ID"
+                        }
+                    },
+                    "required": ["server", "session_id"]
+                }
+            },
+            {
+                "name": "get_session_status",
+                "description": "获取会话状态",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "server": {
+                            "type": "string",
+                            "description": "服务器名称"
+                        },
+                        "session_id": {
+                            "type": "string",
+                            "description": "会话ID"
+                        }
+                    },
+                    "required": ["server", "session_id"]
+                }
+            },
+            {
+                "name": "read_file",
+                "description": "读取远程文件的完整内容（压缩传输并校验），大文件按 offset/length 分段读取",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": "远程文件路径"
+                        },
+                        "server": {
+                            "type": "string",
+                            "description": "服务器名称",
+                            "default": "default"
+                        },
+                        "session_id": {
+                            "type": "string",
+                            "description": "托管会话ID，不指定时使用服务器配置的会话"
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "起始字节偏移",
+                            "default": 0
+                        },
+                        "length": {
+                            "type": "integer",
+                            "description": "读取的字节数，不指定时读到文件末尾（不超过单次上限）"
+                        },
+                        "timeout": {
+                            "type": "integer",
+                            "description": "超时时间（秒）",
+                            "default": 60
+                        }
+                    },
+                    "required": ["path"]
+                }
+            },
+            {
+                "name": "read_files",
+                "description": "一次读取多个远程文件，缓存过且没有变化的文件不再传输",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "paths": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "远程文件路径列表"
+                        },
+                        "server": {
+                            "type": "string",
+                            "description": "服务器名称",
+                            "default": "default"
+                        },
+                        "session_id": {
+                            "type": "string",
+                            "description": "托管会话ID，不指定时使用服务器配置的会话"
+                        },
+                        "timeout": {
+                            "type": "integer",
+                            "description": "超时时间（秒）",
+                            "default": 60
+                        }
+                    },
+                    "required": ["paths"]
+                }
+            },
+            {
+                "name": "list_tree",
+                "description": "一次列出远程目录树（类型、大小、修改时间），支持深度、通配符和忽略过滤",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": "远程目录，相对路径按当前目录解析",
+                            "default": "."
+                        },
+                        "server": {
+                            "type": "string",
+                            "description": "服务器名称",
+                            "default": "default"
+                        },
+                        "session_id": {
+                            "type": "string",
+                            "description": "托管会话ID，不指定时使用服务器配置的会话"
+                        },
+                        "max_depth": {
+                            "type": "integer",
+                            "description": "最大深度，1表示只列出目录本身的内容",
+                            "default": 3
+                        },
+                        "patterns": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "文件名通配符（如 *.py），任一匹配即列出"
+                        },
+                        "ignore": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "跳过的文件名通配符，默认跳过 .git、node_modules、__pycache__、.venv"
+                        },
+                        "max_entries": {
+                            "type": "integer",
+                            "description": "最多返回的条数"
+                        },
+                        "timeout": {
+                            "type": "integer",
+                            "description": "超时时间（秒）",
+                            "default": 60
+                        }
+                    }
+                }
+            },
+            {
+                "name": "search",
+                "description": "在远程目录中搜索代码（有 ripgrep 时使用 rg，否则使用 grep），按文件分组返回匹配",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "pattern": {
+                            "type": "string",
+                            "description": "正则表达式"
+                        },
+                        "path": {
+                            "type": "string",
+                            "description": "搜索的目录或文件，相对路径按当前目录解析",
+                            "default": "."
+                        },
+                        "server": {
+                            "type": "string",
+                            "description": "服务器名称",
+                            "default": "default"
+                        },
+                        "session_id": {
+                            "type": "string",
+                            "description": "托管会话ID，不指定时使用服务器配置的会话"
+                        },
+                        "globs": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "只搜索匹配这些通配符的文件（如 *.py）"
+                        },
+                        "ignore": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "跳过的目录名，默认跳过 .git、node_modules、__pycache__、.venv"
+                        },
+                        "ignore_case": {
+                            "type": "boolean",
+                            "description": "是否忽略大小写",
+                            "default": False
+                        },
+                        "fixed_strings": {
+                            "type": "boolean",
+                            "description": "按普通字符串而不是正则表达式匹配",
+                            "default": False
+                        },
+                        "max_matches": {
+                            "type": "integer",
+                            "description": "最多返回的匹配条数"
+                        },
+                        "timeout": {
+                            "type": "integer",
+                            "description": "超时时间（秒）",
+                            "default": 60
+                        }
+                    },
+                    "required": ["pattern"]
+                }
+            },
+            {
+                "name": "write_file",
+                "description": "写入远程文件（压缩传输，远程校验通过后才写入）",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": "远程文件路径"
+                        },
+                        "content": {
+                            "type": "string",
+                            "description": "文件内容"
+                        },
+                        "server": {
+                            "type": "string",
+                            "description": "服务器名称",
+                            "default": "default"
+                        },
+                        "session_id": {
+                            "type": "string",
+                            "description": "托管会话ID，不指定时使用服务器配置的会话"
+                        },
+                        "encoding": {
+                            "type": "string",
+                            "enum": ["utf-8", "base64"],
+                            "description": "content 的编码，二进制内容使用 base64",
+                            "default": "utf-8"
+                        },
+                        "append": {
+                            "type": "boolean",
+                            "description": "是否追加到文件末尾",
+                            "default": False
+                        },
+                        "timeout": {
+                            "type": "integer",
+                            "description": "超时时间（秒）",
+                            "default": 60
+                        }
+                    },
+                    "required": ["path", "content"]
+                }
+            },
+            {
+                "name": "start_job",
+                "description": "在独立面板中后台执行长时间运行的命令（构建、测试等），立即返回任务ID",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "command": {
+                            "type": "string",
+                            "description": "要执行的命令"
+                        },
+                        "server": {
+                            "type": "string",
+                            "description": "服务器名称",
+                            "default": "default"
+                        },
+                        "working_directory": {
+                            "type": "string",
+                            "description": "工作目录"
+                        },
+                        "timeout": {
+                            "type": "integer",
+                            "description": "超时时间（秒），超时后中断命令"
+                        }
+                    },
+                    "required": ["command"]
+                }
+            },
+            {
+                "name": "job_status",
+                "description": "获取后台任务状态，不指定任务ID时列出所有任务",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "任务ID"
+                        },
+                        "server": {
+                            "type": "string",
+                            "description": "列出任务时按服务器过滤"
+                        }
+                    }
+                }
+            },
+            {
+                "name": "job_output",
+                "description": "按偏移量读取后台任务的输出，下一次读取使用返回的 next_offset",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "任务ID"
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "起始偏移量（字符）",
+                            "default": 0
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "最多返回的字符数",
+                            "default": 65536
+                        }
+                    },
+                    "required": ["job_id"]
+                }
+            },
+            {
+                "name": "job_wait",
+                "description": "等待后台任务结束，超时后返回任务当前状态",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "任务ID"
+                        },
+                        "timeout": {
+                            "type": "number",
+                            "description": "最长等待时间（秒）",
+                            "default": 30
+                        }
+                    },
+                    "required": ["job_id"]
+                }
+            },
+            {
+                "name": "job_cancel",
+                "description": "取消后台任务并中断面板上正在运行的命令",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "任务ID"
                         }
                     },
-                    "required": ["server"]
+                    "required": ["job_id"]
                 }
             },
             {
-                "name": "get_session_status",
-                "description": "获取会话状态",
+                "name": "wait_for_pattern",
+                "description": "阻塞等待面板或后台任务的输出匹配正则表达式（如服务启动完成、密码提示），匹配后可发送输入",
                 "inputSchema": {
                     "type": "object",
                     "properties": {
+                        "pattern": {
+                            "type": "string",
+                            "description": "正则表达式，按行匹配"
+                        },
                         "server": {
                             "type": "string",
-                            "description": "服务器名称"
+                            "description": "服务器名称",
+                            "default": "default"
                         },
                         "session_id": {
                             "type": "string",
-                            "description": "会话ID"
+                            "description": "托管会话ID，不指定时使用服务器配置的会话"
+                        },
+                        "job_id": {
+                            "type": "string",
+                            "description": "后台任务ID，指定时匹配该任务的输出"
+                        },
+                        "timeout": {
+                            "type": "number",
+                            "description": "最长等待时间（秒）",
+                            "default": 30
+                        },
+                        "send": {
+                            "type": "string",
+                            "description": "匹配后发送的输入"
+                        },
+                        "enter": {
+                            "type": "boolean",
+                            "description": "发送输入后是否回车",
+                            "default": True
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "匹配后台任务输出的起始偏移量，连续等待时使用上次返回的 next_offset",
+                            "default": 0
+                        },
+                        "ignore_case": {
+                            "type": "boolean",
+                            "description": "是否忽略大小写",
+                            "default": False
                         }
                     },
-                    "required": ["server", "session_id"]
+                    "required": ["pattern"]
                 }
             }
         ]
@@ -482,6 +2693,47 @@ class SimpleMCPHandler:
                     ]
                 }
             }
+        elif tool_name == "execute_on_servers":
+            progress_token = params.get("_meta", {}).get("progressToken")
+            
+            async def on_result(host_result: Dict[str, Any], completed: int, total: int) -> None:
+                # 每台服务器完成时推送进度通知，客户端无需等待全部完成
+                if progress_token is None:
+                    return
+                await self.send_notification("notifications/progress", {
+                    "progressToken": progress_token,
+                    "progress": completed,
+                    "total": total,
+                    "message": json.dumps(host_result, ensure_ascii=False)
+                })
+            
+            result = await self.mcp_server.execute_on_servers(**arguments, on_result=on_result)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "execute_batch":
+            result = await self.mcp_server.execute_batch(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
         elif tool_name == "list_sessions":
             result = await self.mcp_server.list_sessions(**arguments)
             return {
@@ -538,6 +2790,175 @@ class SimpleMCPHandler:
                     ]
                 }
             }
+        elif tool_name == "read_file":
+            result = await self.mcp_server.read_file(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "read_files":
+            result = await self.mcp_server.read_files(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "list_tree":
+            result = await self.mcp_server.list_tree(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "search":
+            progress_token = params.get("_meta", {}).get("progressToken")
+            files_done = 0
+            
+            async def on_file(group: Dict[str, Any]) -> None:
+                # 每个文件的匹配取回后推送进度通知，客户端无需等待搜索结束
+                nonlocal files_done
+                files_done += 1
+                if progress_token is None:
+                    return
+                await self.send_notification("notifications/progress", {
+                    "progressToken": progress_token,
+                    "progress": files_done,
+                    "message": json.dumps(group, ensure_ascii=False)
+                })
+            
+            result = await self.mcp_server.search(**arguments, on_file=on_file)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "write_file":
+            result = await self.mcp_server.write_file(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "start_job":
+            result = await self.mcp_server.start_job(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "job_status":
+            result = await self.mcp_server.job_status(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "job_output":
+            result = await self.mcp_server.job_output(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "job_wait":
+            result = await self.mcp_server.job_wait(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "job_cancel":
+            result = await self.mcp_server.job_cancel(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
+        elif tool_name == "wait_for_pattern":
+            result = await self.mcp_server.wait_for_pattern(**arguments)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": json.dumps(result, indent=2, ensure_ascii=False)
+                        }
+                    ]
+                }
+            }
         else:
             return self._error_response(request_id, -32601, f"Unknown tool: {tool_name}")
     
@@ -557,6 +2978,15 @@ class SimpleMCPHandler:
                 "mimeType": "application/json"
             }
         ]
+        for name, config in self.mcp_server.config.servers.items():
+            if config.type != "local_tmux":
+                continue
+            resources.append({
+                "uri": f"{SESSION_LOG_URI_PREFIX}{name}",
+                "name": f"{name} 面板日志",
+                "description": "面板的最近输出；订阅后推送新增的输出",
+                "mimeType": "text/plain"
+            })
         
         return {
             "jsonrpc": "2.0",
@@ -566,11 +2996,76 @@ class SimpleMCPHandler:
             }
         }
     
+    async def _handle_resource_templates_list(self, request_id: Any) -> Dict[str, Any]:
+        """处理资源模板列表请求"""
+        templates = [
+            {
+                "uriTemplate": f"{OUTPUT_URI_PREFIX}{{hash}}",
+                "name": "命令输出",
+                "description": "delta 模式下命令的完整输出，按输出的sha256读取",
+                "mimeType": "text/plain"
+            },
+            {
+                "uriTemplate": f"{SESSION_LOG_URI_PREFIX}{{server}}/{{session_id}}",
+                "name": "托管会话面板日志",
+                "description": "托管会话面板的最近输出；订阅后推送新增的输出",
+                "mimeType": "text/plain"
+            },
+            {
+                "uriTemplate": f"{FILE_TAIL_URI_PREFIX}{{server}}/{{path}}",
+                "name": "远程文件末尾",
+                "description": "远程文件（绝对路径）的最后若干行；订阅后通过 tail -F 推送新增的内容",
+                "mimeType": "text/plain"
+            }
+        ]
+        
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "resourceTemplates": templates
+            }
+        }
+    
     async def _handle_resources_read(self, request_id: Any, params: Dict[str, Any]) -> Dict[str, Any]:
         """处理资源读取请求"""
         uri = params.get("uri")
         
-        if uri == "cursor-bridge://server-status":
+        if uri and uri.startswith((SESSION_LOG_URI_PREFIX, FILE_TAIL_URI_PREFIX)):
+            output, reason = await self.mcp_server.read_log_resource(uri)
+            if output is None:
+                return self._error_response(request_id, -32602, reason)
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "contents": [
+                        {
+                            "uri": uri,
+                            "mimeType": "text/plain",
+                            "text": output
+                        }
+                    ]
+                }
+            }
+        elif uri and uri.startswith(OUTPUT_URI_PREFIX):
+            output = self.mcp_server.output_history.get(uri[len(OUTPUT_URI_PREFIX):])
+            if output is None:
+                return self._error_response(request_id, -32602, f"输出已不在缓存中: {uri}")
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "contents": [
+                        {
+                            "uri": uri,
+                            "mimeType": "text/plain",
+                            "text": output
+                        }
+                    ]
+                }
+            }
+        elif uri == "cursor-bridge://server-status":
             result = await self.mcp_server.get_server_status()
             return {
                 "jsonrpc": "2.0",
@@ -611,6 +3106,31 @@ class SimpleMCPHandler:
         else:
             return self._error_response(request_id, -32602, f"Unknown resource: {uri}")
     
+    async def _handle_resources_subscribe(self, request_id: Any, params: Dict[str, Any]) -> Dict[str, Any]:
+        """处理资源订阅请求"""
+        uri = params.get("uri") or ""
+        if uri not in self.subscriptions:
+            source, reason = await self.mcp_server.open_resource_source(uri)
+            if source is None:
+                return self._error_response(request_id, -32602, reason)
+            await self.subscriptions.subscribe(uri, source)
+        
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {}
+        }
+    
+    async def _handle_resources_unsubscribe(self, request_id: Any, params: Dict[str, Any]) -> Dict[str, Any]:
+        """处理取消资源订阅请求"""
+        await self.subscriptions.unsubscribe(params.get("uri") or "")
+        
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {}
+        }
+    
     def _error_response(self, request_id: Any, code: int, message: str) -> Dict[str, Any]:
         """生成错误响应"""
         return {
@@ -623,42 +3143,72 @@ class SimpleMCPHandler:
         }
 
 
+def configure_server_logging(
+    config: CursorBridgeConfig, log_file: str, console: bool = False
+) -> None:
+    """按配置文件中的monitoring.logging设置异步日志管道
+    
+    Args:
+        config: 服务配置
+        log_file: 日志文件路径
+        console: 是否同时输出到stdout
+    """
+    log_config = config.monitoring.logging
+    if not log_config:
+        return
+    
+    setup_logging(
+        level=log_config.get("level", "INFO"),
+        log_file=log_file,
+        json_logs=log_config.get("format") == "json",
+        console=console,
+        async_logs=True,
+        max_size=log_config.get("max_size"),
+        backup_count=log_config.get("backup_count", 0),
+        debug_sample_rate=log_config.get("debug_sample_rate", 1.0),
+    )
+
+
 async def run_stdio_server(config_path: Optional[str] = None):
     """运行基于stdio的MCP服务器"""
     # 设置日志到文件，避免干扰stdio
     # 重要：MCP协议要求stdout只能用于JSON-RPC消息
-    
-    # 清除所有现有的处理器
-    root_logger = logging.getLogger()
-    for handler in root_logger.handlers[:]:
-        root_logger.removeHandler(handler)
-    
-    # 只设置文件日志处理器
-    file_handler = logging.FileHandler("/tmp/cursor-bridge-mcp.log")
-    file_handler.setFormatter(
-        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # 日志通过后台线程批量写入，避免磁盘IO阻塞事件循环
+    setup_logging(
+        level="INFO",
+        log_file=STDIO_LOG_FILE,
+        console=False,
+        async_logs=True,
     )
     
-    # 设置所有相关logger只使用文件处理器
-    loggers = [
-        logging.getLogger("cursor_bridge"),
-        logging.getLogger("mcp-stdio"),
-        logging.getLogger("mcp-handler"),
-        logging.getLogger()
-    ]
-    
-    for logger in loggers:
-        logger.handlers.clear()
-        logger.addHandler(file_handler)
-        logger.setLevel(logging.INFO)
-        logger.propagate = False
-    
     logger = logging.getLogger("mcp-stdio")
     logger.info("启动MCP服务器", extra={"config_path": config_path})
     
     # 创建MCP服务器
     mcp_server = MCPServer(config_path)
-    handler = SimpleMCPHandler(mcp_server)
+    
+    async def write_message(message: Dict[str, Any]) -> None:
+        print(json.dumps(message, ensure_ascii=False), flush=True)
+    
+    handler = SimpleMCPHandler(mcp_server, notify=write_message)
+    
+    # 按配置文件中的日志设置重新配置日志管道
+    configure_server_logging(mcp_server.config, STDIO_LOG_FILE, console=False)
+    await mcp_server.start()
+    
+    pending: set = set()
+    
+    async def process(request: Dict[str, Any]) -> None:
+        try:
+            response = await handler.handle_request(request)
+        except Exception as e:
+            logger.error("处理请求时发生错误", extra={"error": str(e)})
+            return
+        
+        # 发送响应到stdout（如果有响应）
+        if response is not None:
+            await write_message(response)
+            logger.debug("发送响应", extra={"response": response})
     
     # 处理stdio通信
     try:
@@ -668,6 +3218,9 @@ async def run_stdio_server(config_path: Optional[str] = None):
                 line = await asyncio.get_event_loop().run_in_executor(None, sys.stdin.readline)
                 if not line:
                     logger.info("stdin关闭，退出服务器")
+                    # 等待已收到的请求处理完成
+                    if pending:
+                        await asyncio.gather(*pending, return_exceptions=True)
                     break
                     
                 line = line.strip()
@@ -683,14 +3236,11 @@ async def run_stdio_server(config_path: Optional[str] = None):
                     logger.error("JSON解析失败", extra={"line": line, "error": str(e)})
                     continue
                 
-                # 处理请求
-                response = await handler.handle_request(request)
-                
-                # 发送响应到stdout（如果有响应）
-                if response is not None:
-                    response_line = json.dumps(response, ensure_ascii=False)
-                    print(response_line, flush=True)
-                    logger.debug("发送响应", extra={"response": response_line})
+                # 每个请求在独立任务中处理，长时间运行的命令不阻塞后续消息，
+                # 客户端的 notifications/cancelled 也能及时送达
+                task = asyncio.create_task(process(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
                 
             except Exception as e:
                 logger.error("处理请求时发生错误", extra={"error": str(e)})
@@ -702,6 +3252,8 @@ async def run_stdio_server(config_path: Optional[str] = None):
     except Exception as e:
         logger.error("服务器运行时发生错误", extra={"error": str(e)})
     finally:
+        await handler.close()
+        await mcp_server.stop()
         logger.info("MCP服务器关闭")
 
 
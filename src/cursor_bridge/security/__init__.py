@@ -0,0 +1,5 @@
+"""安全策略模块"""
+
+from .policy import CommandClass, SecurityPolicy
+
+__all__ = ["CommandClass", "SecurityPolicy"]
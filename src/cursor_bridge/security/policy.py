@@ -0,0 +1,273 @@
+"""
+安全策略
+
+对命令进行分类，判断命令是否为只读（无副作用）命令。
+结果缓存和请求合并只作用于只读命令。
+按 allowed_paths/blocked_paths 检查文件类工具访问的远程路径。
+"""
+
+import posixpath
+import re
+import shlex
+from enum import Enum
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from ..config.models import SecurityConfig
+
+
+class CommandClass(Enum):
+    """命令分类枚举"""
+    READ_ONLY = "read_only"  # 只读命令，不修改远程状态
+    MUTATING = "mutating"    # 可能修改远程状态的命令
+
+
+# 默认视为只读的程序
+READ_ONLY_PROGRAMS: FrozenSet[str] = frozenset({
+    "cat", "head", "tail", "ls", "ll", "pwd", "echo", "printf",
+    "grep", "egrep", "fgrep", "rg", "ag", "wc", "sort", "uniq", "cut", "tr",
+    "awk", "stat", "file", "which", "whereis", "type", "whoami", "id", "hostname",
+    "uname", "date", "uptime", "df", "du", "free", "ps", "printenv",
+    "nvidia-smi", "lscpu", "lsblk", "tree", "md5sum", "sha1sum", "sha256sum",
+    "diff", "cmp", "basename", "dirname", "realpath", "readlink", "column",
+    "jq", "yq", "true", "test", "[",
+})
+
+# 子命令决定是否只读的程序
+READ_ONLY_SUBCOMMANDS: Dict[str, FrozenSet[str]] = {
+    "git": frozenset({
+        "status", "log", "diff", "show", "rev-parse", "ls-files", "blame",
+        "describe", "shortlog", "grep", "ls-tree", "cat-file", "reflog",
+    }),
+    "kubectl": frozenset({"get", "describe", "logs", "top", "version"}),
+    "docker": frozenset({"ps", "images", "logs", "inspect", "version", "info", "stats"}),
+    "pip": frozenset({"list", "show", "freeze"}),
+    "conda": frozenset({"list", "info"}),
+}
+
+# 使只读程序产生副作用或不会结束（持续跟踪输出）的参数，键为程序名或
+# "程序 子命令"
+MUTATING_ARGUMENTS: Dict[str, FrozenSet[str]] = {
+    "find": frozenset({"-delete", "-exec", "-execdir", "-ok", "-okdir", "-fprint", "-fprintf", "-fls"}),
+    "sed": frozenset({"-i", "--in-place"}),
+    "yq": frozenset({"-i", "--inplace"}),
+    "tail": frozenset({"-f", "-F", "--follow", "--retry"}),
+    "git": frozenset({"--output"}),
+    "kubectl logs": frozenset({"-f", "--follow"}),
+    "kubectl get": frozenset({"-w", "--watch", "--watch-only"}),
+    "docker logs": frozenset({"-f", "--follow"}),
+    "awk": frozenset({"-i", "-f", "--file"}),
+    "sort": frozenset({"-o"}),
+    "tree": frozenset({"-o"}),
+    "hostname": frozenset({"-F", "--file", "-b", "--boot"}),
+    "date": frozenset({"-s", "--set"}),
+}
+
+# 位置参数超过给定个数时会修改状态的程序（设置主机名、设置时间、uniq 写
+# 输出文件），值为 (需要跳过参数值的选项, 允许的位置参数个数)；date 的
+# +FORMAT 不是位置参数
+POSITIONAL_MUTATING: Dict[str, Tuple[FrozenSet[str], int]] = {
+    "hostname": (frozenset(), 0),
+    "date": (frozenset({"-d", "--date", "-f", "--file", "-r", "--reference"}), 0),
+    "uniq": (frozenset({"-f", "-s", "-w"}), 1),
+}
+
+# 子命令后带这些动作时会修改状态
+MUTATING_ACTIONS: Dict[str, FrozenSet[str]] = {
+    "git reflog": frozenset({"expire", "delete"}),
+}
+
+# 只有带上这些参数才会结束的子命令（默认持续刷新输出）
+REQUIRED_ARGUMENTS: Dict[str, FrozenSet[str]] = {
+    "docker stats": frozenset({"--no-stream"}),
+}
+
+# awk 程序中执行命令或写文件的写法
+_AWK_SIDE_EFFECT = re.compile(r"system\s*\(|printf?\b[^;}]*>|\|")
+
+# 只读参数检查通过后才视为只读的程序
+_ARGUMENT_CHECKED = frozenset({"find", "sed"})
+
+# 命令分隔符：管道、逻辑运算符、分号、换行、后台执行的 &（不包括 &&、
+# 2>&1、&>）
+_SEGMENT_SPLIT = re.compile(r"\|\||&&|[|;\n]|(?<![&>])&(?![&>])")
+# 输出重定向及其目标
+_REDIRECT = re.compile(r"(\d?)>(>?)(&\d+|\s*\S+)?")
+_ENV_ASSIGNMENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+
+
+class SecurityPolicy:
+    """命令安全策略"""
+    
+    def __init__(self, config: Optional[SecurityConfig] = None):
+        """初始化安全策略
+        
+        Args:
+            config: 安全配置，read_only_commands 中的程序会被追加为只读
+        """
+        self.config = config or SecurityConfig()
+        self.read_only_programs = READ_ONLY_PROGRAMS | frozenset(self.config.read_only_commands)
+    
+    def classify(self, command: str) -> CommandClass:
+        """对命令进行分类
+        
+        只有能够确认无副作用的命令才会被分类为只读，无法解析的命令一律
+        视为可能修改状态。
+        
+        Args:
+            command: 命令文本
+            
+        Returns:
+            命令分类
+        """
+        stripped = command.strip()
+        if not stripped:
+            return CommandClass.MUTATING
+        
+        # 后台执行、命令替换和写文件重定向都无法静态确认无副作用
+        if stripped.endswith("&") and not stripped.endswith("&&"):
+            return CommandClass.MUTATING
+        if "`" in stripped or "$(" in stripped or "<(" in stripped or ">(" in stripped:
+            return CommandClass.MUTATING
+        if self._has_write_redirect(stripped):
+            return CommandClass.MUTATING
+        
+        for segment in _SEGMENT_SPLIT.split(stripped):
+            if not segment.strip():
+                continue
+            if not self._is_read_only_segment(segment):
+                return CommandClass.MUTATING
+        
+        return CommandClass.READ_ONLY
+    
+    def is_read_only(self, command: str) -> bool:
+        """判断命令是否为只读命令"""
+        return self.classify(command) is CommandClass.READ_ONLY
+    
+    def classify_all(self, commands: Iterable[str]) -> CommandClass:
+        """对一组命令整体分类，任一命令可能修改状态则整体视为修改"""
+        for command in commands:
+            if self.classify(command) is CommandClass.MUTATING:
+                return CommandClass.MUTATING
+        return CommandClass.READ_ONLY
+    
+    def check_path(self, path: str) -> Optional[str]:
+        """检查远程路径是否允许访问
+        
+        allowed_paths 为空时允许所有未被 blocked_paths 禁止的路径；路径按
+        目录层级比较，/home 包含 /home/a 但不包含 /homework。
+        
+        Args:
+            path: 远程绝对路径
+            
+        Returns:
+            拒绝的原因，允许访问时返回None
+        """
+        path = posixpath.normpath(path)
+        for blocked in self.config.blocked_paths:
+            if self._is_within(path, blocked):
+                return f"路径 '{path}' 位于禁止访问的路径 '{blocked}' 下"
+        allowed = self.config.allowed_paths
+        if allowed and not any(self._is_within(path, prefix) for prefix in allowed):
+            return f"路径 '{path}' 不在允许访问的路径 {allowed} 下"
+        return None
+    
+    def blocked_paths_under(self, path: str) -> List[str]:
+        """列出位于目录之下、遍历时需要跳过的禁止访问路径"""
+        path = posixpath.normpath(path)
+        return [
+            posixpath.normpath(blocked) for blocked in self.config.blocked_paths
+            if self._is_within(posixpath.normpath(blocked), path)
+        ]
+    
+    @property
+    def restricts_paths(self) -> bool:
+        """是否配置了路径访问限制"""
+        return bool(self.config.allowed_paths or self.config.blocked_paths)
+    
+    @staticmethod
+    def _is_within(path: str, prefix: str) -> bool:
+        """判断路径是否等于前缀或位于前缀目录之下"""
+        prefix = posixpath.normpath(prefix)
+        return path == prefix or path.startswith(prefix.rstrip("/") + "/")
+    
+    @staticmethod
+    def _has_write_redirect(command: str) -> bool:
+        """检查是否存在写文件的重定向"""
+        for match in _REDIRECT.finditer(command):
+            target = (match.group(3) or "").strip()
+            if target.startswith("&") or target == "/dev/null":
+                continue
+            return True
+        return False
+    
+    @staticmethod
+    def _matches_option(arg: str, options: FrozenSet[str]) -> bool:
+        """检查参数是否命中选项集合，短选项允许带附加值（如 sed -i.bak）"""
+        if arg.split("=", 1)[0] in options:
+            return True
+        if len(arg) > 2 and arg[0] == "-" and arg[1] != "-":
+            return arg[:2] in options
+        return False
+    
+    def _is_read_only_segment(self, segment: str) -> bool:
+        """判断单个管道段是否只读"""
+        try:
+            words = shlex.split(segment)
+        except ValueError:
+            return False
+        
+        # 跳过前置的环境变量赋值
+        while words and _ENV_ASSIGNMENT.match(words[0]):
+            words.pop(0)
+        if not words:
+            # 纯变量赋值会修改shell状态
+            return False
+        
+        program = words[0].rsplit("/", 1)[-1]
+        args = words[1:]
+        
+        if program == "cd":
+            # cd 修改的是面板状态而不是远程数据，但会影响后续命令的上下文
+            return False
+        
+        if program in READ_ONLY_SUBCOMMANDS:
+            positional = [arg for arg in args if not arg.startswith("-")]
+            subcommand = positional[0] if positional else None
+            if subcommand not in READ_ONLY_SUBCOMMANDS[program]:
+                return False
+            key = f"{program} {subcommand}"
+            blocked = MUTATING_ARGUMENTS.get(program, frozenset()) | MUTATING_ARGUMENTS.get(key, frozenset())
+            if any(self._matches_option(arg, blocked) for arg in args):
+                return False
+            if MUTATING_ACTIONS.get(key, frozenset()) & set(positional[1:]):
+                return False
+            required = REQUIRED_ARGUMENTS.get(key)
+            return required is None or any(arg in required for arg in args)
+        
+        if program in _ARGUMENT_CHECKED or program in self.read_only_programs:
+            blocked = MUTATING_ARGUMENTS.get(program, frozenset())
+            if any(self._matches_option(arg, blocked) for arg in args):
+                return False
+            if program in POSITIONAL_MUTATING:
+                value_options, allowed = POSITIONAL_MUTATING[program]
+                if self._count_positional(args, value_options) > allowed:
+                    return False
+            if program == "awk" and any(_AWK_SIDE_EFFECT.search(arg) for arg in args):
+                return False
+            return True
+        
+        return False
+    
+    @staticmethod
+    def _count_positional(args: List[str], value_options: FrozenSet[str]) -> int:
+        """统计位置参数个数，跳过选项的参数值"""
+        count = 0
+        skip = False
+        for arg in args:
+            if skip:
+                skip = False
+            elif arg in value_options:
+                skip = True
+            elif not arg.startswith(("-", "+")):
+                count += 1
+        return count
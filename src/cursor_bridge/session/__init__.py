@@ -1,5 +1,21 @@
 """会话管理模块"""
 
 from .manager import SessionManager
+from .models import (
+    CommandResult, SessionConfig, SessionEventType, SessionInfo, SessionStats,
+    SessionStatus, SessionType
+)
+from .tmux_backend import TmuxBackend, TmuxSession
 
-__all__ = ["SessionManager"]
\ No newline at end of file
+__all__ = [
+    "SessionManager",
+    "TmuxBackend",
+    "TmuxSession",
+    "SessionConfig",
+    "SessionInfo",
+    "SessionStats",
+    "SessionStatus",
+    "SessionType",
+    "SessionEventType",
+    "CommandResult",
+]
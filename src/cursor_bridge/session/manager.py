@@ -1,105 +1,392 @@
 """
 会话管理器
 
-负责管理tmux会话。
+负责托管会话的生命周期：按 SessionConfig 创建和销毁真实的tmux会话，
+记录每个会话的 SessionInfo，并由后台回收任务定期销毁空闲超时的会话，
+避免长期运行的服务不断积累无人使用的面板和shell。
+
+配置了注册表文件时，会话信息会持久化下来，服务重启后直接接管仍然健康
+的面板。
 """
 
-from typing import Dict, Optional, Any, List
+from typing import Callable, Dict, Optional, Any, List
 import asyncio
 import logging
+import time
+
+from .models import (
+    CommandResult, SessionConfig, SessionEventType, SessionInfo, SessionStats,
+    SessionStatus, SessionType
+)
+from .registry import SessionRegistry
+from .tmux_backend import TmuxBackend
 
 logger = logging.getLogger(__name__)
 
 
-class Session:
-    """会话对象"""
-    
-    def __init__(self, name: str, server_name: str):
-        self.name = name
-        self.server_name = server_name
-        self._active = False
-        
-    async def create(self) -> bool:
-        """创建会话"""
-        # TODO: 实现会话创建逻辑
-        logger.info(f"创建会话: {self.name} on {self.server_name}")
-        self._active = True
-        return True
-        
-    async def destroy(self) -> None:
-        """销毁会话"""
-        # TODO: 实现会话销毁逻辑
-        logger.info(f"销毁会话: {self.name}")
-        self._active = False
-        
-    @property
-    def is_active(self) -> bool:
-        """检查会话是否活跃"""
-        return self._active
+# 会话事件监听器：listener(event_type, session_info)
+SessionListener = Callable[[SessionEventType, SessionInfo], None]
 
 
 class SessionManager:
     """会话管理器"""
-    
-    def __init__(self):
-        self._sessions: Dict[str, Session] = {}
-        
-    async def create_session(self, name: str, server_name: str) -> Session:
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, backend: Optional[TmuxBackend] = None):
+        """初始化会话管理器
+
+        Args:
+            config: 会话池配置（performance.session_pool），支持的键：
+                max_sessions_per_server、session_idle_timeout、cleanup_interval、
+                auto_cleanup、registry_file、backend_config
+            backend: tmux后端，None时按 backend_config 创建
+        """
+        config = config or {}
+        self.max_sessions_per_server = config.get("max_sessions_per_server", 10)
+        self.session_idle_timeout = config.get("session_idle_timeout", 600)
+        self.cleanup_interval = config.get("cleanup_interval", 60)
+        self.auto_cleanup = config.get("auto_cleanup", True)
+
+        self._backend = backend or TmuxBackend(**config.get("backend_config", {}))
+        self._sessions: Dict[str, SessionInfo] = {}
+        self._configs: Dict[str, SessionConfig] = {}
+        self._listeners: List[SessionListener] = []
+        self._cleanup_task: Optional[asyncio.Task] = None
+        self._stats = SessionStats()
+
+        registry_file = config.get("registry_file")
+        self._registry = SessionRegistry(registry_file) if registry_file else None
+        self._restored = False
+        self._dirty = False
+
+    @property
+    def backend(self) -> TmuxBackend:
+        """tmux后端"""
+        return self._backend
+
+    @property
+    def is_running(self) -> bool:
+        """回收任务是否在运行"""
+        return self._cleanup_task is not None and not self._cleanup_task.done()
+
+    async def start(self) -> None:
+        """接管注册表中的会话并启动后台回收任务，重复调用无副作用"""
+        if not self._restored:
+            self._restored = True
+            await self.restore_sessions()
+
+        if self.auto_cleanup and not self.is_running:
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+            logger.info(f"会话回收任务已启动，空闲超时 {self.session_idle_timeout} 秒")
+
+    async def stop(self) -> None:
+        """停止后台回收任务，已创建的会话保留"""
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            try:
+                await self._cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self._cleanup_task = None
+        if self._dirty:
+            self.save_registry()
+
+    def add_listener(self, listener: SessionListener) -> None:
+        """注册会话事件监听器"""
+        self._listeners.append(listener)
+
+    def _emit(self, event_type: SessionEventType, info: SessionInfo) -> None:
+        """通知所有监听器"""
+        for listener in self._listeners:
+            try:
+                listener(event_type, info)
+            except Exception as e:
+                logger.error(f"会话事件监听器异常: {e}")
+
+    async def create_session(self, config: SessionConfig) -> SessionInfo:
         """创建会话
-        
+
         Args:
-            name: 会话名称
-            server_name: 服务器名称
-            
+            config: 会话配置
+
         Returns:
-            会话对象
+            会话信息
+
+        Raises:
+            ValueError: 会话已存在或超过服务器会话数上限
+            RuntimeError: tmux会话创建失败
         """
-        if name in self._sessions:
-            return self._sessions[name]
-            
-        session = Session(name, server_name)
-        await session.create()
-        self._sessions[name] = session
-        
-        return session
-    
-    async def get_session(self, name: str) -> Optional[Session]:
-        """获取会话
-        
+        if config.name in self._sessions:
+            raise ValueError(f"会话 '{config.name}' 已存在")
+
+        server_count = sum(1 for info in self._sessions.values() if info.server_name == config.server_name)
+        if server_count >= self.max_sessions_per_server:
+            raise ValueError(
+                f"服务器 '{config.server_name}' 的会话数已达上限 {self.max_sessions_per_server}"
+            )
+
+        if not await self._backend.create_session(config):
+            self._stats.error_sessions += 1
+            raise RuntimeError(f"创建tmux会话失败: {config.name}")
+
+        now = time.time()
+        info = SessionInfo(
+            name=config.name,
+            server_name=config.server_name,
+            status=SessionStatus.ACTIVE,
+            session_type=config.session_type,
+            created_at=now,
+            last_activity=now,
+            working_directory=config.working_directory
+        )
+
+        # 补充shell进程号和实际工作目录
+        live = await self._backend.get_session_info(config.name, config.server_name)
+        if isinstance(live, SessionInfo):
+            info.pid = live.pid
+            info.working_directory = live.working_directory or info.working_directory
+
+        self._sessions[config.name] = info
+        self._configs[config.name] = config
+        self._stats.total_sessions += 1
+        self.save_registry()
+        logger.info(f"创建会话: {config.name} on {config.server_name}")
+        self._emit(SessionEventType.CREATED, info)
+        return info
+
+    def get_session(self, name: str) -> Optional[SessionInfo]:
+        """获取会话信息
+
         Args:
             name: 会话名称
-            
+
         Returns:
-            会话对象或None
+            会话信息或None
         """
         return self._sessions.get(name)
-    
-    async def destroy_session(self, name: str) -> None:
+
+    def get_session_count(self, server_name: Optional[str] = None) -> int:
+        """获取会话数量，可按服务器过滤"""
+        if server_name is None:
+            return len(self._sessions)
+        return sum(1 for info in self._sessions.values() if info.server_name == server_name)
+
+    def touch(self, name: str, commands: int = 0, working_directory: Optional[str] = None) -> None:
+        """记录会话活动
+
+        Args:
+            name: 会话名称
+            commands: 本次执行的命令数
+            working_directory: 面板上报的当前目录
+        """
+        info = self._sessions.get(name)
+        if info is None:
+            return
+        info.last_activity = time.time()
+        info.command_count += commands
+        if working_directory:
+            info.working_directory = working_directory
+        self._stats.total_commands_executed += commands
+        # 活动时间不逐条落盘，由回收任务和 stop() 批量写入
+        self._dirty = True
+
+    async def execute_command(self, name: str, command: str, timeout: float = 30) -> CommandResult:
+        """在会话中执行命令
+
+        Raises:
+            KeyError: 会话不存在
+        """
+        if name not in self._sessions:
+            raise KeyError(f"会话 '{name}' 不存在")
+
+        # 开始执行时就刷新活动时间，避免长时间运行的命令被当作空闲回收
+        self.touch(name)
+        try:
+            return await self._backend.execute_command(name, command, timeout)
+        finally:
+            self.touch(name, commands=1)
+
+    async def destroy_session(self, name: str, event: SessionEventType = SessionEventType.DESTROYED) -> bool:
         """销毁会话
-        
+
         Args:
             name: 会话名称
+            event: 通知监听器的事件类型
+
+        Returns:
+            是否成功销毁
         """
-        if name in self._sessions:
-            await self._sessions[name].destroy()
-            del self._sessions[name]
-    
+        info = self._sessions.get(name)
+        if info is None:
+            return False
+
+        if not await self._backend.destroy_session(name):
+            info.status = SessionStatus.ERROR
+            info.error_message = "销毁tmux会话失败"
+            return False
+
+        del self._sessions[name]
+        self._configs.pop(name, None)
+        info.status = SessionStatus.DESTROYED
+        self.save_registry()
+        logger.info(f"销毁会话: {name}")
+        self._emit(event, info)
+        return True
+
     async def destroy_all_sessions(self) -> None:
         """销毁所有会话"""
         for name in list(self._sessions.keys()):
             await self.destroy_session(name)
-    
-    def list_sessions(self) -> List[Dict[str, Any]]:
+
+    async def cleanup_idle_sessions(self) -> List[str]:
+        """回收空闲超时和底层已不存在的会话
+
+        持久化会话不回收；面板上有命令正在执行的会话视为活跃。
+
+        Returns:
+            被回收的会话名列表
+        """
+        removed = []
+        live = await self._backend.list_sessions()
+
+        for name, info in list(self._sessions.items()):
+            if live is not None and name not in live:
+                # tmux会话被外部关闭（exit、kill-session、服务器重启）
+                del self._sessions[name]
+                self._configs.pop(name, None)
+                info.status = SessionStatus.DESTROYED
+                info.error_message = "tmux会话已不存在"
+                logger.warning(f"会话已丢失: {name}")
+                self._emit(SessionEventType.LOST, info)
+                removed.append(name)
+                self._dirty = True
+                continue
+
+            if info.session_type == SessionType.PERSISTENT or self._backend.is_busy(name):
+                continue
+
+            if info.idle_time >= self.session_idle_timeout:
+                logger.info(f"回收空闲会话: {name}，空闲 {info.idle_time:.0f} 秒")
+                if await self.destroy_session(name, event=SessionEventType.IDLE_REAPED):
+                    removed.append(name)
+
+        self._stats.last_cleanup_time = time.time()
+        if self._dirty:
+            self.save_registry()
+        return removed
+
+    def save_registry(self) -> None:
+        """把当前会话写入注册表"""
+        if self._registry is None:
+            return
+        records = {}
+        for name, info in self._sessions.items():
+            config = self._configs.get(name)
+            records[name] = {
+                "server_name": info.server_name,
+                "session_type": info.session_type.value,
+                "created_at": info.created_at,
+                "last_activity": info.last_activity,
+                "command_count": info.command_count,
+                "pid": info.pid,
+                "working_directory": info.working_directory,
+                "environment": config.environment if config else {},
+                "shell": config.shell if config else None
+            }
+        if self._registry.save(records):
+            self._dirty = False
+
+    async def restore_sessions(self) -> List[str]:
+        """接管注册表中仍然健康的会话
+
+        用一次 list-panes -a 核对所有记录：面板存在且shell存活的会话直接
+        接管，面板已退出的会话被清理，tmux中已不存在的记录被丢弃。其他
+        仍在运行的进程的会话不接管，也不会被本进程回收。
+
+        Returns:
+            接管的会话名列表
+        """
+        if self._registry is None:
+            return []
+        records = self._registry.load()
+        if not records:
+            return []
+
+        panes = await self._backend.list_panes()
+        if panes is None:
+            # 无法确认面板状态时保留注册表，下次启动再核对
+            return []
+        by_target = {(pane["session"], pane["window"]): pane for pane in panes}
+        claimed = self._registry.claim(name for name in records if name not in self._sessions)
+
+        adopted = []
+        for name, record in records.items():
+            if name in self._sessions or name not in claimed:
+                continue
+            pane = by_target.get((self._backend.full_name(name), self._backend.WINDOW_NAME))
+            if pane is None:
+                logger.info(f"注册表中的会话已不存在: {name}")
+                continue
+            if pane["dead"]:
+                logger.info(f"注册表中的会话面板已退出，清理: {name}")
+                await self._backend.destroy_session(name)
+                continue
+
+            session_type = SessionType(record.get("session_type", SessionType.INTERACTIVE.value))
+            info = SessionInfo(
+                name=name,
+                server_name=record["server_name"],
+                status=SessionStatus.ACTIVE,
+                session_type=session_type,
+                created_at=record.get("created_at", time.time()),
+                last_activity=max(record.get("last_activity", 0), pane["activity"] or 0),
+                pid=pane["pid"],
+                working_directory=pane["current_path"] or record.get("working_directory"),
+                command_count=record.get("command_count", 0)
+            )
+            self._sessions[name] = info
+            self._configs[name] = SessionConfig(
+                name=name,
+                server_name=info.server_name,
+                session_type=session_type,
+                working_directory=record.get("working_directory"),
+                environment=record.get("environment") or {},
+                shell=record.get("shell") or "/bin/bash"
+            )
+            self._stats.total_sessions += 1
+            adopted.append(name)
+            self._emit(SessionEventType.ADOPTED, info)
+
+        logger.info(f"从注册表接管 {len(adopted)}/{len(records)} 个会话")
+        self.save_registry()
+        return adopted
+
+    async def _cleanup_loop(self) -> None:
+        """定期执行空闲会话回收"""
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                await self.cleanup_idle_sessions()
+            except Exception as e:
+                logger.error(f"回收空闲会话失败: {e}")
+
+    def list_sessions(self, server_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """列出所有会话
-        
+
         Returns:
             会话信息列表
         """
         return [
-            {
-                "name": session.name,
-                "server": session.server_name,
-                "active": session.is_active
-            }
-            for session in self._sessions.values()
-        ]
\ No newline at end of file
+            info.to_dict()
+            for info in self._sessions.values()
+            if server_name is None or info.server_name == server_name
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话统计信息"""
+        infos = list(self._sessions.values())
+        self._stats.active_sessions = sum(1 for info in infos if info.status == SessionStatus.ACTIVE)
+        self._stats.inactive_sessions = len(infos) - self._stats.active_sessions
+        self._stats.average_session_uptime = (
+            sum(info.uptime for info in infos) / len(infos) if infos else 0.0
+        )
+        return self._stats.to_dict()
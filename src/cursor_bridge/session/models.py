@@ -28,6 +28,16 @@ class SessionType(Enum):
     TEMPORARY = "temporary"      # 临时会话
 
 
+class SessionEventType(Enum):
+    """会话事件类型枚举"""
+    CREATED = "created"
+    DESTROYED = "destroyed"
+    ADOPTED = "adopted"          # 重启后从注册表接管
+    IDLE_REAPED = "idle_reaped"  # 空闲超时被回收
+    LOST = "lost"                # 底层tmux会话已不存在
+    ERROR = "error"
+
+
 @dataclass
 class SessionConfig:
     """会话配置"""
@@ -0,0 +1,171 @@
+"""
+会话注册表
+
+把托管会话及其面板元数据持久化到状态目录下的JSON文件。服务重启后
+SessionManager 读取注册表，用一次 tmux list-panes -a 核对哪些面板仍然
+存在且健康，直接接管这些会话，不需要重新创建shell或重新登录。
+
+stdio模式下每个客户端窗口各有一个进程，它们共用同一个注册表。每条记录
+带有所属进程的pid：进程只写入和回收自己的会话，所属进程已退出的会话
+才能被接管。读写在文件锁内以读取-合并-写入的方式进行。
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# 注册表格式版本，格式不兼容时忽略旧文件
+REGISTRY_VERSION = 1
+
+
+def default_registry_path(config_path: Optional[str] = None) -> str:
+    """计算注册表文件路径
+
+    不同配置文件使用不同的注册表，与守护进程socket的划分方式一致。
+    """
+    state_home = os.environ.get("XDG_STATE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "state"
+    )
+    config_key = str(Path(config_path).resolve()) if config_path else "default"
+    digest = hashlib.sha1(config_key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(state_home, "cursor-bridge", f"sessions-{digest}.json")
+
+
+def process_alive(pid: Optional[int]) -> bool:
+    """进程是否仍在运行，pid为空时视为已退出"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class SessionRegistry:
+    """基于JSON文件的会话注册表"""
+
+    def __init__(self, path: str):
+        """初始化注册表
+
+        Args:
+            path: 注册表文件路径
+        """
+        self.path = os.path.expanduser(path)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """持有注册表的文件锁（与其他进程互斥）"""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """读取注册表
+
+        Returns:
+            会话名到会话记录的映射，文件不存在或损坏时返回空字典
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取会话注册表失败，忽略: {self.path}, {e}")
+            return {}
+
+        if not isinstance(data, dict) or data.get("version") != REGISTRY_VERSION:
+            logger.warning(f"会话注册表版本不匹配，忽略: {self.path}")
+            return {}
+        return data.get("sessions", {})
+
+    def save(self, sessions: Dict[str, Dict[str, Any]], owner: Optional[int] = None) -> bool:
+        """写入一个进程的会话记录
+
+        在文件锁内读取现有记录，替换 owner 的全部记录后写回，其他进程的
+        记录保持不变。先写临时文件再原子替换，进程在写入过程中退出也不会
+        留下半个文件。
+
+        Args:
+            sessions: owner 当前的全部会话记录
+            owner: 记录所属进程的pid，默认为当前进程
+
+        Returns:
+            是否写入成功
+        """
+        owner = owner or os.getpid()
+        try:
+            with self._locked():
+                records = {
+                    name: record for name, record in self.load().items()
+                    if record.get("owner") != owner and name not in sessions
+                }
+                for name, record in sessions.items():
+                    records[name] = {**record, "owner": owner}
+                self._write(records)
+        except OSError as e:
+            logger.error(f"写入会话注册表失败: {self.path}, {e}")
+            return False
+        return True
+
+    def claim(self, names: Iterable[str], owner: Optional[int] = None) -> Set[str]:
+        """接管所属进程已退出的会话记录
+
+        检查和改写在同一把文件锁内完成，多个进程同时启动时每个会话只会被
+        其中一个接管。
+
+        Args:
+            names: 要接管的会话名
+            owner: 接管进程的pid，默认为当前进程
+
+        Returns:
+            成功接管的会话名（包括本来就属于 owner 的）
+        """
+        owner = owner or os.getpid()
+        claimed: Set[str] = set()
+        try:
+            with self._locked():
+                records = self.load()
+                for name in names:
+                    record = records.get(name)
+                    if record is None:
+                        continue
+                    if record.get("owner") == owner or not process_alive(record.get("owner")):
+                        record["owner"] = owner
+                        claimed.add(name)
+                if claimed:
+                    self._write(records)
+        except OSError as e:
+            logger.error(f"接管注册表中的会话失败: {self.path}, {e}")
+            return set()
+        return claimed
+
+    def _write(self, records: Dict[str, Dict[str, Any]]) -> None:
+        """原子替换注册表文件，调用方持有文件锁"""
+        fd, tmp_path = tempfile.mkstemp(prefix=".sessions-", dir=os.path.dirname(self.path))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": REGISTRY_VERSION, "sessions": records}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,582 @@
+"""
+终端输出解析
+
+TerminalEmulator 是一个增量的VT100终端状态解析器：逐块消费面板的原始
+输出字节，维护紧凑的屏幕/回滚缓冲区模型。回车覆盖、光标移动、清行等
+控制序列直接作用在模型上，因此进度条（pip、wget、docker pull）的反复
+重绘最终只留下最后一次的内容。
+
+PaneStream 通过 tmux pipe-pane 把面板输出追加到本地文件，每次只读取
+新增的字节交给 TerminalEmulator，不需要反复捕获整个面板历史。
+
+PaneLogReader 直接读取输出文件中新增的原始字节并转换为纯文本行，供
+面板日志订阅使用，不受终端模型保留行数的限制。
+"""
+
+import asyncio
+import codecs
+import os
+import re
+import shlex
+import tempfile
+from typing import List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# 预编译的ANSI转义序列正则，用于只需要去除控制序列的场景
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+# 一个完整的转义序列：CSI、OSC、字符集选择或两字节ESC序列
+_ESCAPE = re.compile(
+    r"\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[()#%][\x20-\x7e]|[\x20-\x5a\x5c\x5e-\x7e])"
+)
+
+# 输出流的词法单元
+_TOKEN = re.compile(
+    r"(?P<text>[^\x00-\x1f\x7f]+)"
+    r"|\x1b\[(?P<params>[0-?]*)[ -/]*(?P<final>[@-~])"
+    r"|(?P<osc>\x1b\][^\x07\x1b]*(?:\x07|\x1b\\))"
+    r"|\x1b(?P<esc>[()#%][\x20-\x7e]|[\x20-\x5a\x5c\x5e-\x7e])"
+    r"|(?P<ctrl>[\x00-\x1f\x7f])"
+)
+
+# 未结束的转义序列最多缓存的长度，超过后按普通字符处理
+_MAX_PENDING = 256
+
+# 分块读取时每行预留的字节数
+_READ_BYTES_PER_LINE = 256
+
+# 除制表符和换行外的控制字符
+_CONTROL = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+
+# cursor-bridge 键入的脚本和输出的标记行都包含这些前缀
+_INTERNAL = re.compile(r"__CB|__cb_")
+
+# 编码传输内容的起止标记行
+_FRAME_BEGIN = re.compile(r"^__CB\w*_B$")
+_FRAME_END = re.compile(r"^__CB\w*_F$")
+
+
+def strip_ansi(text: str) -> str:
+    """移除ANSI转义序列"""
+    return ANSI_ESCAPE.sub('', text)
+
+
+class TerminalEmulator:
+    """增量VT100终端状态解析器
+
+    行按终端宽度自动折行并记录软换行标记，输出时合并为逻辑行
+    （等同于 capture-pane -J）。行号使用绝对编号，超出 max_lines
+    的旧行被丢弃后编号保持不变。
+    """
+
+    def __init__(self, width: int = 0, height: int = 0, max_lines: int = 10000):
+        """初始化终端模型
+
+        Args:
+            width: 终端宽度，0表示不折行
+            height: 终端高度，用于光标绝对定位和清屏，0表示未知
+            max_lines: 保留的最大行数
+        """
+        self.width = width
+        self.height = height
+        self.max_lines = max_lines
+        self.reset()
+
+    def reset(self) -> None:
+        """清空终端状态"""
+        self._rows: List[str] = [""]
+        self._wrapped: List[bool] = [False]
+        self._row = 0
+        self._col = 0
+        self._top = 0
+        self._pending_wrap = False
+        self._saved: Tuple[int, int] = (0, 0)
+        self._dropped = 0
+        self._pending = ""
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+
+    def resize(self, width: int, height: int) -> None:
+        """更新终端尺寸"""
+        self.width = width
+        self.height = height
+
+    @property
+    def cursor_line(self) -> int:
+        """光标所在行的绝对行号"""
+        return self._dropped + self._row
+
+    @property
+    def first_line(self) -> int:
+        """仍然保留的最早一行的绝对行号"""
+        return self._dropped
+
+    @property
+    def line_count(self) -> int:
+        """已产生的总行数（包括已丢弃的行）"""
+        return self._dropped + len(self._rows)
+
+    def feed(self, data) -> None:
+        """消费一块输出
+
+        Args:
+            data: 原始字节或已解码的文本，可以在任意位置截断
+        """
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        text = self._pending + data
+        self._pending = ""
+
+        # 末尾不完整的转义序列留到下一块一起处理
+        tail = text.rfind("\x1b")
+        if tail != -1 and len(text) - tail < _MAX_PENDING and not _ESCAPE.match(text, tail):
+            self._pending = text[tail:]
+            text = text[:tail]
+
+        for match in _TOKEN.finditer(text):
+            kind = match.lastgroup
+            if kind == "text":
+                self._write(match.group("text"))
+            elif kind == "final":
+                self._csi(match.group("params"), match.group("final"))
+            elif kind == "ctrl":
+                self._control(match.group("ctrl"))
+            elif kind == "esc":
+                self._escape(match.group("esc"))
+            # OSC（窗口标题等）不影响屏幕内容
+
+        self._trim()
+
+    def text(self, start_line: int = 0) -> str:
+        """获取从绝对行号 start_line 开始的内容
+
+        软换行的行合并为一个逻辑行，行尾空白被去除。
+        """
+        first = max(0, start_line - self._dropped)
+        lines = []
+        current: List[str] = []
+        for row in range(first, len(self._rows)):
+            current.append(self._rows[row])
+            if not self._wrapped[row]:
+                lines.append("".join(current).rstrip())
+                current = []
+        if current:
+            lines.append("".join(current).rstrip())
+        return "\n".join(lines)
+
+    def complete_lines(self, start_line: int) -> Tuple[List[str], int]:
+        """获取从绝对行号 start_line 开始、已经结束的逻辑行
+
+        光标所在的逻辑行还可能被改写（进度条、未输出完的行），不包括在内。
+
+        Returns:
+            (逻辑行列表, 下一次读取的起始行号)
+        """
+        first = max(0, start_line - self._dropped)
+        end = self._row
+        while end > 0 and self._wrapped[end - 1]:
+            end -= 1
+        lines = []
+        current: List[str] = []
+        for row in range(first, end):
+            current.append(self._rows[row])
+            if not self._wrapped[row]:
+                lines.append("".join(current).rstrip())
+                current = []
+        return lines, self._dropped + max(first, end)
+
+    def _write(self, run: str) -> None:
+        """在光标处写入可打印字符"""
+        width = self.width
+        while run:
+            if self._pending_wrap:
+                # 上一个字符写满了行尾，新字符折到下一行
+                self._wrapped[self._row] = True
+                self._linefeed()
+                self._col = 0
+                self._pending_wrap = False
+
+            if width:
+                chunk, run = run[:width - self._col], run[width - self._col:]
+            else:
+                chunk, run = run, ""
+
+            line = self._rows[self._row]
+            col = self._col
+            if len(line) < col:
+                line += " " * (col - len(line))
+            self._rows[self._row] = line[:col] + chunk + line[col + len(chunk):]
+            self._col = col + len(chunk)
+
+            if width and self._col >= width:
+                self._col = width - 1
+                self._pending_wrap = True
+
+    def _control(self, char: str) -> None:
+        """处理C0控制字符"""
+        if char == "\r":
+            self._col = 0
+        elif char in "\n\x0b\x0c":
+            self._linefeed()
+        elif char == "\b":
+            self._col = max(0, self._col - 1)
+        elif char == "\t":
+            self._col = (self._col // 8 + 1) * 8
+            if self.width:
+                self._col = min(self._col, self.width - 1)
+        else:
+            return
+        self._pending_wrap = False
+
+    def _escape(self, code: str) -> None:
+        """处理两字节ESC序列"""
+        if code == "M":
+            self._row = max(self._top, self._row - 1)
+        elif code == "D":
+            self._linefeed()
+        elif code == "E":
+            self._linefeed()
+            self._col = 0
+        elif code == "7":
+            self._saved = (self._row, self._col)
+        elif code == "8":
+            self._move_to(*self._saved)
+        elif code == "c":
+            self._move_to(len(self._rows), 0)
+            self._top = self._row
+        else:
+            return
+        self._pending_wrap = False
+
+    def _csi(self, params: str, final: str) -> None:
+        """处理CSI控制序列"""
+        if params.startswith(("?", ">", "=")):
+            # 私有模式（光标显示、备用屏幕等）不影响输出内容
+            return
+        args = [int(p) if p.isdigit() else 0 for p in params.split(";")]
+        n = max(1, args[0])
+
+        if final == "m":
+            return
+        elif final == "A":
+            self._row = max(self._top, self._row - n)
+        elif final == "B":
+            self._move_to(self._row + n, self._col)
+        elif final == "C":
+            self._col += n
+            if self.width:
+                self._col = min(self._col, self.width - 1)
+        elif final == "D":
+            self._col = max(0, self._col - n)
+        elif final in "G`":
+            self._col = n - 1
+        elif final == "E":
+            self._move_to(self._row + n, 0)
+        elif final == "F":
+            self._move_to(max(self._top, self._row - n), 0)
+        elif final in "Hf":
+            col = args[1] if len(args) > 1 and args[1] else 1
+            self._move_to(self._top + n - 1, col - 1)
+        elif final == "d":
+            self._move_to(self._top + n - 1, self._col)
+        elif final == "K":
+            self._erase_line(args[0])
+        elif final == "J":
+            self._erase_display(args[0])
+        elif final == "s":
+            self._saved = (self._row, self._col)
+        elif final == "u":
+            self._move_to(*self._saved)
+        else:
+            return
+        self._pending_wrap = False
+
+    def _erase_line(self, mode: int) -> None:
+        line = self._rows[self._row]
+        if mode == 0:
+            self._rows[self._row] = line[:self._col]
+            self._wrapped[self._row] = False
+        elif mode == 1:
+            self._rows[self._row] = " " * (self._col + 1) + line[self._col + 1:]
+        else:
+            self._rows[self._row] = ""
+            self._wrapped[self._row] = False
+
+    def _erase_display(self, mode: int) -> None:
+        if mode == 0:
+            self._erase_line(0)
+            del self._rows[self._row + 1:]
+            del self._wrapped[self._row + 1:]
+        elif mode in (2, 3):
+            # 与tmux一样，清屏时原屏幕内容保留在历史中，从新的一屏开始
+            if any(self._rows[self._top:]):
+                self._move_to(len(self._rows), 0)
+                self._top = self._row
+            else:
+                self._move_to(self._top, 0)
+
+    def _linefeed(self) -> None:
+        self._move_to(self._row + 1, self._col)
+        if self.height and self._row - self._top >= self.height:
+            self._top = self._row - self.height + 1
+
+    def _move_to(self, row: int, col: int) -> None:
+        """移动光标，必要时追加新行"""
+        row = max(0, row)
+        while row >= len(self._rows):
+            self._rows.append("")
+            self._wrapped.append(False)
+        self._row = row
+        self._col = max(0, col)
+        self._pending_wrap = False
+
+    def _trim(self) -> None:
+        """丢弃超出 max_lines 的最早的行"""
+        excess = len(self._rows) - self.max_lines
+        if excess <= 0:
+            return
+        excess = min(excess, self._row)
+        del self._rows[:excess]
+        del self._wrapped[:excess]
+        self._row -= excess
+        self._top = max(0, self._top - excess)
+        self._saved = (max(0, self._saved[0] - excess), self._saved[1])
+        self._dropped += excess
+
+
+class PaneStream:
+    """通过 tmux pipe-pane 接收面板的原始输出"""
+
+    def __init__(
+        self,
+        target: str,
+        max_lines: int = 10000,
+        rotate_bytes: int = 8 * 1024 * 1024,
+        tmux_command: Tuple[str, ...] = ("tmux",)
+    ):
+        """初始化输出流
+
+        Args:
+            target: tmux面板目标，如 "session:window"
+            max_lines: 终端模型保留的最大行数
+            rotate_bytes: 输出文件超过该大小后在空闲时切换到新文件
+            tmux_command: tmux命令前缀，如 ("tmux", "-L", "socket")
+        """
+        self.target = target
+        self.tmux_command = tmux_command
+        self.rotate_bytes = rotate_bytes
+        self.emulator = TerminalEmulator(max_lines=max_lines)
+        self.path: Optional[str] = None
+        self._offset = 0
+
+    @property
+    def active(self) -> bool:
+        """输出流是否已启动"""
+        return self.path is not None
+
+    async def start(self) -> None:
+        """开始把面板输出追加到临时文件"""
+        fd, path = tempfile.mkstemp(prefix="cursor-bridge-pane-", suffix=".log")
+        os.close(fd)
+        # 不带 -o：替换面板上已有的管道，保证输出写入新文件
+        await self._tmux("pipe-pane", "-t", self.target, f"cat >> {shlex.quote(path)}")
+        self.path = path
+        self._offset = 0
+        await self.refresh_size()
+        logger.info(f"开始接收面板输出: {self.target} -> {path}")
+
+    async def stop(self) -> None:
+        """停止接收并删除临时文件"""
+        if self.path is None:
+            return
+        await self._tmux("pipe-pane", "-t", self.target)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        self.path = None
+
+    async def refresh_size(self) -> None:
+        """同步面板尺寸，折行和光标定位依赖正确的宽高"""
+        output = await self._tmux(
+            "display-message", "-p", "-t", self.target, "#{pane_width} #{pane_height}"
+        )
+        try:
+            width, height = (int(value) for value in output.split())
+        except ValueError:
+            return
+        self.emulator.resize(width, height)
+
+    async def rotate_if_needed(self) -> None:
+        """输出文件过大时切换到新文件（仅在面板空闲时调用）"""
+        if self.path is None or self._offset < self.rotate_bytes:
+            return
+        self.read()
+        old_path = self.path
+        await self.start()
+        try:
+            os.unlink(old_path)
+        except OSError:
+            pass
+
+    def read(self, max_lines: Optional[int] = None) -> int:
+        """读取新增的输出并交给终端模型
+
+        Args:
+            max_lines: 最多读取的行数，None表示全部读取；分块读取时调用方
+                可以在旧行被终端模型丢弃之前取走
+
+        Returns:
+            新读取的字节数
+        """
+        if self.path is None:
+            return 0
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(-1 if max_lines is None else max_lines * _READ_BYTES_PER_LINE)
+        except OSError as e:
+            logger.error(f"读取面板输出失败: {e}")
+            return 0
+        if max_lines is not None:
+            end = -1
+            for _ in range(max_lines):
+                end = data.find(b"\n", end + 1)
+                if end == -1:
+                    break
+            else:
+                data = data[:end + 1]
+        if data:
+            self._offset += len(data)
+            self.emulator.feed(data)
+        return len(data)
+
+    def raw_size(self) -> int:
+        """输出文件的当前大小，作为 read_raw 的起点"""
+        if self.path is None:
+            return 0
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read_raw(self, start: int) -> bytes:
+        """读取输出文件中从 start 开始的原始字节，不经过终端模型
+
+        适合传输大块数据：不受终端宽度折行和 max_lines 的限制。
+        """
+        if self.path is None:
+            return b""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                return f.read()
+        except OSError as e:
+            logger.error(f"读取面板输出失败: {e}")
+            return b""
+
+    def mark(self) -> int:
+        """返回当前光标行的绝对行号，作为之后输出的起点"""
+        self.read()
+        return self.emulator.cursor_line
+
+    def text_since(self, line: int) -> str:
+        """获取从指定行开始的输出"""
+        self.read()
+        return self.emulator.text(line)
+
+    def complete_lines_since(self, line: int) -> Tuple[List[str], int]:
+        """读取新增输出，返回从指定行开始已经结束的行和下一次的起始行"""
+        self.read()
+        return self.emulator.complete_lines(line)
+
+    async def _tmux(self, *args: str) -> str:
+        result = await asyncio.create_subprocess_exec(
+            *self.tmux_command, *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout_data, _ = await result.communicate()
+        return stdout_data.decode("utf-8", errors="ignore")
+
+
+class PaneLogReader:
+    """按行读取面板输出文件中新增的内容
+
+    去掉转义序列，回车覆盖的行（进度条）只保留最后的内容；cursor-bridge
+    自身键入的脚本、标记行和编码传输的内容不返回。
+    """
+
+    def __init__(self, stream: PaneStream):
+        """从输出流的当前位置开始读取
+
+        Args:
+            stream: 已启动的面板输出流
+        """
+        self.stream = stream
+        self._path = stream.path
+        self._offset = stream.raw_size()
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._partial = ""
+        self._in_frame = False
+
+    def read(self) -> str:
+        """读取新增的完整行
+
+        未换行的内容（如提示符）在下一次读取时仍没有新输出才返回。
+
+        Returns:
+            以换行结尾的文本，没有新内容时为空字符串
+        """
+        if self.stream.path != self._path:
+            # 输出文件已切换，从新文件的开头读取
+            self._path = self.stream.path
+            self._offset = 0
+        data = self.stream.read_raw(self._offset)
+        self._offset += len(data)
+
+        text = self._partial + self._decoder.decode(data)
+        lines = text.split("\n")
+        self._partial = lines.pop()
+        if not data and self._partial:
+            lines.append(self._partial)
+            self._partial = ""
+
+        output, self._in_frame = _clean_log_lines(lines, self._in_frame)
+        return "".join(line + "\n" for line in output)
+
+
+def _clean_log_lines(lines: List[str], in_frame: bool = False) -> Tuple[List[str], bool]:
+    """把面板输出行转换为纯文本，跳过 cursor-bridge 自身的脚本和标记
+
+    Args:
+        lines: 原始输出行
+        in_frame: 开始时是否处于编码传输的内容中
+
+    Returns:
+        (纯文本行, 结束时是否处于编码传输的内容中)
+    """
+    output = []
+    for line in lines:
+        raw = _ESCAPE.sub("", line).rstrip("\r")
+        # 回车覆盖的行只保留最后的内容；shell 回显的长命令也用回车折行，
+        # 标记要在整行中查找
+        text = _CONTROL.sub("", raw.rsplit("\r", 1)[-1]).rstrip()
+        if in_frame:
+            in_frame = not _FRAME_END.match(text)
+            continue
+        if _FRAME_BEGIN.match(text):
+            in_frame = True
+            continue
+        if _INTERNAL.search(raw):
+            continue
+        output.append(text)
+    return output, in_frame
+
+
+def clean_pane_log(text: str) -> str:
+    """去掉面板内容中 cursor-bridge 自身的脚本、标记和编码传输的内容"""
+    output, _ = _clean_log_lines(text.split("\n"))
+    return "\n".join(output)
@@ -5,33 +5,133 @@
 """
 
 import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import socket
 import subprocess
+import shlex
 import time
-from typing import Dict, Any, Optional, List
+import uuid
+from typing import Callable, Dict, Any, Optional, List, Tuple
 import logging
 import re
 
+from ..execution.models import ExecutionStatus
+from .models import CommandResult, SessionConfig, SessionInfo, SessionStatus, SessionType
+from .terminal import PaneLogReader, PaneStream, strip_ansi
+
 logger = logging.getLogger(__name__)
 
 
+# 面板shell所在主机名的shell表达式
+HOST_EXPR = '"${HOSTNAME:-$(uname -n)}"'
+
+# 输出文件大小、修改时间和inode的命令（GNU stat），用于文件缓存的核对
+STAT_COMMAND = "stat -c '%s %Y %i' --"
+
+# search 返回的每行匹配内容的最大字符数
+MAX_MATCH_TEXT = 500
+
+# 内层SSH连接断开时终端上常见的输出
+CONNECTION_LOST = re.compile(
+    r"Connection to \S+ closed|Connection closed by|Connection reset by peer|"
+    r"client_loop: send disconnect|packet_write_wait|Broken pipe|"
+    r"Timeout, server \S+ not responding"
+)
+# 检查断开提示的输出末尾行数
+CONNECTION_LOST_TAIL_LINES = 3
+
+
 class TmuxSession:
     """本地tmux会话控制器"""
     
-    def __init__(self, session_name: str, window_name: str = "main"):
+    # 超时或取消时依次发送的按键，每一步之后确认面板是否回到提示符
+    INTERRUPT_SEQUENCE = (("C-c",), ("C-c",), ("C-\\",))
+    
+    # 中断后面板未恢复时，下一次执行命令前等待提示符的最长时间（秒）
+    READY_PROBE_TIMEOUT = 2.0
+    
+    # 配置了自动重连时，长时间运行的命令每隔多久确认一次连接仍然存在（秒）
+    CONNECTION_CHECK_INTERVAL = 2.0
+    
+    # 写文件时每次 send-keys 发送的最大字符数（tmux单条命令上限约16KB）
+    SEND_CHUNK_SIZE = 8192
+    
+    def __init__(
+        self,
+        session_name: str,
+        window_name: str = "main",
+        capture_method: str = "capture",
+        socket_name: Optional[str] = None
+    ):
         """初始化tmux会话控制器
         
         Args:
             session_name: tmux会话名称
             window_name: 窗口名称
+            capture_method: 输出获取方式，capture 轮询 capture-pane，
+                stream 通过 pipe-pane 增量读取原始输出
+            socket_name: tmux服务器socket名称（tmux -L），None表示默认服务器
         """
         self.session_name = session_name
         self.window_name = window_name
         self.target = f"{session_name}:{window_name}"
+        self.capture_method = capture_method
+        self._tmux = ("tmux", "-L", socket_name) if socket_name else ("tmux",)
+        # 面板锁：同一面板上的命令需要串行执行
+        self.lock = asyncio.Lock()
+        self._stream: Optional[PaneStream] = None
+        # 面板日志的订阅者数量，有订阅者时输出流保持开启
+        self._followers = 0
+        # 最近一次命令结束时shell的工作目录，由结束标记行上报
+        self.cwd: Optional[str] = None
+        # 最近一次命令结束时shell所在的主机
+        self.host: Optional[str] = None
+        # 自动重连：面板内的SSH断开后依次执行的连接命令
+        self.connect_commands: List[str] = []
+        self.expected_host: Optional[str] = None
+        self.connect_timeout: float = 30.0
+        self.reconnects = 0
+        # 最近一次中断后面板是否回到了提示符，False时执行新命令前需要重新确认
+        self.healthy = True
+        # 带 on_output 执行时，当前步骤尚未换行的输出（如密码提示），仅 stream 方式下更新
+        self.pending_output = ""
+    
+    def configure_reconnect(
+        self,
+        connect_commands: List[str],
+        expected_host: Optional[str] = None,
+        timeout: float = 30.0
+    ) -> None:
+        """配置面板的自动重连
+        
+        配置后每批命令执行前都在shell中确认主机：面板回到本机shell时
+        命令不会被执行，而是先重新连接远程主机再执行。
+        
+        Args:
+            connect_commands: 在本机shell中依次执行的连接命令
+            expected_host: 远程主机名，None表示从第一次成功执行的命令中学习
+            timeout: 等待远程提示符的最长时间（秒）
+        """
+        self.connect_commands = list(connect_commands)
+        self.expected_host = expected_host or self.expected_host
+        self.connect_timeout = timeout
+    
+    def _host_guard(self) -> Optional[str]:
+        """生成主机检查条件，未配置重连时返回None"""
+        if not self.connect_commands:
+            return None
+        if self.expected_host:
+            return f"[ {HOST_EXPR} = {shlex.quote(self.expected_host)} ]"
+        # 还不知道远程主机名时，至少保证命令不在本机执行
+        return f"[ {HOST_EXPR} != {shlex.quote(socket.gethostname())} ]"
         
     async def check_session_exists(self) -> bool:
         """检查tmux会话是否存在"""
         try:
-            cmd = ["tmux", "has-session", "-t", self.session_name]
+            cmd = [*self._tmux, "has-session", "-t", self.session_name]
             result = await asyncio.create_subprocess_exec(
                 *cmd,
                 stdout=asyncio.subprocess.PIPE,
@@ -66,8 +166,9 @@ class TmuxSession:
                     "command": command
                 }
             
-            # 2. 发送命令
-            send_cmd = ["tmux", "send-keys", "-t", self.target, command, "Enter"]
+            # 2. 记录发送前的输出位置，发送命令
+            position = await self.get_position()
+            send_cmd = [*self._tmux, "send-keys", "-t", self.target, command, "Enter"]
             logger.info(f"发送命令: {' '.join(send_cmd)}")
             
             result = await asyncio.create_subprocess_exec(
@@ -90,9 +191,15 @@ class TmuxSession:
             # 3. 等待命令执行完成
             await asyncio.sleep(wait_time)
             
-            # 4. 捕获最近的输出
-            capture_result = await self.capture_output(lines=20)  # 只捕获最近20行
-            filtered_output = self._extract_recent_output(capture_result, command)
+            # 4. 捕获发送位置之后的输出，第一行是提示符和命令回显
+            region = await self.capture_since(position)
+            if region is not None and command.split('\n')[0] in region.split('\n')[0]:
+                output_lines = region.split('\n')[1:]
+                filtered_output = '\n'.join(line for line in output_lines if line.strip())
+            else:
+                # 历史缓冲区丢弃旧行后行号不可靠，退回到按命令文本定位
+                capture_result = await self.capture_output(lines=20)
+                filtered_output = self._extract_recent_output(capture_result, command)
             
             execution_time = time.time() - start_time
             
@@ -114,6 +221,1434 @@ class TmuxSession:
                 "command": command
             }
     
+    async def execute_batch(
+        self,
+        commands: List[str],
+        stop_on_error: bool = True,
+        timeout: float = 60.0,
+        poll_interval: float = 0.1,
+        history_lines: int = 2000,
+        working_directory: Optional[str] = None,
+        environment: Optional[Dict[str, str]] = None,
+        on_output: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """将一组命令包装成一个脚本发送到面板，一次往返完成
+        
+        每一步前后输出带随机标记的分隔行，用于从面板输出中切分各步骤的
+        输出、退出码和耗时。标记在键入的脚本中被拆成 printf 参数，
+        因此回显的脚本文本不会被误识别为标记行。
+        
+        工作目录和环境变量作为脚本的前置步骤一起发送，不需要单独往返；
+        结束标记行同时上报shell的当前目录。
+        
+        Args:
+            commands: 按顺序执行的命令
+            stop_on_error: 某一步失败后是否跳过后续命令
+            timeout: 等待整批命令完成的最长时间（秒）
+            poll_interval: 轮询面板输出的间隔（秒）
+            history_lines: 捕获的历史行数
+            working_directory: 执行前切换到的工作目录
+            environment: 执行前导出的环境变量
+            on_output: 命令输出回调，stream 方式下每次轮询传入新增的完整行，
+                否则在结束时一次性传入
+            
+        Returns:
+            整批执行结果
+        """
+        start_time = time.time()
+        kwargs = dict(
+            stop_on_error=stop_on_error, poll_interval=poll_interval, history_lines=history_lines,
+            working_directory=working_directory, environment=environment, on_output=on_output
+        )
+        result = await self._run_batch(commands, timeout=timeout, **kwargs)
+        if not self.connect_commands or not self._connection_lost(result):
+            return result
+        
+        # 内层SSH连接已断开：重新连接，命令因主机检查未执行时重新执行
+        result["reconnected"] = await self.reconnect()
+        remaining = start_time + timeout - time.time()
+        if result["reconnected"] and result.get("disconnected") and remaining > 0:
+            retry = await self._run_batch(commands, timeout=remaining, **kwargs)
+            retry["reconnected"] = True
+            retry["execution_time"] = time.time() - start_time
+            return retry
+        return result
+    
+    def _connection_lost(self, result: Dict[str, Any]) -> bool:
+        """根据执行结果判断内层SSH连接是否可能已断开
+        
+        出现结束标记说明远程shell仍在执行命令，输出中的断开提示只是普通
+        输出（如 BrokenPipeError、grep 日志）；只有结束标记没有出现时才检查
+        输出停止处的最后几行。
+        """
+        if result.get("disconnected") or result.get("connection_lost"):
+            return True
+        if not result.get("timed_out"):
+            return False
+        if not result.get("recovered", True):
+            # 冻结的SSH客户端会吞掉中断按键
+            return True
+        tail = result.get("stdout", "").rstrip().split("\n")[-CONNECTION_LOST_TAIL_LINES:]
+        return bool(CONNECTION_LOST.search("\n".join(tail)))
+    
+    async def _run_batch(
+        self,
+        commands: List[str],
+        stop_on_error: bool = True,
+        timeout: float = 60.0,
+        poll_interval: float = 0.1,
+        history_lines: int = 2000,
+        working_directory: Optional[str] = None,
+        environment: Optional[Dict[str, str]] = None,
+        on_output: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """发送并等待一批命令，参数同 execute_batch"""
+        start_time = time.time()
+        token = f"__CB_{uuid.uuid4().hex[:12]}"
+        setup = self._build_setup(working_directory, environment or {})
+        script = self._build_batch_script(commands, token, stop_on_error, setup, self._host_guard())
+        joined = " && ".join(commands)
+        
+        stream = await self._get_stream()
+        mark = stream.mark() if stream else 0
+        position = None if stream else await self.get_position()
+        
+        returncode, stderr_text = await self._send_literal(script)
+        if returncode != 0:
+            return {
+                "stdout": "",
+                "stderr": stderr_text,
+                "exit_code": returncode,
+                "execution_time": time.time() - start_time,
+                "command": joined,
+                "status": ExecutionStatus.FAILED.value
+            }
+        await self._send_keys("Enter")
+        
+        # 命令输出转发：只转发步骤起止标记之间的行，回显的脚本和标记行不转发
+        forwarded = mark
+        in_step = False
+        # 空行暂不转发：它可能是结束标记前额外输出的换行
+        held_blank = False
+        
+        def forward(lines: List[str]) -> None:
+            nonlocal in_step, held_blank
+            chunk = []
+            for line in lines:
+                stripped = line.strip()
+                if stripped.startswith(f"{token}_S_"):
+                    in_step = True
+                    held_blank = False
+                elif stripped.startswith(f"{token}_E_") or stripped.startswith(f"{token}_DONE"):
+                    in_step = False
+                    held_blank = False
+                elif in_step:
+                    if held_blank:
+                        chunk.append("\n")
+                        held_blank = False
+                    if stripped:
+                        chunk.append(line + "\n")
+                    else:
+                        held_blank = True
+            if chunk:
+                on_output("".join(chunk))
+        
+        def forward_stream(final: bool = False) -> None:
+            nonlocal forwarded, in_step
+            # 分块读取，每块的行数远小于终端模型保留的行数，大量输出在被
+            # 丢弃之前逐块转发
+            chunk_lines = max(1, stream.emulator.max_lines // 4)
+            while True:
+                more = stream.read(max_lines=chunk_lines)
+                if forwarded < stream.emulator.first_line:
+                    # 一行远超终端宽度时仍可能丢弃，步骤开始标记已不在；
+                    # 之后的行仍属于该步骤
+                    in_step = True
+                lines, forwarded = stream.emulator.complete_lines(forwarded)
+                forward(lines)
+                if not more:
+                    break
+            if final:
+                forward(stream.text_since(forwarded).split("\n"))
+        
+        # 轮询直到结束标记出现或超时
+        done_pattern = re.compile(rf"^{token}_DONE(?: (\S+) (.*?))?[ \t]*$", re.MULTILINE)
+        done = None
+        deadline = start_time + timeout
+        output = ""
+        timed_out = True
+        connection_lost = False
+        next_check = start_time + self.CONNECTION_CHECK_INTERVAL
+        scan_from = mark
+        try:
+            while time.time() < deadline:
+                await asyncio.sleep(min(poll_interval, max(0.0, deadline - time.time())))
+                if stream:
+                    if on_output:
+                        forward_stream()
+                    # 只检查新增的行，整个输出只解析一遍
+                    done = done_pattern.search(stream.text_since(scan_from))
+                    scan_from = max(mark, stream.emulator.cursor_line - 1)
+                    if on_output and not done:
+                        self.pending_output = stream.text_since(forwarded) if in_step else ""
+                else:
+                    # 结束标记是最后的输出，只需检查可见区域
+                    screen = await self.capture_output(join_lines=True, start=0)
+                    done = done_pattern.search(screen)
+                if done:
+                    timed_out = False
+                    break
+                
+                # 远程shell中途退出时结束标记永远不会出现，不必等到超时
+                if self.connect_commands and time.time() >= next_check:
+                    next_check = time.time() + self.CONNECTION_CHECK_INTERVAL
+                    if await self._local_shell_in_foreground():
+                        connection_lost = True
+                        timed_out = False
+                        break
+        except asyncio.CancelledError:
+            # 请求被取消：中断远程命令，确保释放面板时shell已空闲
+            if stream and on_output:
+                forward_stream(final=True)
+                self.pending_output = ""
+            await self.interrupt()
+            raise
+        
+        # 超时时在中断前捕获，保留已产生的部分输出（不含中断探测的输出）
+        recovered = True
+        self.pending_output = ""
+        if stream:
+            output = stream.text_since(mark)
+            if on_output:
+                forward_stream(final=True)
+        else:
+            output = await self._capture_batch_region(position, token, history_lines)
+            if on_output:
+                forward(output.split("\n"))
+        if timed_out:
+            recovered = await self.interrupt()
+            # 中断后shell状态不确定，下次重新设置
+            self.cwd = None
+        elif connection_lost:
+            self.cwd = None
+        elif done.group(1):
+            self.host = done.group(1)
+            self.cwd = done.group(2) or None
+        
+        steps = self._parse_batch_output(output, commands, token)
+        failed = [step for step in steps if step["status"] == "failed"]
+        stderr = f"执行超时（{timeout}秒）" if timed_out else ""
+        
+        setup_result = self._parse_setup_output(output, token) if setup else None
+        if setup_result is not None and setup_result[0] != 0:
+            # 切换目录或导出变量失败，命令没有执行
+            failed = [{"exit_code": setup_result[0]}]
+            stderr = setup_result[1] or f"执行环境设置失败: {setup}"
+        
+        wrong_host = re.search(rf"^{token}_H_(\S*)", output, re.MULTILINE)
+        if wrong_host:
+            # 主机检查失败，命令没有执行
+            failed = [{"exit_code": 1}]
+            stderr = f"面板未连接到远程主机（当前主机: {wrong_host.group(1)}），命令未执行"
+        elif connection_lost:
+            failed = [{"exit_code": 255}]
+            stderr = "执行过程中远程连接已断开，命令可能没有执行完成"
+        elif self.connect_commands and not self.expected_host and self.host:
+            # 第一次在远程主机上成功执行，记住远程主机名
+            self.expected_host = self.host
+        
+        if timed_out:
+            status = ExecutionStatus.TIMEOUT
+        elif failed:
+            status = ExecutionStatus.FAILED
+        else:
+            status = ExecutionStatus.COMPLETED
+        
+        result = {
+            "stdout": "\n".join(step["stdout"] for step in steps if step["stdout"]),
+            "stderr": stderr,
+            "exit_code": failed[0]["exit_code"] if failed else (124 if timed_out else 0),
+            "execution_time": time.time() - start_time,
+            "command": joined,
+            "status": status.value,
+            "steps": steps,
+            "timed_out": timed_out,
+            "cwd": self.cwd
+        }
+        if wrong_host:
+            result["disconnected"] = True
+        if connection_lost:
+            result["connection_lost"] = True
+        if any(step.get("truncated") for step in steps):
+            result["truncated"] = True
+        if timed_out:
+            # 面板确认回到提示符后才能交给后续请求
+            result["recovered"] = recovered
+            if not recovered:
+                result["stderr"] += "；中断后面板未恢复到提示符"
+        return result
+    
+    async def _capture_batch_region(
+        self, position: Optional[Dict[str, int]], token: str, history_lines: int
+    ) -> str:
+        """捕获批处理命令产生的输出区域"""
+        start_pattern = re.compile(rf"^{token}_(?:P$|S_0_|H_)", re.MULTILINE)
+        output = await self.capture_since(position)
+        if output is not None and start_pattern.search(output):
+            return output
+        
+        # tmux在历史达到上限时成批丢弃旧行，行号会漂移；
+        # 此时按起始标记向上逐步扩大捕获范围
+        lines = 200
+        while True:
+            output = await self.capture_output(lines=lines, join_lines=True)
+            if start_pattern.search(output) or lines >= history_lines:
+                return output
+            lines = min(lines * 4, history_lines)
+    
+    async def run_command(
+        self,
+        command: str,
+        timeout: float = 30.0,
+        poll_interval: float = 0.1,
+        history_lines: int = 2000,
+        working_directory: Optional[str] = None,
+        environment: Optional[Dict[str, str]] = None,
+        on_output: Optional[Callable[[str], None]] = None,
+        stream_output: bool = False
+    ) -> Dict[str, Any]:
+        """执行单条命令并等待其真正结束
+        
+        与 send_command 固定等待一段时间不同，这里通过退出标记判断命令
+        是否结束并取得真实退出码；超过 timeout 时中断命令，返回已产生的
+        部分输出。
+        
+        Args:
+            command: 要执行的命令
+            timeout: 超时时间（秒）
+            poll_interval: 轮询面板输出的间隔（秒）
+            history_lines: 捕获的历史行数
+            working_directory: 执行前切换到的工作目录
+            environment: 执行前导出的环境变量
+            on_output: 命令输出回调，参见 execute_batch
+            stream_output: 无论捕获方式如何都经 pipe-pane 逐行取回输出，
+                on_output 能收到超出屏幕历史的全部输出
+            
+        Returns:
+            命令执行结果
+        """
+        execute = self._execute_streamed if stream_output else self.execute_batch
+        result = await execute(
+            [command], stop_on_error=True, timeout=timeout,
+            poll_interval=poll_interval, history_lines=history_lines,
+            working_directory=working_directory, environment=environment,
+            on_output=on_output
+        )
+        result.pop("steps", None)
+        return result
+    
+    async def wait_for_pattern(
+        self,
+        pattern: "re.Pattern[str]",
+        timeout: float = 30.0,
+        send: Optional[str] = None,
+        enter: bool = True,
+        poll_interval: float = 0.05
+    ) -> Dict[str, Any]:
+        """等待面板输出中出现匹配的内容，然后可选地发送输入
+        
+        匹配从调用时光标所在的行开始：已经显示在光标行上的提示符（如
+        "Password:"）也能匹配。面板没有启用输出流时临时通过 pipe-pane
+        接收输出，每次轮询只解析新增的字节，已结束的行只匹配一次。
+        不获取面板锁，面板上正在运行的命令不受影响。
+        
+        Args:
+            pattern: 预编译的正则表达式
+            timeout: 最长等待时间（秒）
+            send: 匹配后发送到面板的文本
+            enter: 发送文本后是否回车
+            poll_interval: 轮询间隔（秒）
+            
+        Returns:
+            匹配结果，matched 为False表示超时
+        """
+        start_time = time.time()
+        deadline = start_time + timeout
+        stream = self._stream if self._stream is not None and self._stream.active else None
+        temporary = None
+        if stream is None:
+            temporary = stream = PaneStream(self.target, tmux_command=self._tmux)
+            await stream.start()
+        
+        try:
+            scan_from = stream.mark()
+            # 临时输出流看不到调用前的内容，单独检查光标行上已有的提示符
+            position = await self.get_position() if temporary else None
+            if position is not None:
+                cursor_y = position["line"] - position["history_size"]
+                match = pattern.search(
+                    (await self.capture_output(join_lines=True, start=cursor_y)).rstrip()
+                )
+            else:
+                match = None
+            
+            while match is None:
+                lines, scan_from = stream.complete_lines_since(scan_from)
+                for line in lines:
+                    match = pattern.search(line)
+                    if match:
+                        break
+                else:
+                    # 光标行还可能被改写，每次轮询都重新检查
+                    match = pattern.search(stream.text_since(scan_from))
+                if match or time.time() >= deadline:
+                    break
+                await asyncio.sleep(min(poll_interval, max(0.0, deadline - time.time())))
+        finally:
+            if temporary is not None:
+                await temporary.stop()
+        
+        result = {
+            "matched": match is not None,
+            "status": "matched" if match else "timeout",
+            "waited": time.time() - start_time,
+            "sent": False
+        }
+        if match is None:
+            return result
+        
+        result.update(match=match.group(0), groups=list(match.groups()), line=match.string)
+        if send is not None:
+            result["sent"] = await self.send_input(send, enter)
+        return result
+    
+    async def send_input(self, text: str, enter: bool = True) -> bool:
+        """向面板中正在运行的程序发送输入（不获取面板锁）
+        
+        Args:
+            text: 逐字发送的文本，为空时只发送回车
+            enter: 是否在文本后回车
+            
+        Returns:
+            是否发送成功
+        """
+        if text:
+            returncode, stderr_text = await self._send_literal(text)
+            if returncode != 0:
+                logger.error(f"发送输入失败: {stderr_text.strip()}")
+                return False
+        if enter:
+            return await self._send_keys("Enter") == 0
+        return True
+    
+    async def read_file(
+        self,
+        path: str,
+        offset: int = 0,
+        length: int = 1024 * 1024,
+        compress: bool = True,
+        timeout: float = 60.0
+    ) -> Dict[str, Any]:
+        """读取远程文件的一段内容
+        
+        远程把这一段内容（可选 gzip 压缩）按 base64 编码输出在两个标记行
+        之间，本地通过 pipe-pane 从原始输出字节中取出：不经过屏幕捕获，
+        不受面板宽度、历史行数和终端模型行数的限制。同时输出文件大小和
+        这一段内容的 sha256，解码后校验。调用方需要持有面板锁。
+        
+        Args:
+            path: 远程文件路径
+            offset: 起始字节偏移
+            length: 最多读取的字节数
+            compress: 是否在远程压缩后传输
+            timeout: 超时时间（秒）
+            
+        Returns:
+            读取结果，content 为文本（encoding 为 utf-8）或 base64 字符串
+        """
+        start_time = time.time()
+        token = f"__CBF_{uuid.uuid4().hex[:12]}"
+        command = self._build_read_command(path, token, offset, length, compress)
+        result, raw = await self._run_framed(command, token, timeout)
+        
+        failure = {
+            "path": path,
+            "exit_code": result["exit_code"] or 1,
+            "status": result["status"] if result["exit_code"] else ExecutionStatus.FAILED.value,
+            "execution_time": time.time() - start_time
+        }
+        if result["exit_code"] != 0:
+            # 输出只有出错信息；读取成功时 stdout 中是编码后的内容，不返回
+            return {**failure, "stderr": result["stderr"] or result["stdout"]}
+        
+        parsed = self._parse_read_output(raw, token, compress)
+        if parsed is None:
+            return {**failure, "stderr": "未能从面板输出中取得完整的文件内容"}
+        size, checksum, data, transfer_bytes = parsed
+        actual = hashlib.sha256(data).hexdigest()
+        if checksum and checksum != actual:
+            return {**failure, "stderr": "文件内容校验失败，传输过程中数据不完整"}
+        
+        try:
+            content, encoding = data.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            content, encoding = base64.b64encode(data).decode("ascii"), "base64"
+        next_offset = offset + len(data)
+        remote_time, stat = self._parse_stat_line(raw, token)
+        return {
+            "path": path,
+            "content": content,
+            "encoding": encoding,
+            "offset": offset,
+            "length": len(data),
+            "size": size,
+            "next_offset": next_offset,
+            "eof": next_offset >= size,
+            "sha256": actual,
+            "verified": bool(checksum),
+            "transfer_bytes": transfer_bytes,
+            "mtime": stat[1] if stat else None,
+            "stat": stat,
+            "remote_time": remote_time,
+            "exit_code": 0,
+            "status": ExecutionStatus.COMPLETED.value,
+            "execution_time": time.time() - start_time
+        }
+    
+    async def write_file(
+        self,
+        path: str,
+        data: bytes,
+        append: bool = False,
+        compress: bool = True,
+        timeout: float = 60.0
+    ) -> Dict[str, Any]:
+        """写入远程文件
+        
+        内容（可选 gzip 压缩）按 base64 编码后作为 here-document 分块键入
+        面板，远程解码到同目录的临时文件；随后一批命令校验 sha256，校验
+        通过才写入目标文件。写入期间关闭shell历史，避免内容进入历史记录。
+        调用方需要持有面板锁。
+        
+        Args:
+            path: 远程文件路径
+            data: 文件内容
+            append: 是否追加到文件末尾
+            compress: 是否压缩后传输
+            timeout: 超时时间（秒）
+            
+        Returns:
+            写入结果
+        """
+        start_time = time.time()
+        token = f"__CBW_{uuid.uuid4().hex[:12]}"
+        checksum = hashlib.sha256(data).hexdigest()
+        payload = base64.encodebytes(gzip.compress(data) if compress else data).decode("ascii")
+        decoder = f"base64 -d <<'{token}'" + (" | gzip -dc" if compress else "")
+        quoted = shlex.quote(path)
+        
+        # 内容解码到目标目录下的临时文件；主机检查失败时不解码
+        script = (
+            "__cb_h=$(shopt -po history 2>/dev/null); set +o history\n"
+            f"if {self._host_guard() or 'true'}; then "
+            f"__cb_w=$(mktemp \"$(dirname {quoted})/.cb-write.XXXXXX\") && "
+            f"{decoder} > \"$__cb_w\"; __cb_wrc=$?; else __cb_wrc=1; fi\n"
+            f"{payload}{token}\n"
+        )
+        for index in range(0, len(script), self.SEND_CHUNK_SIZE):
+            returncode, stderr_text = await self._send_literal(script[index:index + self.SEND_CHUNK_SIZE])
+            if returncode != 0:
+                return {
+                    "path": path,
+                    "exit_code": returncode,
+                    "stderr": stderr_text or "发送文件内容失败",
+                    "status": ExecutionStatus.FAILED.value,
+                    "execution_time": time.time() - start_time
+                }
+        
+        # 校验通过后再写入目标文件，已有文件保留原来的权限
+        redirect = ">>" if append else ">|"
+        finish = (
+            'eval "$__cb_h"; if [ "$__cb_wrc" = 0 ] && '
+            '__cb_sum=$({ sha256sum < "$__cb_w"; } 2>/dev/null | cut -c1-64) && '
+            f'{{ [ -z "$__cb_sum" ] || [ "$__cb_sum" = {checksum} ]; }} '
+            f'&& cat "$__cb_w" {redirect} {quoted}; then rm -f "$__cb_w"; '
+            f'else rm -f "$__cb_w"; printf \'write failed: %s\\n\' {quoted}; false; fi'
+        )
+        result = await self.execute_batch([finish], timeout=max(0.0, start_time + timeout - time.time()))
+        response = {
+            "path": path,
+            "bytes_written": len(data) if result["exit_code"] == 0 else 0,
+            "append": append,
+            "sha256": checksum,
+            "transfer_bytes": len(payload),
+            "exit_code": result["exit_code"],
+            "status": result["status"],
+            "execution_time": time.time() - start_time
+        }
+        if result["exit_code"] != 0:
+            response["stderr"] = result["stderr"] or result["stdout"]
+        return response
+    
+    async def list_tree(
+        self,
+        path: str,
+        max_depth: int = 3,
+        patterns: Optional[List[str]] = None,
+        ignore: Optional[List[str]] = None,
+        prune_paths: Optional[List[str]] = None,
+        max_entries: int = 5000,
+        compress: bool = True,
+        timeout: float = 60.0
+    ) -> Dict[str, Any]:
+        """列出远程目录树
+        
+        一条 find -printf 命令输出每一项的类型、大小、修改时间和相对路径，
+        超过条数上限的部分在远程截断；输出与 read_file 一样经 pipe-pane
+        从原始字节中取回，不受屏幕捕获行数的限制。调用方需要持有面板锁。
+        
+        Args:
+            path: 远程目录
+            max_depth: 最大深度，1表示只列出目录本身的内容
+            patterns: 文件名通配符，任一匹配即列出，None表示不过滤
+            ignore: 不进入也不列出的文件名通配符（如 .git、node_modules）
+            prune_paths: 不进入也不列出的路径（安全策略禁止访问的路径）
+            max_entries: 最多返回的条数
+            compress: 是否在远程压缩后传输
+            timeout: 超时时间（秒）
+            
+        Returns:
+            目录树，entries 中每项为 {"path", "type", "size", "mtime"}
+        """
+        start_time = time.time()
+        token = f"__CBT_{uuid.uuid4().hex[:12]}"
+        command = self._build_tree_command(
+            path, token, max_depth, patterns or [], ignore or [], prune_paths or [], max_entries, compress
+        )
+        result, raw = await self._run_framed(command, token, timeout)
+        
+        failure = {
+            "path": path,
+            "exit_code": result["exit_code"] or 1,
+            "status": result["status"] if result["exit_code"] else ExecutionStatus.FAILED.value,
+            "execution_time": time.time() - start_time
+        }
+        if result["exit_code"] != 0:
+            return {**failure, "stderr": result["stderr"] or result["stdout"]}
+        
+        body = self._parse_framed_body(raw, token, compress)
+        if body is None:
+            return {**failure, "stderr": "未能从面板输出中取得完整的目录列表"}
+        data, transfer_bytes = body
+        entries = self._parse_tree_entries(data)
+        truncated = len(entries) > max_entries
+        entries = sorted(entries[:max_entries], key=lambda entry: entry["path"])
+        return {
+            "path": path,
+            "entries": entries,
+            "count": len(entries),
+            "truncated": truncated,
+            "transfer_bytes": transfer_bytes,
+            "exit_code": 0,
+            "status": ExecutionStatus.COMPLETED.value,
+            "execution_time": time.time() - start_time
+        }
+    
+    @staticmethod
+    def _build_tree_command(
+        path: str,
+        token: str,
+        max_depth: int,
+        patterns: List[str],
+        ignore: List[str],
+        prune_paths: List[str],
+        max_entries: int,
+        compress: bool
+    ) -> str:
+        """生成列出目录树的命令"""
+        prune = [f"-name {shlex.quote(name)}" for name in ignore]
+        prune += [f"-path {shlex.quote(prune_path)}" for prune_path in prune_paths]
+        expression = f"\\( {' -o '.join(prune)} \\) -prune -o " if prune else ""
+        if patterns:
+            names = " -o ".join(f"-name {shlex.quote(pattern)}" for pattern in patterns)
+            expression += f"\\( {names} \\) "
+        listing = (
+            f"find \"$__cb_t\" -mindepth 1 -maxdepth {max(1, max_depth)} {expression}"
+            f"-printf '%y\\t%s\\t%T@\\t%P\\n' 2>/dev/null | head -n {max_entries + 1}"
+        )
+        return (
+            f"__cb_t={shlex.quote(path)}; if [ -d \"$__cb_t\" ]; then "
+            f"{TmuxSession._frame_output(listing, token, compress)}; "
+            f"else printf 'not a directory: %s\\n' \"$__cb_t\"; false; fi"
+        )
+    
+    @staticmethod
+    def _parse_tree_entries(data: bytes) -> List[Dict[str, Any]]:
+        """解析 find -printf 的输出，跳过文件名中含换行等无法解析的行"""
+        types = {"f": "file", "d": "dir", "l": "link"}
+        entries = []
+        for line in data.decode("utf-8", errors="replace").split("\n"):
+            fields = line.split("\t", 3)
+            if len(fields) != 4 or not fields[3]:
+                continue
+            kind, size, mtime, relative = fields
+            try:
+                entries.append({
+                    "path": relative,
+                    "type": types.get(kind, "other"),
+                    "size": int(size),
+                    "mtime": int(float(mtime))
+                })
+            except ValueError:
+                continue
+        return entries
+    
+    async def search(
+        self,
+        pattern: str,
+        path: str = ".",
+        globs: Optional[List[str]] = None,
+        ignore: Optional[List[str]] = None,
+        ignore_case: bool = False,
+        fixed_strings: bool = False,
+        max_matches: int = 200,
+        max_bytes: int = 256 * 1024,
+        on_file: Optional[Callable[[Dict[str, Any]], None]] = None,
+        timeout: float = 60.0
+    ) -> Dict[str, Any]:
+        """在远程目录中搜索文本
+        
+        远程有 ripgrep 时使用 rg --json，否则退回 grep -rn。匹配条数和输出
+        字节数在远程截断，宽泛的查询不会刷满面板。输出经 pipe-pane 逐行
+        解析，每个文件的匹配结束后立即通过 on_file 回调传出。调用方需要
+        持有面板锁。
+        
+        Args:
+            pattern: 正则表达式（fixed_strings 为True时为普通字符串）
+            path: 搜索的目录或文件
+            globs: 只搜索匹配这些通配符的文件
+            ignore: 跳过的目录名
+            ignore_case: 是否忽略大小写
+            fixed_strings: 是否按普通字符串匹配
+            max_matches: 最多返回的匹配条数
+            max_bytes: 远程输出的最大字节数
+            on_file: 单个文件的匹配结束时的回调
+            timeout: 超时时间（秒）
+            
+        Returns:
+            搜索结果，files 中每项为 {"path", "matches": [{"line", "text"}]}
+        """
+        start_time = time.time()
+        token = f"__CBS_{uuid.uuid4().hex[:12]}"
+        command = self._build_search_command(
+            pattern, path, token, globs or [], ignore or [], ignore_case, fixed_strings, max_matches, max_bytes
+        )
+        
+        files: List[Dict[str, Any]] = []
+        current: Dict[str, Any] = {}
+        messages: List[str] = []
+        state = {"tool": None, "bytes": 0, "matches": 0}
+        
+        def finish_file() -> None:
+            if current.get("matches"):
+                group = dict(current)
+                files.append(group)
+                if on_file is not None:
+                    on_file(group)
+            current.clear()
+        
+        def handle(text: str) -> None:
+            for line in text.splitlines():
+                state["bytes"] += len(line.encode("utf-8", errors="replace")) + 1
+                if line.startswith(f"{token}_R "):
+                    state["tool"] = line.split()[-1]
+                    continue
+                parsed = self._parse_search_line(line, state["tool"])
+                if parsed is None:
+                    if line.strip() and len(messages) < 10:
+                        messages.append(line.strip())
+                    continue
+                file_path, line_number, match_text = parsed
+                if current and current["path"] != file_path:
+                    finish_file()
+                if line_number is None:
+                    # rg 的文件开始/结束记录
+                    continue
+                if state["matches"] >= max_matches:
+                    continue
+                current.setdefault("path", file_path)
+                current.setdefault("matches", []).append({"line": line_number, "text": match_text})
+                state["matches"] += 1
+        
+        result = await self._execute_streamed(
+            [command], stop_on_error=False, timeout=timeout, on_output=handle
+        )
+        finish_file()
+        
+        if result.get("timed_out") or result.get("disconnected") or result.get("connection_lost"):
+            return {
+                "pattern": pattern,
+                "path": path,
+                "exit_code": result["exit_code"],
+                "stderr": result["stderr"],
+                "status": result["status"],
+                "execution_time": time.time() - start_time
+            }
+        
+        response = {
+            "pattern": pattern,
+            "path": path,
+            "tool": state["tool"],
+            "files": files,
+            "file_count": len(files),
+            "match_count": state["matches"],
+            "truncated": state["matches"] >= max_matches or state["bytes"] >= max_bytes,
+            "exit_code": 0,
+            "status": ExecutionStatus.COMPLETED.value,
+            "execution_time": time.time() - start_time
+        }
+        if messages and not files:
+            # 正则表达式无效、路径不存在等错误
+            response.update({
+                "exit_code": 2,
+                "status": ExecutionStatus.FAILED.value,
+                "stderr": "\n".join(messages)
+            })
+        return response
+    
+    @staticmethod
+    def _build_search_command(
+        pattern: str,
+        path: str,
+        token: str,
+        globs: List[str],
+        ignore: List[str],
+        ignore_case: bool,
+        fixed_strings: bool,
+        max_matches: int,
+        max_bytes: int
+    ) -> str:
+        """生成搜索命令：优先使用 rg --json，没有 rg 时使用 grep"""
+        rg = ["rg", "--json", "--line-buffered", "--no-messages"]
+        grep = ["grep", "-rnIH", "-s", "--line-buffered", "--color=never"]
+        if ignore_case:
+            rg.append("-i")
+            grep.append("-i")
+        if fixed_strings:
+            rg.append("-F")
+            grep.append("-F")
+        else:
+            # 与 rg 的正则语法一致，使用扩展正则
+            grep.append("-E")
+        for glob in globs:
+            rg += ["--glob", shlex.quote(glob)]
+            grep.append(f"--include={shlex.quote(glob)}")
+        for name in ignore:
+            rg += ["--glob", shlex.quote(f"!{name}")]
+            grep.append(f"--exclude-dir={shlex.quote(name)}")
+        target = f"-e {shlex.quote(pattern)} -- \"$__cb_p\""
+        # rg 的输出中只有 match 记录计入匹配条数；达到条数后 awk 退出，rg 随之结束
+        limit_rg = f"awk -v m={max_matches} '{{print; fflush()}} /^\\{{\"type\":\"match\"/{{if (++n >= m) exit}}'"
+        return (
+            f"__cb_p={shlex.quote(path)}; if command -v rg >/dev/null 2>&1; then "
+            f"printf '%s_R rg\\n' {token}; {' '.join(rg)} {target} | {limit_rg}; "
+            f"else printf '%s_R grep\\n' {token}; {' '.join(grep)} {target} | head -n {max_matches}; "
+            f"fi | head -c {max_bytes}"
+        )
+    
+    @staticmethod
+    def _parse_search_line(line: str, tool: Optional[str]) -> Optional[Tuple[str, Optional[int], str]]:
+        """解析一行搜索输出
+        
+        Returns:
+            (文件路径, 行号, 匹配行内容)；rg 的文件开始/结束记录行号为None，
+            无法解析的行返回None
+        """
+        if tool == "rg":
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return None
+            if not isinstance(record, dict) or record.get("type") not in ("begin", "match", "end"):
+                return None
+            data = record.get("data", {})
+            file_path = TmuxSession._rg_text(data.get("path"))
+            if file_path is None:
+                return None
+            if record["type"] != "match":
+                return file_path, None, ""
+            text = TmuxSession._rg_text(data.get("lines")) or ""
+            return file_path, data.get("line_number"), text.rstrip("\r\n")[:MAX_MATCH_TEXT]
+        
+        match = re.match(r"^(.+?):(\d+):(.*)$", line)
+        if match is None:
+            return None
+        return match.group(1), int(match.group(2)), match.group(3)[:MAX_MATCH_TEXT]
+    
+    @staticmethod
+    def _rg_text(value: Any) -> Optional[str]:
+        """取出 rg --json 中的文本，非UTF-8内容以 base64 的 bytes 字段给出"""
+        if not isinstance(value, dict):
+            return None
+        if "text" in value:
+            return value["text"]
+        if "bytes" in value:
+            return base64.b64decode(value["bytes"]).decode("utf-8", errors="replace")
+        return None
+    
+    async def _run_framed(self, command: str, token: str, timeout: float) -> Tuple[Dict[str, Any], bytes]:
+        """执行输出带分帧标记的命令，从原始输出字节中取回结果
+        
+        Returns:
+            (执行结果, 命令执行成功时的原始输出)
+        """
+        stream, temporary = await self._transfer_stream()
+        raw_start = stream.raw_size()
+        try:
+            result = await self.execute_batch([command], timeout=timeout)
+            raw = await self._read_transfer(stream, raw_start, token) if result["exit_code"] == 0 else b""
+        finally:
+            if temporary:
+                await stream.stop()
+        return result, raw
+    
+    @staticmethod
+    def _frame_output(command: str, token: str, compress: bool) -> str:
+        """把命令的输出（可选压缩）编码后放在两个标记行之间"""
+        encoder = "gzip -c | base64" if compress else "base64"
+        return f"printf '%s_B\\n' {token}; {command} | {encoder}; printf '%s_F\\n' {token}"
+    
+    @staticmethod
+    def _parse_framed_body(raw: bytes, token: str, compress: bool) -> Optional[Tuple[bytes, int]]:
+        """取出两个标记行之间的内容并解码
+        
+        Returns:
+            (内容, 传输的编码字节数)，输出不完整时返回None
+        """
+        marker = re.escape(token.encode())
+        body = re.search(rb"^" + marker + rb"_B\r?\n(.*?)^" + marker + rb"_F", raw, re.MULTILINE | re.DOTALL)
+        if body is None:
+            return None
+        try:
+            # 换行和回车不属于base64字母表，解码时被忽略
+            data = base64.b64decode(body.group(1))
+            if compress:
+                data = gzip.decompress(data)
+        except (ValueError, OSError, EOFError):
+            return None
+        return data, len(body.group(1))
+    
+    async def _transfer_stream(self) -> Tuple[PaneStream, bool]:
+        """获取传输文件用的输出流
+        
+        Returns:
+            (输出流, 是否为临时启动的输出流)
+        """
+        stream = await self._get_stream()
+        if stream is not None:
+            return stream, False
+        stream = PaneStream(self.target, tmux_command=self._tmux)
+        await stream.start()
+        return stream, True
+    
+    async def _read_transfer(self, stream: PaneStream, start: int, token: str, wait: float = 1.0) -> bytes:
+        """读取传输的原始输出
+        
+        pipe-pane 写文件与面板显示是异步的，结束标记出现在屏幕上时文件
+        可能还没写完，短暂等待直到结束标记写入文件。
+        """
+        end_marker = f"{token}_F".encode()
+        deadline = time.time() + wait
+        while True:
+            raw = stream.read_raw(start)
+            if end_marker in raw or time.time() >= deadline:
+                return raw
+            await asyncio.sleep(0.02)
+    
+    @staticmethod
+    def _build_read_command(path: str, token: str, offset: int, length: int, compress: bool) -> str:
+        """生成读取文件一段内容的命令"""
+        quoted = shlex.quote(path)
+        section = f'tail -c +{offset + 1} "$__cb_f" | head -c {length}'
+        return (
+            f"__cb_f={quoted}; if [ -f \"$__cb_f\" ] && [ -r \"$__cb_f\" ]; then "
+            f"printf '%s_S %s %s\\n' {token} \"$(date +%s)\" \"$({STAT_COMMAND} \"$__cb_f\" 2>/dev/null)\"; "
+            f"printf '%s_M %s %s\\n' {token} \"$(wc -c < \"$__cb_f\")\" "
+            f"\"$({section} | sha256sum 2>/dev/null | cut -c1-64)\"; "
+            f"{TmuxSession._frame_output(section, token, compress)}; "
+            f"else printf 'cannot read file: %s\\n' \"$__cb_f\"; false; fi"
+        )
+    
+    @staticmethod
+    def _parse_read_output(
+        raw: bytes, token: str, compress: bool
+    ) -> Optional[Tuple[int, str, bytes, int]]:
+        """从原始输出中取出文件内容
+        
+        Returns:
+            (文件大小, 远程sha256, 内容, 传输的编码字节数)，输出不完整时返回None
+        """
+        marker = re.escape(token.encode())
+        meta = re.search(rb"^" + marker + rb"_M\s+(\d+) ([0-9a-f]*)\r?$", raw, re.MULTILINE)
+        body = TmuxSession._parse_framed_body(raw, token, compress)
+        if meta is None or body is None:
+            return None
+        return int(meta.group(1)), meta.group(2).decode(), body[0], body[1]
+    
+    @staticmethod
+    def _parse_stat_line(raw: bytes, token: str) -> Tuple[Optional[int], Optional[Tuple[int, int, int]]]:
+        """从原始输出中取出读取时的远程时间和文件元数据
+
+        Returns:
+            (远程时间, (大小, 修改时间, inode))，远程没有GNU stat时元数据为None
+        """
+        match = re.search(
+            rb"^" + re.escape(token.encode()) + rb"_S (\d+) ?(?:(\d+) (\d+) (\d+))?\r?$", raw, re.MULTILINE
+        )
+        if match is None:
+            return None, None
+        stat = tuple(int(value) for value in match.group(2, 3, 4)) if match.group(2) else None
+        return int(match.group(1)), stat
+    
+    async def check_files(
+        self,
+        paths: List[str],
+        expected: List[Tuple[int, Optional[Tuple[int, int, int]]]],
+        timeout: float = 30.0
+    ) -> Dict[str, Any]:
+        """批量核对远程文件是否变化
+        
+        一批命令输出每个文件当前的大小、修改时间和inode；与期望的元数据
+        不一致但大小相同（或远程没有GNU stat）时再输出内容的sha256，
+        由调用方按哈希判断内容是否真的变化。路径较多时分成几批发送，
+        保证键入的脚本不超过 tmux 单次发送的长度限制。调用方需要持有面板锁。
+        
+        Args:
+            paths: 远程文件路径
+            expected: 每个文件缓存时的 (大小, 元数据)，元数据为None时总是比较哈希
+            timeout: 超时时间（秒）
+            
+        Returns:
+            核对结果，files 中每项为 {"stat": 元数据或None, "sha256": 哈希或None}
+        """
+        start_time = time.time()
+        token = f"__CBV_{uuid.uuid4().hex[:12]}"
+        # 参数: 序号 路径 期望的元数据 缓存的大小
+        function = (
+            f"__cb_v() {{ __cb_s=$({STAT_COMMAND} \"$2\" 2>/dev/null); __cb_h=; "
+            f"if [ -r \"$2\" ] && [ \"$__cb_s\" != \"$3\" ]; then case \"$__cb_s\" in \"\"|\"$4 \"*) "
+            f"__cb_h=$(sha256sum < \"$2\" 2>/dev/null | cut -c1-64);; esac; fi; "
+            f"printf '%s_V %s %s|%s\\n' {token} \"$1\" \"$__cb_s\" \"$__cb_h\"; }}"
+        )
+        
+        batches: List[List[str]] = [[]]
+        length = 0
+        for index, (path, (size, stat)) in enumerate(zip(paths, expected)):
+            stat_text = " ".join(str(value) for value in stat) if stat else "-"
+            call = f"__cb_v {index} {shlex.quote(path)} {shlex.quote(stat_text)} {size}"
+            if batches[-1] and length + len(call) > self.SEND_CHUNK_SIZE:
+                batches.append([])
+                length = 0
+            batches[-1].append(call)
+            length += len(call) + 2
+        
+        files: List[Dict[str, Any]] = [{"stat": None, "sha256": None} for _ in paths]
+        remote_time = None
+        for calls in batches:
+            command = f"{function}; printf '%s_T %s\\n' {token} \"$(date +%s)\"; " + "; ".join(calls)
+            result = await self.execute_batch([command], timeout=max(0.0, start_time + timeout - time.time()))
+            if result["exit_code"] != 0:
+                return {
+                    "exit_code": result["exit_code"],
+                    "stderr": result["stderr"] or result["stdout"],
+                    "status": result["status"],
+                    "execution_time": time.time() - start_time
+                }
+            
+            output = result["stdout"]
+            now = re.search(rf"^{token}_T (\d+)", output, re.MULTILINE)
+            if now:
+                remote_time = int(now.group(1))
+            for match in re.finditer(
+                rf"^{token}_V (\d+) (?:(\d+) (\d+) (\d+))?\|([0-9a-f]*)$", output, re.MULTILINE
+            ):
+                index = int(match.group(1))
+                if index < len(files):
+                    files[index] = {
+                        "stat": tuple(int(value) for value in match.group(2, 3, 4)) if match.group(2) else None,
+                        "sha256": match.group(5) or None
+                    }
+        
+        return {
+            "files": files,
+            "remote_time": remote_time,
+            "exit_code": 0,
+            "status": ExecutionStatus.COMPLETED.value,
+            "execution_time": time.time() - start_time
+        }
+    
+    async def interrupt(self, grace: float = 1.0, poll_interval: float = 0.1) -> bool:
+        """中断面板中正在运行的命令
+        
+        按 INTERRUPT_SEQUENCE 逐步升级发送按键，每一步之后向面板发送探测
+        命令，探测命令输出说明shell已回到提示符。
+        
+        Args:
+            grace: 每一步等待面板恢复的时间（秒）
+            poll_interval: 轮询间隔（秒）
+            
+        Returns:
+            面板是否已回到提示符
+        """
+        for keys in self.INTERRUPT_SEQUENCE:
+            logger.info(f"中断面板命令: {self.target} {' '.join(keys)}")
+            await self._send_keys(*keys)
+            if await self._wait_for_prompt(grace, poll_interval):
+                self.healthy = True
+                return True
+        
+        logger.warning(f"面板中断后仍未回到提示符: {self.target}")
+        self.healthy = False
+        return False
+    
+    async def ensure_ready(self, timeout: float) -> bool:
+        """确认面板可以执行新命令，调用方需要持有面板锁
+        
+        面板上次中断后未回到提示符时重新发送探测命令；仍无响应且配置了
+        自动重连时，按重连流程结束卡住的SSH客户端。
+        
+        Args:
+            timeout: 等待提示符的最长时间（秒），不超过 READY_PROBE_TIMEOUT
+            
+        Returns:
+            面板是否可以执行新命令
+        """
+        if self.healthy:
+            return True
+        if await self._wait_for_prompt(min(timeout, self.READY_PROBE_TIMEOUT)):
+            logger.info(f"面板已恢复到提示符: {self.target}")
+            self.healthy = True
+        elif self.connect_commands:
+            self.healthy = await self.reconnect()
+        return self.healthy
+    
+    async def probe_host(self, timeout: float, poll_interval: float = 0.2) -> Optional[str]:
+        """发送探测命令，返回面板shell所在的主机名，超时返回None"""
+        token = f"__CB_{uuid.uuid4().hex[:12]}"
+        await self._send_literal(f"printf '%s_HOST_%s\\n' {token} {HOST_EXPR}")
+        await self._send_keys("Enter")
+        
+        host_pattern = re.compile(rf"^{token}_HOST_(\S+)", re.MULTILINE)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            await asyncio.sleep(poll_interval)
+            match = host_pattern.search(await self.capture_output(lines=50, join_lines=True))
+            if match:
+                return match.group(1)
+        return None
+    
+    async def _local_shell_in_foreground(self) -> bool:
+        """面板的本机shell是否回到了前台
+        
+        连接远程主机时前台是SSH客户端（或代理工具）的进程组；本机shell
+        重新成为终端的前台进程组，说明连接命令已经退出。
+        """
+        try:
+            result = await asyncio.create_subprocess_exec(
+                *self._tmux, "display-message", "-p", "-t", self.target, "#{pane_pid}",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout_data, _ = await result.communicate()
+            pane_pid = stdout_data.decode('utf-8', errors='ignore').strip()
+            if result.returncode != 0 or not pane_pid.isdigit():
+                return False
+            
+            result = await asyncio.create_subprocess_exec(
+                "ps", "-o", "tpgid=", "-p", pane_pid,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout_data, _ = await result.communicate()
+            return stdout_data.decode('utf-8', errors='ignore').strip() == pane_pid
+        except Exception as e:
+            logger.debug(f"检查面板前台进程失败: {e}")
+            return False
+    
+    def _is_remote(self, host: Optional[str]) -> bool:
+        """主机名是否是预期的远程主机"""
+        if not host:
+            return False
+        if self.expected_host:
+            return host == self.expected_host
+        return host != socket.gethostname()
+    
+    async def reconnect(self) -> bool:
+        """在面板中重新建立到远程主机的连接
+        
+        先确认面板回到本机shell（冻结的SSH客户端用 ~. 结束），然后执行
+        连接命令，并用探测命令确认远程提示符已经出现。
+        
+        Returns:
+            是否已连接到远程主机
+        """
+        host = await self.probe_host(2.0)
+        if self._is_remote(host):
+            return True
+        
+        if host is None:
+            # 面板无响应：SSH客户端可能卡在已断开的连接上
+            logger.warning(f"面板无响应，结束SSH客户端: {self.target}")
+            await self._send_keys("Enter")
+            await self._send_literal("~.")
+            await self._send_keys("C-c")
+            host = await self.probe_host(3.0)
+            if host is None:
+                logger.error(f"面板未恢复到本机shell，放弃重连: {self.target}")
+                return False
+        
+        logger.info(f"重新连接远程主机: {self.target}")
+        self.reconnects += 1
+        for command in self.connect_commands:
+            await self._send_literal(command)
+            await self._send_keys("Enter")
+        
+        # 反复探测直到远程shell开始读取输入
+        deadline = time.time() + self.connect_timeout
+        while time.time() < deadline:
+            host = await self.probe_host(min(2.0, max(0.1, deadline - time.time())))
+            if host is not None and not self._is_remote(host):
+                # 本机shell执行了探测命令，说明连接命令已经退出
+                logger.error(f"连接命令已退出，重连失败: {self.target}")
+                return False
+            if self._is_remote(host):
+                # 新的shell：目录和环境变量需要重新设置
+                self.host = host
+                self.cwd = None
+                self.healthy = True
+                logger.info(f"已重新连接: {self.target} -> {host}")
+                return True
+        
+        logger.error(f"重新连接超时: {self.target}")
+        return False
+    
+    async def _wait_for_prompt(self, timeout: float, poll_interval: float = 0.1) -> bool:
+        """发送探测命令并等待其输出，确认shell可以执行新命令"""
+        token = f"__CB_{uuid.uuid4().hex[:12]}"
+        probe = f"printf '%s_READY\\n' {token}"
+        await self._send_literal(probe)
+        await self._send_keys("Enter")
+        
+        ready_pattern = re.compile(rf"^{token}_READY$", re.MULTILINE)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            await asyncio.sleep(poll_interval)
+            output = await self.capture_output(lines=50, join_lines=True)
+            if ready_pattern.search(output):
+                return True
+        return False
+    
+    @staticmethod
+    def _build_setup(working_directory: Optional[str], exports: Dict[str, str]) -> Optional[str]:
+        """生成前置设置命令，没有需要设置的内容时返回None
+        
+        目录和环境变量都在shell中比较后才切换或导出：面板可能被用户手动
+        修改过，超时中断或重连后也可能换成了新的shell，不能只依赖记录的状态。
+        """
+        parts = []
+        if working_directory:
+            quoted = shlex.quote(working_directory)
+            parts.append(f"{{ [ \"$PWD\" = {quoted} ] || cd {quoted}; }}")
+        for key, value in exports.items():
+            quoted = shlex.quote(value)
+            parts.append(f"{{ [ \"${{{key}-}}\" = {quoted} ] || export {key}={quoted}; }}")
+        return " && ".join(parts) if parts else None
+    
+    @staticmethod
+    def _build_batch_script(
+        commands: List[str],
+        token: str,
+        stop_on_error: bool,
+        setup: Optional[str] = None,
+        host_guard: Optional[str] = None
+    ) -> str:
+        """生成单行批处理脚本"""
+        parts = ["__cb_rc=0"]
+        for index, command in enumerate(commands):
+            step = (
+                f"printf '%s_S_%d_%s\\n' {token} {index} \"$(date +%s%N)\"; "
+                f"eval {shlex.quote(command)}; __cb_rc=$?; "
+                # 结束标记前先换行：输出末尾没有换行（printf abc、echo -n）时
+                # 标记仍独占一行，解析时去掉这个多出的换行
+                f"printf '\\n%s_E_%d_%d_%s\\n' {token} {index} $__cb_rc \"$(date +%s%N)\""
+            )
+            if stop_on_error and index > 0:
+                step = f"if [ $__cb_rc -eq 0 ]; then {step}; fi"
+            parts.append(step)
+        script = "; ".join(parts)
+        if setup:
+            # 设置失败时不执行任何命令
+            script = (
+                f"printf '%s_P\\n' {token}; {setup}; __cb_rc=$?; "
+                f"printf '%s_Q_%d\\n' {token} $__cb_rc; "
+                f"if [ $__cb_rc -eq 0 ]; then {script}; fi"
+            )
+        if host_guard:
+            # 面板不在预期的主机上时不执行任何命令
+            script = f"if {host_guard}; then {script}; else printf '%s_H_%s\\n' {token} {HOST_EXPR}; fi"
+        return f"{script}; printf '%s_DONE %s %s\\n' {token} {HOST_EXPR} \"$PWD\""
+    
+    @staticmethod
+    def _parse_setup_output(output: str, token: str) -> Optional[Tuple[int, str]]:
+        """解析前置设置的退出码和输出，未找到标记时返回None"""
+        match = re.search(
+            rf"^{token}_P[ \t]*\n(.*?)^{token}_Q_(-?\d+)[ \t]*$", output, re.MULTILINE | re.DOTALL
+        )
+        if match is None:
+            return None
+        return int(match.group(2)), match.group(1).strip()
+    
+    @staticmethod
+    def _parse_batch_output(output: str, commands: List[str], token: str) -> List[Dict[str, Any]]:
+        """按标记行切分批处理输出"""
+        start_marker = re.compile(rf"^{token}_S_(\d+)_(\S*)$")
+        end_marker = re.compile(rf"^{token}_E_(\d+)_(-?\d+)_(\S*)$")
+        steps = [
+            {"index": i, "command": command, "stdout": "", "exit_code": None,
+             "execution_time": None, "status": "skipped"}
+            for i, command in enumerate(commands)
+        ]
+        
+        current = None
+        started_at: Dict[int, str] = {}
+        buffer: List[str] = []
+        for line in output.split('\n'):
+            stripped = line.strip()
+            start_match = start_marker.match(stripped)
+            if start_match and int(start_match.group(1)) < len(steps):
+                current = int(start_match.group(1))
+                started_at[current] = start_match.group(2)
+                buffer = []
+                steps[current]["status"] = "running"
+                continue
+            
+            end_match = end_marker.match(stripped)
+            if end_match and int(end_match.group(1)) < len(steps):
+                index, exit_code = int(end_match.group(1)), int(end_match.group(2))
+                step = steps[index]
+                if index != current:
+                    # 起始标记已滚出历史缓冲区，只保留了输出的末尾部分
+                    step["truncated"] = True
+                if buffer and not buffer[-1].strip():
+                    # 结束标记前额外输出的换行
+                    buffer.pop()
+                step["stdout"] = "\n".join(buffer).rstrip()
+                step["exit_code"] = exit_code
+                step["status"] = "completed" if exit_code == 0 else "failed"
+                try:
+                    step["execution_time"] = (int(end_match.group(3)) - int(started_at[index])) / 1e9
+                except (KeyError, ValueError):
+                    step["execution_time"] = None
+                current = None
+                buffer = []
+                continue
+            
+            buffer.append(line)
+        
+        # 超时时正在运行的步骤保留已产生的输出
+        if current is not None:
+            steps[current]["stdout"] = "\n".join(buffer).rstrip()
+        
+        return steps
+    
+    async def _get_stream(self) -> Optional[PaneStream]:
+        """获取面板输出流，capture_method 不是 stream 且没有订阅者时返回None"""
+        if self.capture_method != "stream" and not self._followers:
+            return None
+        if self._stream is None:
+            self._stream = PaneStream(self.target, tmux_command=self._tmux)
+        if not self._stream.active:
+            await self._stream.start()
+        else:
+            await self._stream.rotate_if_needed()
+            await self._stream.refresh_size()
+        return self._stream
+    
+    async def _execute_streamed(self, commands: List[str], **kwargs: Any) -> Dict[str, Any]:
+        """临时使用 stream 方式执行 execute_batch
+        
+        输出经 pipe-pane 逐行取回，不受屏幕捕获行数的限制；原本不是 stream
+        方式时执行结束后停止输出流。
+        """
+        capture_method = self.capture_method
+        self.capture_method = "stream"
+        try:
+            return await self.execute_batch(commands, **kwargs)
+        finally:
+            self.capture_method = capture_method
+            if capture_method != "stream" and not self._followers:
+                await self.close()
+    
+    async def follow(self) -> PaneLogReader:
+        """订阅面板日志，返回从当前位置开始读取的日志读取器
+        
+        pipe-pane 同一时间只能有一个管道，订阅与命令执行共用面板的输出流；
+        有订阅者时输出流保持开启。
+        """
+        self._followers += 1
+        try:
+            if self._stream is None:
+                self._stream = PaneStream(self.target, tmux_command=self._tmux)
+            if not self._stream.active:
+                await self._stream.start()
+        except BaseException:
+            self._followers -= 1
+            raise
+        return PaneLogReader(self._stream)
+    
+    async def unfollow(self) -> None:
+        """取消面板日志订阅，最后一个订阅者取消且不是 stream 方式时停止输出流"""
+        self._followers = max(0, self._followers - 1)
+        if not self._followers and self.capture_method != "stream":
+            await self.close()
+    
+    async def close(self) -> None:
+        """停止面板输出流"""
+        if self._stream is not None:
+            await self._stream.stop()
+            self._stream = None
+    
+    async def _send_literal(self, text: str) -> Tuple[int, str]:
+        """向面板逐字发送文本（不解析按键名称，不回车）
+        
+        Returns:
+            (tmux命令的返回码, 错误输出)
+        """
+        result = await asyncio.create_subprocess_exec(
+            *self._tmux, "send-keys", "-t", self.target, "-l", text,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr_data = await result.communicate()
+        return result.returncode, stderr_data.decode('utf-8', errors='ignore')
+    
+    async def _send_keys(self, *keys: str) -> int:
+        """向面板发送按键
+        
+        Args:
+            *keys: tmux按键名称，如 "Enter"、"C-c"
+            
+        Returns:
+            tmux命令的返回码
+        """
+        result = await asyncio.create_subprocess_exec(
+            *self._tmux, "send-keys", "-t", self.target, *keys,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        await result.wait()
+        return result.returncode
+    
     def _extract_recent_output(self, full_output: str, command: str) -> str:
         """提取最近的命令输出"""
         lines = full_output.split('\n')
@@ -144,18 +1679,74 @@ class TmuxSession:
         
         return '\n'.join(result_lines)
     
-    async def capture_output(self, lines: int = 100) -> str:
+    async def get_position(self) -> Optional[Dict[str, int]]:
+        """记录面板当前的输出位置
+        
+        绝对行号 = 历史行数 + 光标所在行。之后的新输出都从这一行开始，
+        可以用 capture_since 精确捕获，不需要在输出中搜索命令文本。
+        
+        Returns:
+            位置信息，获取失败时返回None
+        """
+        try:
+            result = await asyncio.create_subprocess_exec(
+                *self._tmux, "display-message", "-p", "-t", self.target,
+                "#{history_size} #{history_limit} #{cursor_y}",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout_data, _ = await result.communicate()
+            history_size, history_limit, cursor_y = (int(v) for v in stdout_data.decode().split())
+        except Exception as e:
+            logger.debug(f"获取面板位置失败: {e}")
+            return None
+        return {
+            "line": history_size + cursor_y,
+            "history_size": history_size,
+            "history_limit": history_limit
+        }
+    
+    async def capture_since(self, position: Optional[Dict[str, int]], join_lines: bool = True) -> Optional[str]:
+        """捕获从记录位置开始的新输出
+        
+        Args:
+            position: get_position 返回的位置
+            join_lines: 是否合并因宽度折行的行
+            
+        Returns:
+            新输出；历史缓冲区已满（旧行被丢弃导致行号漂移）时返回None
+        """
+        if position is None or position["history_size"] >= position["history_limit"]:
+            return None
+        current = await self.get_position()
+        if current is None or current["history_size"] >= current["history_limit"]:
+            return None
+        start = max(position["line"] - current["history_size"], -current["history_size"])
+        return await self.capture_output(join_lines=join_lines, start=start)
+    
+    async def capture_output(
+        self,
+        lines: int = 100,
+        join_lines: bool = False,
+        start: Optional[int] = None
+    ) -> str:
         """捕获tmux面板输出
         
         Args:
-            lines: 捕获的行数
+            lines: 捕获的历史行数
+            join_lines: 是否合并因宽度折行的行
+            start: 起始行（tmux行号：0为可见区域第一行，负数为历史行），
+                指定时忽略 lines
             
         Returns:
             输出内容
         """
         try:
             # 使用 -p 参数直接输出，-S 指定开始行数
-            cmd = ["tmux", "capture-pane", "-t", self.target, "-p", "-S", f"-{lines}"]
+            start_line = str(start) if start is not None else f"-{lines}"
+            cmd = [*self._tmux, "capture-pane", "-t", self.target, "-p", "-S", start_line]
+            if join_lines:
+                cmd.append("-J")
             logger.debug(f"捕获输出: {' '.join(cmd)}")
             
             result = await asyncio.create_subprocess_exec(
@@ -183,15 +1774,13 @@ class TmuxSession:
     
     def _clean_ansi_codes(self, text: str) -> str:
         """清理ANSI转义码"""
-        # 移除ANSI转义序列
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        return ansi_escape.sub('', text)
+        return strip_ansi(text)
     
     async def get_session_info(self) -> Dict[str, Any]:
         """获取会话信息"""
         try:
             # 获取会话列表
-            cmd = ["tmux", "list-sessions", "-F", "#{session_name},#{session_created},#{session_attached}"]
+            cmd = [*self._tmux, "list-sessions", "-F", "#{session_name},#{session_created},#{session_attached}"]
             result = await asyncio.create_subprocess_exec(
                 *cmd,
                 stdout=asyncio.subprocess.PIPE,
@@ -226,17 +1815,44 @@ class TmuxSession:
 
 
 class TmuxBackend:
-    """tmux后端管理器"""
+    """tmux后端管理器
     
-    def __init__(self):
+    除了为已有会话提供控制器，还负责由 SessionManager 托管的会话的
+    创建、查询和销毁。托管会话名带有 session_prefix，与用户手动创建的
+    会话区分开。
+    """
+    
+    # 托管会话的窗口名
+    WINDOW_NAME = "main"
+    
+    def __init__(self, socket_name: Optional[str] = None, session_prefix: str = ""):
+        """初始化tmux后端
+        
+        Args:
+            socket_name: tmux服务器socket名称（tmux -L），None表示默认服务器
+            session_prefix: 托管会话名前缀
+        """
+        self.socket_name = socket_name
+        self.session_prefix = session_prefix
         self.sessions: Dict[str, TmuxSession] = {}
+        self._tmux = ("tmux", "-L", socket_name) if socket_name else ("tmux",)
+    
+    def full_name(self, name: str) -> str:
+        """托管会话对应的tmux会话名"""
+        return f"{self.session_prefix}{name}"
         
-    def get_session(self, session_name: str, window_name: str = "main") -> TmuxSession:
+    def get_session(
+        self,
+        session_name: str,
+        window_name: str = "main",
+        capture_method: str = "capture"
+    ) -> TmuxSession:
         """获取或创建tmux会话控制器
         
         Args:
             session_name: 会话名称
             window_name: 窗口名称
+            capture_method: 输出获取方式，capture 或 stream
             
         Returns:
             tmux会话控制器
@@ -244,30 +1860,216 @@ class TmuxBackend:
         key = f"{session_name}:{window_name}"
         
         if key not in self.sessions:
-            self.sessions[key] = TmuxSession(session_name, window_name)
+            self.sessions[key] = TmuxSession(
+                session_name, window_name, capture_method, socket_name=self.socket_name
+            )
             
         return self.sessions[key]
     
+    async def _run_tmux_command(self, *args: str) -> Dict[str, Any]:
+        """执行tmux命令
+        
+        Returns:
+            {"exit_code", "stdout", "stderr"}
+        """
+        process = await asyncio.create_subprocess_exec(
+            *self._tmux, *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout_data, stderr_data = await process.communicate()
+        return {
+            "exit_code": process.returncode,
+            "stdout": stdout_data.decode('utf-8', errors='ignore'),
+            "stderr": stderr_data.decode('utf-8', errors='ignore')
+        }
+    
+    async def create_session(self, config: SessionConfig) -> bool:
+        """按会话配置创建托管tmux会话
+        
+        Args:
+            config: 会话配置（工作目录、环境变量、shell）
+            
+        Returns:
+            是否创建成功
+        """
+        args = ["new-session", "-d", "-s", self.full_name(config.name), "-n", self.WINDOW_NAME]
+        if config.working_directory:
+            args += ["-c", config.working_directory]
+        for key, value in config.environment.items():
+            args += ["-e", f"{key}={value}"]
+        if config.shell:
+            args.append(config.shell)
+        
+        try:
+            result = await self._run_tmux_command(*args)
+        except Exception as e:
+            logger.error(f"创建tmux会话异常: {e}")
+            return False
+        
+        if result["exit_code"] != 0:
+            logger.error(f"创建tmux会话失败: {config.name}, {result['stderr'].strip()}")
+            return False
+        
+        logger.info(f"已创建tmux会话: {self.full_name(config.name)}")
+        return True
+    
+    async def destroy_session(self, name: str) -> bool:
+        """销毁托管tmux会话，会话已不存在时也视为成功"""
+        full_name = self.full_name(name)
+        tmux_session = self.sessions.pop(f"{full_name}:{self.WINDOW_NAME}", None)
+        if tmux_session is not None:
+            await tmux_session.close()
+        
+        try:
+            result = await self._run_tmux_command("kill-session", "-t", f"={full_name}")
+        except Exception as e:
+            logger.error(f"销毁tmux会话异常: {e}")
+            return False
+        
+        if result["exit_code"] != 0 and "can't find session" not in result["stderr"]:
+            logger.error(f"销毁tmux会话失败: {name}, {result['stderr'].strip()}")
+            return False
+        
+        logger.info(f"已销毁tmux会话: {full_name}")
+        return True
+    
+    async def get_session_info(self, name: str, server_name: str = "local") -> Optional[SessionInfo]:
+        """查询托管tmux会话的实时信息
+        
+        Returns:
+            会话信息，会话不存在时返回None
+        """
+        try:
+            result = await self._run_tmux_command(
+                "display-message", "-p", "-t", f"={self.full_name(name)}:{self.WINDOW_NAME}",
+                "#{session_created}\t#{session_activity}\t#{pane_pid}\t#{pane_dead}\t#{pane_current_path}"
+            )
+        except Exception as e:
+            logger.error(f"获取tmux会话信息异常: {e}")
+            return None
+        
+        parts = result["stdout"].rstrip("\n").split("\t")
+        if result["exit_code"] != 0 or len(parts) < 5:
+            return None
+        
+        created, activity, pid, dead, path = parts[:5]
+        return SessionInfo(
+            name=name,
+            server_name=server_name,
+            status=SessionStatus.ERROR if dead == "1" else SessionStatus.ACTIVE,
+            session_type=SessionType.INTERACTIVE,
+            created_at=float(created or 0),
+            last_activity=float(activity or created or 0),
+            pid=int(pid) if pid.isdigit() else None,
+            working_directory=path or None
+        )
+    
+    async def list_sessions(self) -> Optional[List[str]]:
+        """列出托管会话名（不含前缀）
+        
+        Returns:
+            会话名列表，查询失败时返回None
+        """
+        try:
+            result = await self._run_tmux_command("list-sessions", "-F", "#{session_name}")
+        except Exception as e:
+            logger.error(f"列出tmux会话异常: {e}")
+            return None
+        
+        if result["exit_code"] != 0:
+            # tmux服务器未运行说明没有任何会话
+            if "no server running" in result["stderr"] or "error connecting" in result["stderr"]:
+                return []
+            logger.error(f"列出tmux会话失败: {result['stderr'].strip()}")
+            return None
+        
+        prefix = self.session_prefix
+        return [
+            line[len(prefix):]
+            for line in result["stdout"].splitlines()
+            if line and line.startswith(prefix)
+        ]
+    
+    async def list_panes(self) -> Optional[List[Dict[str, Any]]]:
+        """用一次 list-panes -a 获取所有面板的元数据
+
+        Returns:
+            面板列表，每项包含 session、window、pane_id、pid、dead、
+            current_path、activity；查询失败时返回None
+        """
+        try:
+            result = await self._run_tmux_command(
+                "list-panes", "-a", "-F",
+                "#{session_name}\t#{window_name}\t#{pane_id}\t#{pane_pid}\t"
+                "#{pane_dead}\t#{session_activity}\t#{pane_current_path}"
+            )
+        except Exception as e:
+            logger.error(f"列出tmux面板异常: {e}")
+            return None
+
+        if result["exit_code"] != 0:
+            if "no server running" in result["stderr"] or "error connecting" in result["stderr"]:
+                return []
+            logger.error(f"列出tmux面板失败: {result['stderr'].strip()}")
+            return None
+
+        panes = []
+        for line in result["stdout"].splitlines():
+            parts = line.split("\t", 6)
+            if len(parts) < 7:
+                continue
+            session, window, pane_id, pid, dead, activity, path = parts
+            panes.append({
+                "session": session,
+                "window": window,
+                "pane_id": pane_id,
+                "pid": int(pid) if pid.isdigit() else None,
+                "dead": dead == "1",
+                "activity": float(activity) if activity.isdigit() else None,
+                "current_path": path or None
+            })
+        return panes
+
+    def is_busy(self, name: str) -> bool:
+        """托管会话的面板上是否有命令正在执行"""
+        tmux_session = self.sessions.get(f"{self.full_name(name)}:{self.WINDOW_NAME}")
+        return tmux_session is not None and tmux_session.lock.locked()
+    
+    async def execute_command(self, name: str, command: str, timeout: float = 30) -> CommandResult:
+        """在托管会话中执行命令"""
+        tmux_session = self.get_session(self.full_name(name), self.WINDOW_NAME)
+        async with tmux_session.lock:
+            if not await tmux_session.ensure_ready(timeout):
+                return CommandResult(
+                    command=command,
+                    exit_code=1,
+                    stdout="",
+                    stderr="面板上一次中断后仍未回到提示符，命令未执行",
+                    execution_time=0.0
+                )
+            result = await tmux_session.run_command(command, timeout=timeout)
+        return CommandResult(
+            command=command,
+            exit_code=result["exit_code"],
+            stdout=result["stdout"],
+            stderr=result["stderr"],
+            execution_time=result["execution_time"] or 0.0
+        )
+    
     async def list_all_sessions(self) -> List[Dict[str, Any]]:
         """列出所有tmux会话"""
         try:
-            cmd = ["tmux", "list-sessions", "-F", "#{session_name},#{session_created},#{session_attached}"]
-            result = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+            result = await self._run_tmux_command(
+                "list-sessions", "-F", "#{session_name},#{session_created},#{session_attached}"
             )
             
-            stdout_data, stderr_data = await result.communicate()
-            
-            if result.returncode != 0:
-                logger.error(f"列出会话失败: {stderr_data.decode('utf-8', errors='ignore')}")
+            if result["exit_code"] != 0:
+                logger.error(f"列出会话失败: {result['stderr']}")
                 return []
             
             sessions = []
-            lines = stdout_data.decode('utf-8', errors='ignore').strip().split('\n')
-            
-            for line in lines:
+            for line in result["stdout"].strip().split('\n'):
                 if not line:
                     continue
                     
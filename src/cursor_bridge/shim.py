@@ -0,0 +1,135 @@
+"""
+stdio转发程序
+
+Cursor启动的轻量入口：连接本机的cursor-bridge守护进程（不存在时自动启动），
+在stdin/stdout与Unix socket之间逐行转发JSON-RPC消息。
+
+本模块只依赖标准库，启动时不加载配置、tmux后端等重量级模块，
+tmux会话、SSH连接、缓存都保存在守护进程中，可以被多个Cursor窗口复用。
+"""
+
+import argparse
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+
+# 等待守护进程启动的最长时间（秒）
+SPAWN_TIMEOUT = 15.0
+
+
+def default_socket_path(config_path: Optional[str] = None) -> str:
+    """计算守护进程的socket路径
+
+    不同配置文件对应不同的守护进程，socket放在仅当前用户可访问的目录中。
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(
+        tempfile.gettempdir(), f"cursor-bridge-{os.getuid()}"
+    )
+    config_key = str(Path(config_path).resolve()) if config_path else "default"
+    digest = hashlib.sha1(config_key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(runtime_dir, "cursor-bridge", f"daemon-{digest}.sock")
+
+
+def connect(socket_path: str) -> Optional[socket.socket]:
+    """尝试连接守护进程，失败返回None"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return sock
+    except OSError:
+        sock.close()
+        return None
+
+
+def spawn_daemon(config_path: Optional[str], socket_path: str) -> None:
+    """在后台启动守护进程，脱离当前会话以便在Cursor退出后继续运行"""
+    args = [sys.executable, "-m", "cursor_bridge.cli"]
+    if config_path:
+        args += ["--config", os.path.abspath(config_path)]
+    args += ["daemon", "--socket", socket_path]
+
+    subprocess.Popen(
+        args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        close_fds=True,
+    )
+
+
+def connect_or_spawn(config_path: Optional[str], socket_path: str) -> socket.socket:
+    """连接守护进程，不存在时启动并等待就绪"""
+    sock = connect(socket_path)
+    if sock is not None:
+        return sock
+
+    spawn_daemon(config_path, socket_path)
+    deadline = time.monotonic() + SPAWN_TIMEOUT
+    delay = 0.02
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        sock = connect(socket_path)
+        if sock is not None:
+            return sock
+        delay = min(delay * 2, 0.2)
+
+    raise ConnectionError(f"守护进程启动超时: {socket_path}")
+
+
+def relay(sock: socket.socket) -> None:
+    """在stdin/stdout与socket之间转发消息，任一方向结束即退出"""
+    def stdin_to_socket() -> None:
+        try:
+            for line in sys.stdin.buffer:
+                sock.sendall(line)
+        except OSError:
+            pass
+        finally:
+            try:
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    threading.Thread(target=stdin_to_socket, name="cursor-bridge-shim-stdin", daemon=True).start()
+
+    stdout = sys.stdout.buffer
+    with sock.makefile("rb") as reader:
+        for line in reader:
+            stdout.write(line)
+            stdout.flush()
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="cursor-bridge stdio转发程序")
+    parser.add_argument("--config", "-c", help="配置文件路径")
+    parser.add_argument("--socket", help="守护进程socket路径")
+    args = parser.parse_args(argv)
+
+    # stdout只能用于JSON-RPC消息，错误信息写入stderr
+    socket_path = args.socket or default_socket_path(args.config)
+    try:
+        sock = connect_or_spawn(args.config, socket_path)
+    except ConnectionError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    try:
+        relay(sock)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
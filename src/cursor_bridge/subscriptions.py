@@ -0,0 +1,202 @@
+"""
+MCP资源订阅
+
+客户端通过 resources/subscribe 订阅面板日志或远程文件末尾。每个订阅由一个
+后台任务按固定间隔读取数据源的新增内容，同一间隔内到达的内容合并为一条
+notifications/resources/updated 通知推送给客户端，客户端不再需要反复读取
+整个日志。
+"""
+
+import asyncio
+import contextvars
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional
+import logging
+
+from .execution.jobs import Job, JobManager
+
+if TYPE_CHECKING:
+    from .session.terminal import PaneLogReader
+    from .session.tmux_backend import TmuxSession
+
+logger = logging.getLogger(__name__)
+
+
+# notify(uri, 新增内容, 是否截断, 数据源是否已结束)
+UpdateCallback = Callable[[str, str, bool, bool], Awaitable[None]]
+
+
+class PaneLogSource:
+    """tmux面板输出（与面板上执行的命令共用 pipe-pane 输出流）"""
+
+    def __init__(self, tmux_session: "TmuxSession"):
+        self.tmux_session = tmux_session
+        self._reader: Optional["PaneLogReader"] = None
+
+    async def start(self) -> None:
+        self._reader = await self.tmux_session.follow()
+
+    async def poll(self) -> Optional[str]:
+        """读取新增内容，面板输出流已停止（会话被销毁）时返回None"""
+        if self._reader is None or not self._reader.stream.active:
+            return None
+        return self._reader.read()
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader = None
+            await self.tmux_session.unfollow()
+
+
+class JobTailSource:
+    """后台任务的输出（如在任务面板中运行的 tail -F）"""
+
+    def __init__(self, jobs: JobManager, job: Job):
+        self.jobs = jobs
+        self.job = job
+        self._offset = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def poll(self) -> Optional[str]:
+        """读取新增输出，任务结束且输出已读完时返回None"""
+        done = self.job.done
+        text, self._offset, _ = self.job.output.read(self._offset)
+        if not text and done:
+            return None
+        return text
+
+    async def stop(self) -> None:
+        if not self.job.done:
+            await self.jobs.cancel(self.job.job_id)
+
+
+@dataclass
+class Subscription:
+    """一个资源订阅"""
+    uri: str
+    source: Any
+    task: Optional[asyncio.Task] = None
+    updates: int = 0
+    bytes_sent: int = 0
+    truncated: int = 0
+    stopped: bool = False
+
+
+class ResourceSubscriptions:
+    """一个客户端的资源订阅"""
+
+    def __init__(self, notify: UpdateCallback, interval: float = 0.5, max_chunk: int = 64 * 1024):
+        """初始化订阅管理
+
+        Args:
+            notify: 推送资源更新的协程函数
+            interval: 读取数据源的间隔（秒），间隔内的新增内容合并为一条通知
+            max_chunk: 一条通知的最大字符数，超过时只推送最后的部分
+        """
+        self.notify = notify
+        self.interval = interval
+        self.max_chunk = max_chunk
+        self._subscriptions: Dict[str, Subscription] = {}
+
+    def __contains__(self, uri: str) -> bool:
+        return uri in self._subscriptions
+
+    async def subscribe(self, uri: str, source: Any) -> None:
+        """开始订阅，数据源由调用方创建，订阅结束时停止
+
+        Args:
+            uri: 资源地址
+            source: 数据源，提供 start/poll/stop 协程方法
+        """
+        await self.unsubscribe(uri)
+        await source.start()
+        subscription = Subscription(uri, source)
+        # 在空的上下文中启动：HTTP传输下订阅请求所在POST的响应流很快会关闭，
+        # 后续通知应当走GET流
+        subscription.task = contextvars.Context().run(
+            asyncio.get_running_loop().create_task, self._run(subscription)
+        )
+        self._subscriptions[uri] = subscription
+        logger.info(f"开始订阅资源: {uri}")
+
+    async def unsubscribe(self, uri: str) -> bool:
+        """取消订阅
+
+        Returns:
+            订阅是否存在
+        """
+        subscription = self._subscriptions.pop(uri, None)
+        if subscription is None:
+            return False
+        if subscription.task is not None and not subscription.task.done():
+            subscription.task.cancel()
+            try:
+                await subscription.task
+            except asyncio.CancelledError:
+                pass
+        # 任务在第一次运行前就被取消时不会执行 _run 中的清理
+        await self._stop(subscription)
+        logger.info(f"取消订阅资源: {uri}")
+        return True
+
+    async def close(self) -> None:
+        """取消全部订阅（客户端断开时调用）"""
+        for uri in list(self._subscriptions):
+            await self.unsubscribe(uri)
+
+    async def _run(self, subscription: Subscription) -> None:
+        """按间隔读取数据源并推送新增内容"""
+        uri = subscription.uri
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    text = await subscription.source.poll()
+                except Exception as e:
+                    logger.error(f"读取订阅数据源失败: {uri}, {e}")
+                    text = None
+                if text is None:
+                    await self.notify(uri, "", False, True)
+                    break
+                if not text:
+                    continue
+
+                truncated = len(text) > self.max_chunk
+                if truncated:
+                    text = text[-self.max_chunk:]
+                    subscription.truncated += 1
+                subscription.updates += 1
+                subscription.bytes_sent += len(text.encode("utf-8"))
+                await self.notify(uri, text, truncated, False)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 客户端连接已断开等
+            logger.warning(f"推送资源更新失败，结束订阅: {uri}, {e}")
+        finally:
+            if self._subscriptions.get(uri) is subscription:
+                del self._subscriptions[uri]
+            await self._stop(subscription)
+
+    @staticmethod
+    async def _stop(subscription: Subscription) -> None:
+        """停止数据源（只停止一次）"""
+        if subscription.stopped:
+            return
+        subscription.stopped = True
+        await subscription.source.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取订阅统计信息"""
+        return {
+            "subscriptions": {
+                uri: {
+                    "updates": subscription.updates,
+                    "bytes_sent": subscription.bytes_sent,
+                    "truncated": subscription.truncated
+                }
+                for uri, subscription in self._subscriptions.items()
+            }
+        }
@@ -1,5 +1,5 @@
 """工具模块"""
 
-from .logger import setup_logging, get_logger, LoggerMixin
+from .logger import setup_logging, get_logger, get_log_stats, LoggerMixin
 
-__all__ = ["setup_logging", "get_logger", "LoggerMixin"]
\ No newline at end of file
+__all__ = ["setup_logging", "get_logger", "get_log_stats", "LoggerMixin"]
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""
+异步日志管道
+
+日志记录在事件循环线程中只做入队操作，由后台线程批量格式化并写入文件，
+避免磁盘IO阻塞asyncio事件循环。支持按大小轮转、热点DEBUG日志采样和
+入队开销统计。
+"""
+
+import os
+import re
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+
+_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(value: Union[str, int, float, None]) -> int:
+    """解析大小配置
+
+    Args:
+        value: 大小，支持整数字节数或 "100MB"、"10K" 形式的字符串
+
+    Returns:
+        字节数，未配置时返回0
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    match = _SIZE_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"无法解析的大小配置: {value}")
+
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
+
+
+class SamplingFilter(logging.Filter):
+    """热点日志采样过滤器
+
+    对不高于指定级别的日志按调用位置 (logger, 文件, 行号) 计数采样，每 N 条
+    保留 1 条。日志消息多是 f-string，按消息计数时计数表会无限增长，因此
+    按调用位置计数，并以LRU方式限制计数表大小。计数采样是确定性的，不需要
+    随机数，开销只有一次字典查找。
+
+    过滤器带有计数状态，每个处理器需要使用各自的实例。
+    """
+
+    def __init__(self, rate: float = 1.0, max_level: int = logging.DEBUG, max_keys: int = 1024):
+        super().__init__()
+        if rate <= 0:
+            raise ValueError("采样率必须大于0")
+        self.every = max(1, int(round(1.0 / min(rate, 1.0))))
+        self.max_level = max_level
+        self.max_keys = max_keys
+        self._counters: "OrderedDict[Any, int]" = OrderedDict()
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno > self.max_level:
+            return True
+
+        key = (record.name, record.pathname, record.lineno)
+        count = self._counters.pop(key, 0)
+        self._counters[key] = count + 1
+        if len(self._counters) > self.max_keys:
+            self._counters.popitem(last=False)
+
+        if count % self.every == 0:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class AsyncLogHandler(logging.Handler):
+    """基于队列的异步文件日志处理器
+
+    emit() 只把记录放入队列；后台线程一次取出一批记录，统一格式化后
+    单次写入文件，并在超过 max_bytes 时执行轮转。
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 0,
+        backup_count: int = 0,
+        batch_size: int = 256,
+        flush_interval: float = 0.2,
+        queue_size: int = 10000,
+        encoding: str = "utf-8",
+    ):
+        """初始化处理器
+
+        Args:
+            filename: 日志文件路径
+            max_bytes: 单个文件最大字节数，0表示不轮转
+            backup_count: 保留的历史文件数量
+            batch_size: 每批最多写入的记录数
+            flush_interval: 后台线程等待新记录的最长时间（秒）
+            queue_size: 队列容量，队列满时丢弃新记录而不是阻塞调用方
+            encoding: 文件编码
+        """
+        super().__init__()
+        self.filename = str(Path(filename))
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.encoding = encoding
+
+        Path(self.filename).parent.mkdir(parents=True, exist_ok=True)
+        self._stream = open(self.filename, "a", encoding=self.encoding)
+        self._queue: "queue.Queue[Optional[logging.LogRecord]]" = queue.Queue(queue_size)
+        self._closed = False
+
+        # 统计信息：入队相关的计数只在 emit 中更新（经 Handler.handle 调用时
+        # 持有处理器锁），写入相关的计数只由后台线程更新；get_stats 读取时
+        # 不加锁，得到的是近似快照
+        self._enqueued = 0
+        self._written = 0
+        self._processed = 0
+        self._dropped = 0
+        self._batches = 0
+        self._rotations = 0
+        self._enqueue_ns_total = 0
+        self._enqueue_ns_max = 0
+
+        self._thread = threading.Thread(
+            target=self._worker, name="cursor-bridge-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """入队日志记录（在调用方线程执行）"""
+        start = time.perf_counter_ns()
+        try:
+            self._queue.put_nowait(record)
+            self._enqueued += 1
+        except queue.Full:
+            self._dropped += 1
+
+        elapsed = time.perf_counter_ns() - start
+        self._enqueue_ns_total += elapsed
+        if elapsed > self._enqueue_ns_max:
+            self._enqueue_ns_max = elapsed
+
+    def _worker(self) -> None:
+        """后台写入线程"""
+        while True:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch: List[logging.LogRecord] = []
+            stop = record is None
+            if record is not None:
+                batch.append(record)
+
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                else:
+                    batch.append(record)
+
+            if batch:
+                self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[logging.LogRecord]) -> None:
+        """格式化并写入一批记录"""
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+
+        if not lines:
+            self._processed += len(batch)
+            return
+
+        data = "\n".join(lines) + "\n"
+        try:
+            if self._should_rollover(len(data.encode(self.encoding))):
+                self._do_rollover()
+            self._stream.write(data)
+            self._stream.flush()
+            self._written += len(lines)
+            self._batches += 1
+        except Exception:
+            self.handleError(batch[-1])
+        finally:
+            self._processed += len(batch)
+
+    def _should_rollover(self, incoming: int) -> bool:
+        """判断写入后是否超过大小限制"""
+        if self.max_bytes <= 0:
+            return False
+        return self._stream.tell() + incoming > self.max_bytes and self._stream.tell() > 0
+
+    def _do_rollover(self) -> None:
+        """执行文件轮转：file -> file.1 -> file.2 ..."""
+        self._stream.close()
+
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.filename}.{i}"
+                dst = f"{self.filename}.{i + 1}"
+                if os.path.exists(src):
+                    os.replace(src, dst)
+            os.replace(self.filename, f"{self.filename}.1")
+        else:
+            os.remove(self.filename)
+
+        self._stream = open(self.filename, "a", encoding=self.encoding)
+        self._rotations += 1
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """等待队列中已有记录写入完成"""
+        target = self._enqueued
+        deadline = time.monotonic() + timeout
+        while self._processed < target and self._thread.is_alive():
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.005)
+
+    def close(self) -> None:
+        """停止后台线程并关闭文件"""
+        if self._closed:
+            return
+        self._closed = True
+
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+        try:
+            self._stream.close()
+        finally:
+            super().close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取日志管道统计信息"""
+        enqueued = self._enqueued + self._dropped
+        return {
+            "enqueued": self._enqueued,
+            "written": self._written,
+            "dropped": self._dropped,
+            "pending": self._queue.qsize(),
+            "batches": self._batches,
+            "rotations": self._rotations,
+            "avg_enqueue_us": (self._enqueue_ns_total / enqueued / 1000) if enqueued else 0.0,
+            "max_enqueue_us": self._enqueue_ns_max / 1000,
+        }
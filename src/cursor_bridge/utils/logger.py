@@ -8,14 +8,25 @@ import sys
 import logging
 import structlog
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
+
+from .log_pipeline import AsyncLogHandler, SamplingFilter, parse_size
+
+
+# 当前安装的异步日志处理器，重复调用setup_logging时会被替换
+_async_handler: Optional[AsyncLogHandler] = None
 
 
 def setup_logging(
     level: str = "INFO",
     log_file: Optional[str] = None,
     json_logs: bool = False,
-    service_name: str = "cursor-bridge"
+    service_name: str = "cursor-bridge",
+    console: bool = True,
+    async_logs: bool = False,
+    max_size: Union[str, int, None] = None,
+    backup_count: int = 0,
+    debug_sample_rate: float = 1.0,
 ) -> None:
     """设置日志系统
     
@@ -24,31 +35,42 @@ def setup_logging(
         log_file: 日志文件路径
         json_logs: 是否使用JSON格式
         service_name: 服务名称
+        console: 是否输出到stdout（stdio模式下必须关闭）
+        async_logs: 是否通过后台线程批量写入日志文件
+        max_size: 日志文件轮转大小，如 "100MB"
+        backup_count: 轮转保留的历史文件数量
+        debug_sample_rate: DEBUG日志采样率，1.0表示全部保留
     """
-    # 配置标准库logging
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=getattr(logging, level.upper()),
-    )
-    
+    global _async_handler
+
+    log_level = getattr(logging, level.upper())
+    root_logger = logging.getLogger()
+
+    # 移除之前安装的处理器，保证重复调用是幂等的
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+        if handler is _async_handler:
+            handler.close()
+    _async_handler = None
+    root_logger.setLevel(log_level)
+
     # 配置structlog处理器
-    processors = [
-        structlog.stdlib.filter_by_level,
+    shared_processors = [
         structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
         structlog.processors.TimeStamper(fmt="iso"),
+    ]
+    processors = [
+        structlog.stdlib.filter_by_level,
+        *shared_processors,
+        structlog.stdlib.PositionalArgumentsFormatter(),
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
         structlog.processors.UnicodeDecoder(),
+        # 渲染推迟到处理器的Formatter中，异步模式下在后台线程执行
+        structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
     ]
     
-    if json_logs:
-        processors.append(structlog.processors.JSONRenderer())
-    else:
-        processors.append(structlog.dev.ConsoleRenderer(colors=True))
-    
     structlog.configure(
         processors=processors,
         context_class=dict,
@@ -56,25 +78,50 @@ def setup_logging(
         wrapper_class=structlog.stdlib.BoundLogger,
         cache_logger_on_first_use=True,
     )
+
+    def make_formatter(colors: bool) -> logging.Formatter:
+        if json_logs:
+            renderer = structlog.processors.JSONRenderer(ensure_ascii=False)
+        else:
+            renderer = structlog.dev.ConsoleRenderer(colors=colors)
+        return structlog.stdlib.ProcessorFormatter(
+            processor=renderer,
+            foreign_pre_chain=[*shared_processors, structlog.stdlib.ExtraAdder()],
+        )
+
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(make_formatter(colors=True))
+        if debug_sample_rate < 1.0:
+            console_handler.addFilter(SamplingFilter(debug_sample_rate))
+        root_logger.addHandler(console_handler)
     
     # 如果指定了日志文件，添加文件处理器
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
         
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(getattr(logging, level.upper()))
-        
-        if json_logs:
-            formatter = logging.Formatter('%(message)s')
-        else:
-            formatter = logging.Formatter(
-                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        if async_logs:
+            file_handler = AsyncLogHandler(
+                log_file,
+                max_bytes=parse_size(max_size),
+                backup_count=backup_count,
             )
-        file_handler.setFormatter(formatter)
+            _async_handler = file_handler
+        elif max_size:
+            from logging.handlers import RotatingFileHandler
+            file_handler = RotatingFileHandler(
+                log_file, maxBytes=parse_size(max_size), backupCount=backup_count
+            )
+        else:
+            file_handler = logging.FileHandler(log_file)
+        file_handler.setLevel(log_level)
+        file_handler.setFormatter(make_formatter(colors=False))
+        # 每个处理器使用独立的采样计数
+        if debug_sample_rate < 1.0:
+            file_handler.addFilter(SamplingFilter(debug_sample_rate))
         
         # 添加到根日志器
-        root_logger = logging.getLogger()
         root_logger.addHandler(file_handler)
     
     # 设置服务上下文
@@ -82,6 +129,17 @@ def setup_logging(
     structlog.contextvars.bind_contextvars(service=service_name)
 
 
+def get_log_stats() -> Dict[str, Any]:
+    """获取异步日志管道的统计信息
+    
+    Returns:
+        统计信息，未启用异步日志时返回空字典
+    """
+    if _async_handler is None:
+        return {}
+    return _async_handler.get_stats()
+
+
 def get_logger(name: str, **context: Any) -> structlog.BoundLogger:
     """获取日志器
     
@@ -0,0 +1,75 @@
+"""
+MCP守护进程测试
+"""
+
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+from cursor_bridge.daemon import MCPDaemon
+from cursor_bridge.mcp_server import MCPServer
+from cursor_bridge.shim import default_socket_path
+
+
+@pytest.fixture
+def mcp_server():
+    config_data = {
+        "servers": {
+            "local": {
+                "type": "local_tmux",
+                "tmux": {"session_name": "local-session"},
+                "session": {"name": "local-session"}
+            }
+        }
+    }
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
+        yaml.dump(config_data, f)
+        config_path = f.name
+
+    try:
+        yield MCPServer(config_path)
+    finally:
+        Path(config_path).unlink()
+
+
+def test_default_socket_path_per_config(tmp_path):
+    path_a = default_socket_path(str(tmp_path / "a.yaml"))
+    path_b = default_socket_path(str(tmp_path / "b.yaml"))
+    assert path_a != path_b
+    assert path_a == default_socket_path(str(tmp_path / "a.yaml"))
+    assert path_a.endswith(".sock")
+
+
+@pytest.mark.asyncio
+async def test_clients_share_server(mcp_server, tmp_path):
+    socket_path = str(tmp_path / "run" / "daemon.sock")
+    daemon = MCPDaemon(mcp_server, socket_path)
+    assert daemon.acquire_lock()
+    # 同一socket的第二个守护进程拿不到锁
+    assert not MCPDaemon(mcp_server, socket_path).acquire_lock()
+
+    await daemon.start()
+    try:
+        async def call(request):
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            writer.close()
+            return response
+
+        responses = await asyncio.gather(
+            call({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}),
+            call({"jsonrpc": "2.0", "id": 2, "method": "tools/list"}),
+        )
+        assert responses[0]["result"]["serverInfo"]["name"] == "cursor-bridge"
+        assert responses[1]["id"] == 2
+        assert daemon.total_connections == 2
+    finally:
+        await daemon.stop()
+
+    assert not Path(socket_path).exists()
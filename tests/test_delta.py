@@ -0,0 +1,52 @@
+"""
+命令输出增量返回测试
+"""
+
+from cursor_bridge.execution import OutputHistory
+
+
+class TestOutputHistory:
+    """上一次输出缓存测试"""
+
+    def test_full_unchanged_and_diff(self):
+        history = OutputHistory(context_lines=1)
+        key = OutputHistory.make_key("s1", "/work", "kubectl get pods")
+        output = "\n".join(f"pod-{i} Running" for i in range(20))
+
+        first = history.record(key, output)
+        assert first["status"] == "full" and "base_hash" not in first
+
+        again = history.record(key, output)
+        assert again == {
+            "status": "unchanged", "hash": first["hash"], "base_hash": first["hash"], "stored": True
+        }
+
+        changed = output.replace("pod-7 Running", "pod-7 CrashLoopBackOff")
+        delta = history.record(key, changed)
+        assert delta["status"] == "diff" and delta["base_hash"] == first["hash"]
+        assert "-pod-7 Running\n+pod-7 CrashLoopBackOff" in delta["diff"]
+        assert "pod-1 Running" not in delta["diff"]
+
+        # 完整输出可以按哈希取回
+        assert history.get(delta["hash"]) == changed
+        assert history.get(first["hash"]) is None
+
+    def test_full_when_diff_not_smaller(self):
+        history = OutputHistory()
+        key = OutputHistory.make_key("s1", None, "date")
+        history.record(key, "Mon")
+        assert history.record(key, "Tue")["status"] == "full"
+
+    def test_eviction_by_bytes(self):
+        history = OutputHistory(max_bytes=10)
+        history.record(("s1", "", "a"), "aaaaaa")
+        history.record(("s1", "", "b"), "bbbbbb")
+
+        stats = history.get_stats()
+        assert (stats["entries"], stats["evictions"]) == (1, 1)
+        assert history.record(("s1", "", "a"), "aaaaaa")["status"] == "full"
+
+        # 超过上限的输出不保存，不能按哈希取回
+        too_large = history.record(("s1", "", "c"), "c" * 20)
+        assert too_large["stored"] is False
+        assert history.get(too_large["hash"]) is None
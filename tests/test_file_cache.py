@@ -0,0 +1,67 @@
+"""
+远程文件内容缓存测试
+"""
+
+import hashlib
+
+from cursor_bridge.execution import FileCache
+
+
+class TestFileCache:
+    """文件缓存测试"""
+
+    def test_validate_by_stat_and_hash(self):
+        cache = FileCache()
+        key = FileCache.make_key("s1", "/work/a.py")
+        cache.put(key, b"print(1)\n", (9, 1000, 42))
+
+        # 元数据一致
+        assert cache.validate(key, (9, 1000, 42), None, 2000).data == b"print(1)\n"
+        # 修改时间变了但内容相同，按哈希命中并更新元数据
+        sha = hashlib.sha256(b"print(1)\n").hexdigest()
+        assert cache.validate(key, (9, 1500, 42), sha, 2000) is not None
+        assert cache.get(key).stat == (9, 1500, 42)
+        # 内容变了
+        assert cache.validate(key, (9, 1600, 42), "0" * 64, 2000) is None
+        assert cache.get(key) is None
+
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["hash_hits"]) == (1, 1)
+        assert stats["bytes_saved"] == 18
+
+    def test_recent_mtime_not_trusted(self):
+        # 同一秒内的修改无法从修改时间上区分
+        assert FileCache.trusted_stat((9, 1000, 42), 1000) is None
+        assert FileCache.trusted_stat((9, 1000, 42), 1005) == (9, 1000, 42)
+
+        cache = FileCache()
+        key = FileCache.make_key("s1", "/work/a.py")
+        cache.put(key, b"abc")
+        assert cache.validate(key, (3, 1000, 42), None, 1005) is None
+
+    def test_lru_eviction_by_bytes(self):
+        cache = FileCache(max_bytes=10)
+        cache.put(("s1", "/a"), b"aaaa")
+        cache.put(("s1", "/b"), b"bbbb")
+        cache.validate(("s1", "/a"), None, hashlib.sha256(b"aaaa").hexdigest(), None)
+        cache.put(("s1", "/c"), b"cccc")
+
+        assert cache.get(("s1", "/b")) is None
+        assert cache.get(("s1", "/a")) is not None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_persist_and_load(self, tmp_path):
+        cache = FileCache(persist_dir=str(tmp_path))
+        cache.put(("s1", "/a"), b"first", (5, 1000, 1))
+        cache.put(("s1", "/b"), b"second")
+        assert cache.save()
+
+        loaded = FileCache(persist_dir=str(tmp_path))
+        assert loaded.load() == 2
+        assert loaded.get(("s1", "/a")).stat == (5, 1000, 1)
+        assert loaded.get(("s1", "/b")).data == b"second"
+
+        # 不再引用的内容文件被删除
+        loaded.invalidate(("s1", "/b"))
+        loaded.save()
+        assert len(list((tmp_path / "blobs").iterdir())) == 1
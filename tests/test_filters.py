@@ -0,0 +1,56 @@
+"""
+命令输出过滤测试
+"""
+
+import re
+
+import pytest
+
+from cursor_bridge.execution import OutputFilter
+
+
+class TestOutputFilter:
+    """逐行输出过滤测试"""
+
+    def run(self, output_filter: OutputFilter, *chunks: str) -> str:
+        for chunk in chunks:
+            output_filter.feed(chunk)
+        return output_filter.finish()
+
+    def test_include_exclude_across_chunks(self):
+        output_filter = OutputFilter(include=["ERROR", "WARN"], exclude=["ignored"])
+        output = self.run(output_filter, "INFO start\nERR", "OR disk full\nWARN ignored\nWARN low memory")
+
+        assert output == "ERROR disk full\nWARN low memory"
+        stats = output_filter.get_stats()
+        assert (stats["lines_in"], stats["lines_matched"], stats["truncated"]) == (4, 2, False)
+
+    def test_head_and_tail(self):
+        lines = "".join(f"line {i}\n" for i in range(10))
+
+        assert self.run(OutputFilter(head=2), lines) == "line 0\nline 1"
+        assert self.run(OutputFilter(tail=2), lines) == "line 8\nline 9"
+        assert self.run(OutputFilter(head=1, tail=1), lines) == "line 0\n... 省略 8 行 ...\nline 9"
+        # tail=0 不保留结尾的行，而不是不限制
+        assert self.run(OutputFilter(tail=0), lines) == ""
+        assert self.run(OutputFilter(head=2, tail=0), lines) == "line 0\nline 1\n... 省略 8 行 ..."
+
+    def test_max_bytes(self):
+        output_filter = OutputFilter(max_bytes=14)
+        assert self.run(output_filter, "line 0\nline 1\nline 2\n") == "line 0\nline 1"
+        assert output_filter.get_stats()["lines_omitted"] == 1
+
+        # 只保留结尾时丢弃较早的行
+        assert self.run(OutputFilter(tail=10, max_bytes=14), "line 0\nline 1\nline 2\n") == "line 1\nline 2"
+
+    def test_dedupe_progress_lines(self):
+        output = self.run(
+            OutputFilter(dedupe=True),
+            "Downloading 10%\r\nDownloading 55%\r\nDownloading 100%\r\nDone\nDone\n"
+        )
+        assert output == "Downloading 100% [x3]\nDone [x2]"
+
+    def test_invalid_pattern(self):
+        with pytest.raises(re.error):
+            OutputFilter(include=["("])
+        assert not OutputFilter().active
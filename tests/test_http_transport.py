@@ -0,0 +1,172 @@
+"""
+MCP HTTP传输测试
+"""
+
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+from cursor_bridge.http_transport import MCPHttpTransport
+from cursor_bridge.mcp_server import MCPServer
+
+
+@pytest.fixture
+def mcp_server():
+    """创建MCP服务器，限制2个连接、1秒请求超时"""
+    config_data = {
+        "servers": {
+            "local": {
+                "type": "local_tmux",
+                "tmux": {"session_name": "local-session"},
+                "session": {"name": "local-session"}
+            }
+        },
+        "mcp": {"server": {"host": "127.0.0.1", "port": 0, "max_connections": 2, "request_timeout": 1}}
+    }
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
+        yaml.dump(config_data, f)
+        config_path = f.name
+
+    try:
+        yield MCPServer(config_path)
+    finally:
+        Path(config_path).unlink()
+
+
+async def http_request(port, method, body=None, headers=None):
+    """发送一个HTTP请求，返回 (状态码, 头, 正文)"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    lines = [f"{method} /mcp HTTP/1.1", "host: localhost", "connection: close",
+             f"content-length: {len(data)}"]
+    lines.extend(f"{k}: {v}" for k, v in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + data)
+    await writer.drain()
+
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    head_lines = head.decode().split("\r\n")
+    status = int(head_lines[0].split()[1])
+    response_headers = dict(
+        (k.strip().lower(), v.strip()) for k, v in (line.split(":", 1) for line in head_lines[1:])
+    )
+    return status, response_headers, payload.decode()
+
+
+async def initialize(port):
+    status, headers, _ = await http_request(
+        port, "POST", {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {"accept": "application/json"}
+    )
+    assert status == 200
+    return headers["mcp-session-id"]
+
+
+@pytest.mark.asyncio
+async def test_session_and_json_response(mcp_server):
+    transport = MCPHttpTransport(mcp_server)
+    await transport.start()
+    try:
+        session_id = await initialize(transport.port)
+
+        status, _, body = await http_request(
+            transport.port, "POST", {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+            {"accept": "application/json", "mcp-session-id": session_id}
+        )
+        assert status == 200
+        names = [tool["name"] for tool in json.loads(body)["result"]["tools"]]
+        assert "execute_command" in names
+
+        # 未知会话
+        status, _, _ = await http_request(
+            transport.port, "POST", {"jsonrpc": "2.0", "id": 3, "method": "tools/list"},
+            {"mcp-session-id": "unknown"}
+        )
+        assert status == 404
+
+        status, _, _ = await http_request(transport.port, "DELETE", headers={"mcp-session-id": session_id})
+        assert status == 200
+        assert transport.sessions == {}
+    finally:
+        await transport.stop()
+
+
+@pytest.mark.asyncio
+async def test_sse_response_carries_notifications(mcp_server):
+    transport = MCPHttpTransport(mcp_server)
+    await transport.start()
+    try:
+        session_id = await initialize(transport.port)
+        session = transport.sessions[session_id]
+
+        async def fake_handle(request):
+            await session.handler.send_notification("notifications/progress", {"progress": 1})
+            return {"jsonrpc": "2.0", "id": request["id"], "result": {}}
+
+        session.handler.handle_request = fake_handle
+        status, headers, body = await http_request(
+            transport.port, "POST", {"jsonrpc": "2.0", "id": 2, "method": "tools/call"},
+            {"accept": "application/json, text/event-stream", "mcp-session-id": session_id}
+        )
+        assert status == 200
+        assert headers["content-type"] == "text/event-stream"
+        events = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+        assert events[0]["method"] == "notifications/progress"
+        assert events[1]["id"] == 2
+    finally:
+        await transport.stop()
+
+
+@pytest.mark.asyncio
+async def test_request_timeout_and_origin(mcp_server):
+    transport = MCPHttpTransport(mcp_server)
+    await transport.start()
+    try:
+        session_id = await initialize(transport.port)
+        session = transport.sessions[session_id]
+
+        async def slow_handle(request):
+            await asyncio.sleep(5)
+
+        session.handler.handle_request = slow_handle
+        status, _, body = await http_request(
+            transport.port, "POST", {"jsonrpc": "2.0", "id": 2, "method": "resources/list"},
+            {"accept": "application/json", "mcp-session-id": session_id}
+        )
+        assert status == 200
+        assert json.loads(body)["error"]["code"] == -32001
+        assert transport.get_stats()["timed_out_requests"] == 1
+
+        # 工具调用按自己的 timeout 参数，不使用传输层的请求超时
+        assert transport._request_deadline({"method": "tools/call", "params": {"name": "x"}}) is None
+        assert transport._request_deadline(
+            {"method": "tools/call", "params": {"arguments": {"timeout": 60}}}
+        ) == 70.0
+
+        status, _, _ = await http_request(
+            transport.port, "POST", {"jsonrpc": "2.0", "id": 1, "method": "initialize"},
+            {"origin": "http://evil.example.com"}
+        )
+        assert status == 403
+    finally:
+        await transport.stop()
+
+
+@pytest.mark.asyncio
+async def test_malformed_content_length(mcp_server):
+    transport = MCPHttpTransport(mcp_server)
+    await transport.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", transport.port)
+        writer.write(b"POST /mcp HTTP/1.1\r\nhost: localhost\r\ncontent-length: abc\r\n\r\n")
+        await writer.drain()
+        raw = await reader.read()
+        writer.close()
+        assert raw.startswith(b"HTTP/1.1 400")
+    finally:
+        await transport.stop()
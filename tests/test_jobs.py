@@ -0,0 +1,108 @@
+"""
+后台任务测试
+"""
+
+import asyncio
+
+import pytest
+
+from cursor_bridge.execution import ExecutionOptions, JobManager, OutputBuffer
+
+
+class TestOutputBuffer:
+    """有界输出缓冲区测试"""
+    
+    def test_read_by_offset(self):
+        buffer = OutputBuffer(max_size=100)
+        buffer.append("line 1\n")
+        buffer.append("line 2\n")
+        
+        output, next_offset, dropped = buffer.read(0)
+        assert output == "line 1\nline 2\n"
+        assert next_offset == 14
+        assert dropped is False
+        
+        # 只返回偏移量之后的新内容
+        buffer.append("line 3\n")
+        assert buffer.read(next_offset) == ("line 3\n", 21, False)
+        assert buffer.read(3, limit=6) == ("e 1\nli", 9, False)
+    
+    def test_drops_oldest_output(self):
+        buffer = OutputBuffer(max_size=10)
+        buffer.append("aaaa")
+        buffer.append("bbbb")
+        buffer.append("cccc")
+        
+        assert buffer.start == 4
+        assert buffer.end == 12
+        # 已丢弃的偏移量从最早仍保留的位置开始读取
+        assert buffer.read(0) == ("bbbbcccc", 12, True)
+        
+        buffer.append("x" * 25)
+        assert buffer.start == 27
+        assert buffer.read(30) == ("x" * 7, 37, False)
+
+
+class TestJobManager:
+    """后台任务表测试"""
+    
+    @pytest.mark.asyncio
+    async def test_job_lifecycle(self):
+        manager = JobManager()
+        
+        async def runner(job):
+            job.output.append("building\n")
+            await asyncio.sleep(0.05)
+            job.output.append("done\n")
+            return {"exit_code": 0, "stderr": "", "status": "completed"}
+        
+        job = manager.submit("make", "local", runner, ExecutionOptions(timeout=60))
+        assert manager.get(job.job_id) is job
+        
+        job = await manager.wait(job.job_id, timeout=0)
+        assert job.done is False
+        assert job.to_dict()["status"] == "running"
+        
+        job = await manager.wait(job.job_id, timeout=1)
+        assert job.done is True
+        assert job.execution.is_successful
+        assert job.output.read(0)[0] == "building\ndone\n"
+        assert manager.get_stats()["finished"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_cancel_job(self):
+        manager = JobManager()
+        interrupted = asyncio.Event()
+        
+        async def runner(job):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                interrupted.set()
+                raise
+        
+        job = manager.submit("sleep 10", "local", runner)
+        await asyncio.sleep(0)
+        
+        await manager.cancel(job.job_id)
+        
+        assert interrupted.is_set()
+        assert job.to_dict()["status"] == "cancelled"
+        assert await manager.cancel("missing") is None
+    
+    @pytest.mark.asyncio
+    async def test_prune_finished_jobs(self):
+        manager = JobManager(max_finished=2)
+        
+        async def runner(job):
+            return {"exit_code": 1, "stderr": "boom"}
+        
+        jobs = []
+        for index in range(4):
+            jobs.append(manager.submit(f"false {index}", "local", runner))
+            await manager.wait(jobs[-1].job_id, timeout=1)
+        
+        assert jobs[-1].to_dict()["status"] == "failed"
+        manager.submit("true", "local", runner)
+        assert manager.get(jobs[0].job_id) is None
+        assert manager.get(jobs[-1].job_id) is not None
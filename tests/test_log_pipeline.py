@@ -0,0 +1,118 @@
+"""
+异步日志管道测试
+"""
+
+import logging
+import threading
+
+import pytest
+
+from cursor_bridge.utils.log_pipeline import AsyncLogHandler, SamplingFilter, parse_size
+
+
+def make_record(msg: str, level: int = logging.INFO, name: str = "test") -> logging.LogRecord:
+    """创建测试日志记录"""
+    return logging.LogRecord(name, level, __file__, 0, msg, None, None)
+
+
+class TestParseSize:
+    """大小解析测试"""
+
+    def test_units(self):
+        assert parse_size("100MB") == 100 * 1024 * 1024
+        assert parse_size("10K") == 10 * 1024
+        assert parse_size("512") == 512
+        assert parse_size(2048) == 2048
+        assert parse_size(None) == 0
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            parse_size("lots")
+
+
+class TestSamplingFilter:
+    """采样过滤器测试"""
+
+    def test_samples_debug_only(self):
+        sampler = SamplingFilter(rate=0.25)
+
+        kept = sum(sampler.filter(make_record("hot", logging.DEBUG)) for _ in range(100))
+        assert kept == 25
+        assert sampler.sampled_out == 75
+
+        # INFO及以上不采样
+        assert all(sampler.filter(make_record("info")) for _ in range(10))
+
+    def test_counts_by_call_site(self):
+        sampler = SamplingFilter(rate=0.5, max_keys=4)
+
+        # 同一调用位置的 f-string 消息共用一个计数
+        kept = sum(sampler.filter(make_record(f"item {i}", logging.DEBUG)) for i in range(10))
+        assert kept == 5
+
+        for lineno in range(1, 20):
+            record = make_record("hot", logging.DEBUG)
+            record.lineno = lineno
+            sampler.filter(record)
+        assert len(sampler._counters) == 4
+
+
+class TestAsyncLogHandler:
+    """异步日志处理器测试"""
+
+    def test_batched_write(self, tmp_path):
+        log_file = tmp_path / "app.log"
+        handler = AsyncLogHandler(str(log_file))
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        for i in range(500):
+            handler.emit(make_record(f"line {i}"))
+        handler.close()
+
+        lines = log_file.read_text().splitlines()
+        assert lines[0] == "line 0"
+        assert lines[-1] == "line 499"
+        stats = handler.get_stats()
+        assert stats["written"] == 500
+        assert stats["batches"] < 500
+
+    def test_rotation(self, tmp_path):
+        log_file = tmp_path / "app.log"
+        handler = AsyncLogHandler(str(log_file), max_bytes=1024, backup_count=2, batch_size=8)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        for i in range(400):
+            handler.emit(make_record("x" * 60))
+            if i % 8 == 0:
+                handler.flush()
+        handler.close()
+
+        assert log_file.exists()
+        assert (tmp_path / "app.log.1").exists()
+        assert (tmp_path / "app.log.2").exists()
+        assert not (tmp_path / "app.log.3").exists()
+        assert log_file.stat().st_size <= 1024
+        assert handler.get_stats()["rotations"] > 0
+
+    def test_emit_does_not_wait_for_sink(self, tmp_path):
+        """写入端阻塞时 emit 仍立即返回，记录按顺序写入"""
+        release = threading.Event()
+
+        class SlowFormatter(logging.Formatter):
+            def format(self, record):
+                release.wait(timeout=10)
+                return super().format(record)
+
+        log_file = tmp_path / "app.log"
+        handler = AsyncLogHandler(str(log_file))
+        handler.setFormatter(SlowFormatter("%(message)s"))
+
+        for i in range(100):
+            handler.emit(make_record(f"event {i}"))
+        # 后台线程仍卡在格式化上，所有记录都已入队
+        assert not release.is_set()
+        assert handler.get_stats()["enqueued"] == 100
+
+        release.set()
+        handler.close()
+        assert log_file.read_text().splitlines() == [f"event {i}" for i in range(100)]
@@ -0,0 +1,443 @@
+"""
+MCP服务器工具测试
+"""
+
+import asyncio
+import socket
+import tempfile
+from types import SimpleNamespace
+from pathlib import Path
+
+import pytest
+import yaml
+
+from cursor_bridge.mcp_server import MCPServer
+
+
+def make_server_config(name: str, tags=None) -> dict:
+    """生成local_tmux服务器配置"""
+    return {
+        "type": "local_tmux",
+        "tags": tags or [],
+        "tmux": {"session_name": f"{name}-session"},
+        "session": {"name": f"{name}-session"}
+    }
+
+
+@pytest.fixture
+def mcp_server():
+    """创建带多台服务器配置的MCP服务器"""
+    config_data = {
+        "servers": {
+            "gpu-1": make_server_config("gpu-1", ["gpu"]),
+            "gpu-2": make_server_config("gpu-2", ["gpu"]),
+            "build-1": make_server_config("build-1", ["build"]),
+        }
+    }
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
+        yaml.dump(config_data, f)
+        config_path = f.name
+    
+    try:
+        yield MCPServer(config_path)
+    finally:
+        Path(config_path).unlink()
+
+
+class TestExecuteOnServers:
+    """多服务器并发执行测试"""
+    
+    def test_select_servers(self, mcp_server):
+        assert sorted(mcp_server.select_servers(selector="gpu-*")) == ["gpu-1", "gpu-2"]
+        assert mcp_server.select_servers(tags=["build"]) == ["build-1"]
+        assert sorted(mcp_server.select_servers(servers=["build-1", "gpu-2"])) == ["build-1", "gpu-2"]
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_execution_and_grouping(self, mcp_server):
+        async def fake_execute(command, server="default", timeout=30, working_directory=None):
+            await asyncio.sleep(0.2)
+            stdout = "disk full" if server == "build-1" else "ok"
+            return {"stdout": stdout, "stderr": "", "exit_code": 0,
+                    "execution_time": 0.2, "command": command, "server": server}
+        
+        mcp_server.execute_command = fake_execute
+        streamed = []
+        
+        async def on_result(result, completed, total):
+            streamed.append((result["server"], completed, total))
+        
+        start = asyncio.get_event_loop().time()
+        result = await mcp_server.execute_on_servers(
+            "df -h", selector="*", on_result=on_result
+        )
+        elapsed = asyncio.get_event_loop().time() - start
+        
+        # 并发执行，总耗时接近最慢的一台
+        assert elapsed < 0.5
+        assert len(streamed) == 3
+        assert [item[1] for item in streamed] == [1, 2, 3]
+        
+        summary = result["summary"]
+        assert summary["completed"] == 3
+        assert sorted(summary["groups"][0]["servers"]) == ["gpu-1", "gpu-2"]
+        assert summary["groups"][1]["stdout"] == "disk full"
+    
+    @pytest.mark.asyncio
+    async def test_per_host_timeout(self, mcp_server):
+        async def fake_execute(command, server="default", timeout=30, working_directory=None):
+            # execute_command在截止时间到达时中断命令并返回超时结果
+            if server == "gpu-2":
+                await asyncio.sleep(timeout)
+                return mcp_server._timeout_result(command, server, "执行超时")
+            return {"stdout": "ok", "stderr": "", "exit_code": 0,
+                    "execution_time": 0, "command": command, "server": server}
+        
+        mcp_server.execute_command = fake_execute
+        result = await mcp_server.execute_on_servers("uptime", tags=["gpu"], timeout=0.2)
+        
+        statuses = {r["server"]: r["status"] for r in result["results"]}
+        assert statuses == {"gpu-1": "completed", "gpu-2": "timeout"}
+        assert result["summary"]["timeout"] == 1
+
+
+class TestResultCacheIntegration:
+    """只读命令结果缓存接入测试"""
+    
+    @pytest.mark.asyncio
+    async def test_cache_hit_and_invalidation(self, mcp_server):
+        calls = []
+        
+        async def fake_execute(command, server, working_directory, timeout=30, session_id=None, on_output=None):
+            calls.append(command)
+            return {"stdout": f"out-{len(calls)}", "stderr": "", "exit_code": 0,
+                    "execution_time": 0.1, "command": command, "server": server}
+        
+        mcp_server._execute_on_pane = fake_execute
+        
+        first = await mcp_server.execute_command("cat a.txt", server="gpu-1", use_cache=True)
+        second = await mcp_server.execute_command("cat a.txt", server="gpu-1", use_cache=True)
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert second["stdout"] == first["stdout"]
+        
+        # 修改类命令使缓存失效
+        await mcp_server.execute_command("touch a.txt", server="gpu-1", use_cache=True)
+        third = await mcp_server.execute_command("cat a.txt", server="gpu-1", use_cache=True)
+        assert third["cached"] is False
+        
+        # 显式刷新
+        fourth = await mcp_server.execute_command(
+            "cat a.txt", server="gpu-1", use_cache=True, refresh=True
+        )
+        assert fourth["cached"] is False
+        assert len(calls) == 4
+        
+        stats = (await mcp_server.get_server_status())["metrics"]["result_cache"]
+        assert stats["hits"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_invalidated_after_mutating_command(self, mcp_server):
+        release = asyncio.Event()
+        
+        async def fake_execute(command, server, working_directory, timeout=30, session_id=None, on_output=None):
+            if command.startswith("touch"):
+                await release.wait()
+            return {"stdout": command, "stderr": "", "exit_code": 0,
+                    "execution_time": 0.1, "command": command, "server": server}
+        
+        mcp_server._execute_on_pane = fake_execute
+        
+        mutating = asyncio.create_task(mcp_server.execute_command("touch a.txt", server="gpu-1"))
+        await asyncio.sleep(0)
+        # 修改类命令执行期间缓存的只读结果在它结束后失效
+        await mcp_server.execute_command("cat a.txt", server="gpu-1", use_cache=True)
+        release.set()
+        await mutating
+        
+        result = await mcp_server.execute_command("cat a.txt", server="gpu-1", use_cache=True)
+        assert result["cached"] is False
+    
+    @pytest.mark.asyncio
+    async def test_cache_disabled_by_default(self, mcp_server):
+        async def fake_execute(command, server, working_directory, timeout=30, session_id=None, on_output=None):
+            return {"stdout": "x", "stderr": "", "exit_code": 0,
+                    "execution_time": 0.1, "command": command, "server": server}
+        
+        mcp_server._execute_on_pane = fake_execute
+        await mcp_server.execute_command("ls", server="gpu-1")
+        result = await mcp_server.execute_command("ls", server="gpu-1")
+        assert result["cached"] is False
+
+
+class TestCancellation:
+    """notifications/cancelled 测试"""
+    
+    @pytest.mark.asyncio
+    async def test_cancel_in_flight_request(self, mcp_server):
+        from cursor_bridge.mcp_server import SimpleMCPHandler
+        
+        started = asyncio.Event()
+        interrupted = []
+        
+        async def fake_execute(command, **kwargs):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                interrupted.append(command)
+                raise
+        
+        mcp_server.execute_command = fake_execute
+        handler = SimpleMCPHandler(mcp_server)
+        
+        task = asyncio.create_task(handler.handle_request({
+            "jsonrpc": "2.0", "id": 7, "method": "tools/call",
+            "params": {"name": "execute_command", "arguments": {"command": "sleep 100"}}
+        }))
+        await started.wait()
+        
+        response = await handler.handle_request({
+            "jsonrpc": "2.0", "method": "notifications/cancelled",
+            "params": {"requestId": 7, "reason": "user stopped"}
+        })
+        assert response is None
+        
+        # 已取消的请求不发送响应
+        assert await task is None
+        assert interrupted == ["sleep 100"]
+        assert handler.cancelled_requests == 1
+        assert handler._in_flight == {}
+        
+        # 未知请求的取消被忽略
+        assert handler.cancel_request(99) is False
+
+
+class TestWaitForPattern:
+    """输出匹配等待测试"""
+    
+    @pytest.mark.asyncio
+    async def test_wait_on_job_output(self, mcp_server):
+        release = asyncio.Event()
+        
+        async def runner(job):
+            job.output.append("compiling\n")
+            await asyncio.sleep(0.1)
+            job.output.append("Server started on port 8080\n")
+            await release.wait()
+            job.output.append("shutdown\n")
+            return {"exit_code": 0, "stderr": "", "status": "completed"}
+        
+        job = mcp_server.jobs.submit("serve", "gpu-1", runner)
+        
+        result = await mcp_server.wait_for_pattern(r"started on port (\d+)", job_id=job.job_id, timeout=2)
+        assert result["status"] == "matched"
+        assert result["groups"] == ["8080"]
+        assert result["line"] == "Server started on port 8080"
+        # 连续等待从匹配行之后继续，不会重复匹配
+        assert result["next_offset"] == job.output.end
+        
+        result = await mcp_server.wait_for_pattern(
+            "port", job_id=job.job_id, offset=result["next_offset"], timeout=0.2
+        )
+        assert result["status"] == "timeout"
+        
+        release.set()
+        result = await mcp_server.wait_for_pattern(
+            "never", job_id=job.job_id, offset=result["next_offset"], timeout=2
+        )
+        assert result["status"] == "job_finished"
+        
+        result = await mcp_server.wait_for_pattern("(", job_id=job.job_id)
+        assert result["status"] == "error"
+
+
+class TestManagedPanes:
+    """托管面板主机检查测试"""
+    
+    @pytest.fixture
+    def main_pane(self, mcp_server):
+        from cursor_bridge.session.tmux_backend import tmux_backend
+        
+        tmux_config = mcp_server.config.servers["gpu-1"].tmux
+        pane = tmux_backend.get_session(tmux_config.session_name, tmux_config.window_name)
+        yield pane
+        tmux_backend.sessions.pop(f"{tmux_config.session_name}:{tmux_config.window_name}", None)
+    
+    @pytest.mark.asyncio
+    async def test_session_refused_when_main_pane_remote(self, mcp_server, main_pane):
+        main_pane.host = "gpu-1.internal"
+        mcp_server.session_manager.get_session = lambda name: SimpleNamespace(server_name="gpu-1")
+        
+        result = await mcp_server.execute_command("rm -rf build", server="gpu-1", session_id="s1")
+        
+        assert result["exit_code"] != 0
+        assert "gpu-1.internal" in result["stderr"]
+    
+    @pytest.mark.asyncio
+    async def test_unknown_host_is_probed(self, mcp_server, main_pane):
+        pane = SimpleNamespace(connect_commands=[])
+        
+        async def probe(main_pane, timeout=5.0):
+            return None
+        
+        mcp_server._probe_main_pane = probe
+        assert "无法确认" in await mcp_server._prepare_managed_pane("gpu-1", pane)
+        
+        async def probe_local(main_pane, timeout=5.0):
+            return socket.gethostname()
+        
+        mcp_server._probe_main_pane = probe_local
+        assert await mcp_server._prepare_managed_pane("gpu-1", pane) is None
+    
+    @pytest.mark.asyncio
+    async def test_connect_recipe_configures_reconnect(self, mcp_server, main_pane):
+        mcp_server.config.servers["gpu-1"].tmux.connect_commands = ["ssh gpu-1"]
+        main_pane.host = "gpu-1.internal"
+        
+        from cursor_bridge.session.tmux_backend import TmuxSession
+        pane = TmuxSession("cb-test", "main")
+        
+        assert await mcp_server._prepare_managed_pane("gpu-1", pane) is None
+        assert pane.connect_commands == ["ssh gpu-1"]
+        assert pane._host_guard() is not None
+    
+    @pytest.mark.asyncio
+    async def test_job_refused_before_pane_is_created(self, mcp_server, main_pane):
+        async def probe(main_pane, timeout=5.0):
+            return None
+        
+        async def acquire(server):
+            raise AssertionError("不应创建任务面板")
+        
+        mcp_server._probe_main_pane = probe
+        mcp_server._acquire_job_pane = acquire
+        
+        result = await mcp_server.start_job("make", server="gpu-1")
+        
+        assert result["exit_code"] != 0
+        assert "无法确认" in result["stderr"]
+        assert mcp_server.jobs.list_jobs() == []
+
+
+class TestFilePathRules:
+    """文件类工具的路径访问限制测试"""
+    
+    @pytest.mark.asyncio
+    async def test_blocked_paths_enforced_for_transfers(self, mcp_server):
+        from cursor_bridge.config.models import SecurityConfig
+        from cursor_bridge.security import SecurityPolicy
+        
+        mcp_server.policy = SecurityPolicy(SecurityConfig(blocked_paths=["/home/user/.ssh"]))
+        pane = SimpleNamespace(lock=asyncio.Lock(), cwd="/home/user")
+        
+        async def get_tmux_session(command, server, session_id=None):
+            return pane, None
+        
+        mcp_server._get_tmux_session = get_tmux_session
+        
+        for result in [
+            await mcp_server.read_file("/home/user/.ssh/id_rsa", server="gpu-1"),
+            await mcp_server.read_files(["notes.txt", ".ssh/id_rsa"], server="gpu-1"),
+            await mcp_server.write_file(".ssh/authorized_keys", "key", server="gpu-1"),
+        ]:
+            assert result["exit_code"] != 0
+            assert "禁止访问" in result["stderr"]
+        
+        # 配置了路径限制时无法解析的路径也被拒绝
+        result = await mcp_server.read_file("~/.ssh/id_rsa", server="gpu-1")
+        assert "绝对路径" in result["stderr"]
+        assert not pane.lock.locked()
+    
+    @pytest.mark.asyncio
+    async def test_transfers_use_checked_absolute_path(self, mcp_server):
+        sent = []
+        
+        async def read_file(path, offset, limit, compress, timeout):
+            sent.append(path)
+            return {"path": path, "content": "x", "encoding": "utf-8", "length": 1,
+                    "eof": True, "exit_code": 0}
+        
+        async def write_file(path, data, append, compress, timeout):
+            sent.append(path)
+            return {"path": path, "exit_code": 0}
+        
+        async def ensure_ready(timeout):
+            return True
+        
+        pane = SimpleNamespace(lock=asyncio.Lock(), cwd="/home/user", read_file=read_file,
+                               write_file=write_file, ensure_ready=ensure_ready)
+        
+        async def get_tmux_session(command, server, session_id=None):
+            return pane, None
+        
+        mcp_server._get_tmux_session = get_tmux_session
+        
+        # 面板中的相对路径可能已不在检查时的目录下，传输检查过的绝对路径
+        read = await mcp_server.read_file("notes.txt", server="gpu-1")
+        written = await mcp_server.write_file("src/../out.txt", "key", server="gpu-1")
+        
+        assert sent == ["/home/user/notes.txt", "/home/user/out.txt"]
+        assert read["path"] == "notes.txt"
+        assert written["path"] == "src/../out.txt"
+
+
+class TestDeltaMode:
+    """增量返回接入测试"""
+    
+    @pytest.mark.asyncio
+    async def test_failed_runs_not_recorded(self, mcp_server):
+        outputs = [("pods\n" * 50, 0), ("", 1), ("pods\n" * 50, 0)]
+        
+        async def fake_execute(command, server, working_directory, timeout=30, session_id=None, on_output=None):
+            stdout, exit_code = outputs.pop(0)
+            return {"stdout": stdout, "stderr": "", "exit_code": exit_code,
+                    "execution_time": 0.1, "command": command, "server": server}
+        
+        mcp_server._execute_on_pane = fake_execute
+        
+        first = await mcp_server.execute_command("kubectl get pods", server="gpu-1", delta=True)
+        assert first["delta"]["uri"].endswith(first["delta"]["hash"])
+        
+        failed = await mcp_server.execute_command("kubectl get pods", server="gpu-1", delta=True)
+        assert failed["delta"] == {"status": "full", "recorded": False}
+        
+        # 失败的输出不作为比较基准
+        again = await mcp_server.execute_command("kubectl get pods", server="gpu-1", delta=True)
+        assert again["delta"]["status"] == "unchanged"
+    
+    @pytest.mark.asyncio
+    async def test_coalesced_plain_call_gets_full_output(self, mcp_server):
+        lines = "".join(f"line {i}\n" for i in range(50))
+        outputs = [lines + "b\n", lines + "c\n"]
+        
+        async def fake_execute(command, server, working_directory, timeout=30, session_id=None, on_output=None):
+            await asyncio.sleep(0.05)
+            return {"stdout": outputs.pop(0), "stderr": "", "exit_code": 0,
+                    "execution_time": 0.1, "command": command, "server": server}
+        
+        mcp_server._execute_on_pane = fake_execute
+        await mcp_server.execute_command("cat app.log", server="gpu-1", use_cache=False, delta=True)
+        
+        # 增量请求和普通请求合并为一次执行，增量改写不能影响普通请求的结果
+        delta, plain = await asyncio.gather(
+            mcp_server.execute_command("cat app.log", server="gpu-1", use_cache=False, delta=True),
+            mcp_server.execute_command("cat app.log", server="gpu-1", use_cache=False),
+        )
+        
+        assert outputs == []
+        assert delta["delta"]["status"] == "diff" and "+c" in delta["stdout"]
+        assert plain["stdout"] == lines + "c\n"
+        assert "delta" not in plain
+    
+    @pytest.mark.asyncio
+    async def test_uri_omitted_when_not_stored(self, mcp_server):
+        async def fake_execute(command, server, working_directory, timeout=30, session_id=None, on_output=None):
+            return {"stdout": "x" * 100, "stderr": "", "exit_code": 0,
+                    "execution_time": 0.1, "command": command, "server": server}
+        
+        mcp_server._execute_on_pane = fake_execute
+        mcp_server.output_history.max_bytes = 10
+        
+        result = await mcp_server.execute_command("cat big.log", server="gpu-1", delta=True)
+        assert result["delta"]["status"] == "full"
+        assert "uri" not in result["delta"]
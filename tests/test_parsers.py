@@ -0,0 +1,109 @@
+"""
+命令输出解析测试
+"""
+
+from cursor_bridge.execution import default_registry
+
+
+class TestParserRegistry:
+    """解析器查找与命令改写测试"""
+
+    def test_prepare_rewrites_to_machine_readable(self):
+        registry = default_registry()
+
+        command, parser = registry.prepare("df -h")
+        assert (command, parser.name) == ("df -P -h", "df")
+        command, parser = registry.prepare("git status")
+        assert (command, parser.name) == ("git status --porcelain -b", "git_status")
+        # 用户指定的其他输出格式换成解析器能识别的 porcelain v1
+        command, _ = registry.prepare("git status --porcelain=v2 -z -- src")
+        assert command == "git status --porcelain -b -- src"
+        command, _ = registry.prepare("git status -sbz --untracked-files=no")
+        assert command == "git status --porcelain -b --untracked-files=no"
+        command, parser = registry.prepare("nvidia-smi")
+        assert command.startswith("nvidia-smi --query-gpu=index,name,") and parser.name == "nvidia_smi"
+
+    def test_prepare_skips_unsupported(self):
+        registry = default_registry()
+
+        assert registry.prepare("ls -l | head") == ("ls -l | head", None)
+        assert registry.prepare("ls") == ("ls", None)
+        assert registry.prepare("git log") == ("git log", None)
+        assert registry.prepare("nvidia-smi -L") == ("nvidia-smi -L", None)
+
+
+class TestParsers:
+    """常见命令输出解析测试"""
+
+    def parse(self, command: str, output: str):
+        registry = default_registry()
+        _, parser = registry.prepare(command)
+        return registry.parse(parser, output)
+
+    def test_ls(self):
+        output = "\n".join([
+            "total 12",
+            "drwxr-xr-x  2 root root 4096 Jan  2 10:00 src",
+            "-rw-r--r--. 1 root root  215 Mar 14  2024 my file.txt",
+            "lrwxrwxrwx  1 root root    7 2024-03-14 09:30 latest -> v1.2.3",
+        ])
+        entries = self.parse("ls -la", output)
+
+        assert [entry["name"] for entry in entries] == ["src", "my file.txt", "latest"]
+        assert entries[0]["type"] == "dir" and entries[1]["size"] == 215
+        assert entries[1]["modified"] == "Mar 14 2024"
+        assert entries[2]["target"] == "v1.2.3"
+
+    def test_ps(self):
+        output = (
+            "USER PID %CPU %MEM COMMAND\n"
+            "root   1  0.0  0.1 /sbin/init splash\n"
+        )
+        assert self.parse("ps aux", output) == [
+            {"user": "root", "pid": 1, "%cpu": 0.0, "%mem": 0.1, "command": "/sbin/init splash"}
+        ]
+
+    def test_df(self):
+        output = (
+            "Filesystem     1024-blocks    Used Available Capacity Mounted on\n"
+            "/dev/sda1        102400000 5120000  97280000       6% /mnt/my disk\n"
+        )
+        assert self.parse("df", output) == [{
+            "filesystem": "/dev/sda1", "size": 102400000, "used": 5120000,
+            "available": 97280000, "use_percent": 6, "mounted_on": "/mnt/my disk"
+        }]
+
+    def test_free(self):
+        output = (
+            "               total        used        free      shared  buff/cache   available\n"
+            "Mem:        16000000     4000000     8000000      100000     4000000    11000000\n"
+            "Swap:        2000000           0     2000000\n"
+        )
+        result = self.parse("free", output)
+        assert result["mem"]["available"] == 11000000
+        assert result["swap"] == {"total": 2000000, "used": 0, "free": 2000000}
+
+    def test_git_status(self):
+        output = "\n".join([
+            "## main...origin/main [ahead 2, behind 1]",
+            " M src/app.py",
+            "R  old.py -> new.py",
+            "?? notes.txt",
+        ])
+        result = self.parse("git status", output)
+
+        assert (result["branch"], result["upstream"], result["ahead"], result["behind"]) == (
+            "main", "origin/main", 2, 1
+        )
+        assert result["files"][0] == {"path": "src/app.py", "index": " ", "worktree": "M"}
+        assert result["files"][1]["orig_path"] == "old.py"
+        assert result["files"][2]["index"] == "?"
+
+    def test_nvidia_smi_csv(self):
+        output = (
+            "index, name, utilization.gpu [%], memory.used [MiB]\n"
+            "0, NVIDIA A100-SXM4-40GB, 87 %, 30210 MiB\n"
+        )
+        assert self.parse("nvidia-smi --query-gpu=index,name --format=csv", output) == [
+            {"index": 0, "name": "NVIDIA A100-SXM4-40GB", "utilization.gpu": 87, "memory.used": 30210}
+        ]
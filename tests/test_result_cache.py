@@ -0,0 +1,71 @@
+"""
+命令结果缓存测试
+"""
+
+import time
+
+from cursor_bridge.execution import ResultCache
+
+
+def make_result(stdout: str) -> dict:
+    return {"stdout": stdout, "stderr": "", "exit_code": 0, "command": "cat f"}
+
+
+class TestResultCache:
+    """结果缓存测试"""
+    
+    def test_hit_and_miss(self):
+        cache = ResultCache(ttl=10)
+        key = ResultCache.make_key("s1", "/work", "cat f")
+        
+        assert cache.get(key) is None
+        cache.put(key, make_result("hello"))
+        
+        result, age = cache.get(key)
+        assert result["stdout"] == "hello"
+        assert age >= 0
+        assert cache.get_stats()["hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+    
+    def test_ttl_expiry(self):
+        cache = ResultCache(ttl=0.05)
+        key = ResultCache.make_key("s1", None, "ls")
+        cache.put(key, make_result("a"))
+        
+        time.sleep(0.1)
+        assert cache.get(key) is None
+        assert cache.get_stats()["entries"] == 0
+    
+    def test_lru_eviction_by_bytes(self):
+        cache = ResultCache(ttl=10, max_bytes=10)
+        k1 = ResultCache.make_key("s1", None, "a")
+        k2 = ResultCache.make_key("s1", None, "b")
+        k3 = ResultCache.make_key("s1", None, "c")
+        
+        cache.put(k1, make_result("xxxx"))
+        cache.put(k2, make_result("yyyy"))
+        cache.get(k1)  # k1 变为最近使用
+        cache.put(k3, make_result("zzzz"))
+        
+        assert cache.get(k2) is None
+        assert cache.get(k1) is not None
+        assert cache.get_stats()["bytes"] <= 10
+        assert cache.get_stats()["evictions"] == 1
+    
+    def test_invalidate_server(self):
+        cache = ResultCache(ttl=10)
+        cache.put(ResultCache.make_key("s1", None, "ls"), make_result("a"))
+        cache.put(ResultCache.make_key("s2", None, "ls"), make_result("b"))
+        
+        assert cache.invalidate_server("s1") == 1
+        assert cache.get(ResultCache.make_key("s1", None, "ls")) is None
+        assert cache.get(ResultCache.make_key("s2", None, "ls")) is not None
+    
+    def test_returned_result_is_copy(self):
+        cache = ResultCache(ttl=10)
+        key = ResultCache.make_key("s1", None, "ls")
+        cache.put(key, make_result("a"))
+        
+        result, _ = cache.get(key)
+        result["stdout"] = "modified"
+        assert cache.get(key)[0]["stdout"] == "a"
@@ -0,0 +1,100 @@
+"""
+安全策略测试
+"""
+
+import pytest
+
+from cursor_bridge.config.models import SecurityConfig
+from cursor_bridge.security import CommandClass, SecurityPolicy
+
+
+class TestCommandClassification:
+    """命令分类测试"""
+    
+    @pytest.fixture
+    def policy(self):
+        return SecurityPolicy()
+    
+    @pytest.mark.parametrize("command", [
+        "cat README.md",
+        "ls -la src",
+        "git log -5",
+        "git status --porcelain",
+        "grep -rn TODO . | head -20",
+        "find . -name '*.py'",
+        "ls missing 2>/dev/null",
+        "ps aux 2>&1 | grep python",
+        "nvidia-smi",
+        "hostname",
+        "date +%s",
+        "date -d yesterday +%F",
+        "awk '{print $1}' access.log",
+        "ps aux 2>&1 | grep python &> /dev/null",
+        "sort data | uniq -c",
+        "git reflog -5",
+        "docker stats --no-stream",
+        "tail -n 100 app.log",
+    ])
+    def test_read_only(self, policy, command):
+        assert policy.classify(command) is CommandClass.READ_ONLY
+    
+    @pytest.mark.parametrize("command", [
+        "rm -rf build",
+        "git pull",
+        "make",
+        "echo hi > out.txt",
+        "cat a >> b",
+        "find . -name '*.pyc' -delete",
+        "sed -i.bak 's/a/b/' file",
+        "ls && touch marker",
+        "cat $(ls)",
+        "sleep 100 &",
+        "cd /tmp",
+        "env FOO=1 make install",
+        "top",
+        "hostname web-01",
+        "date -s '2024-01-01'",
+        "awk 'BEGIN{system(\"rm x\")}'",
+        "awk '{print > \"out.txt\"}' data",
+        "cat a & rm -rf x",
+        "ls & touch y",
+        "yq -i '.a = 1' config.yaml",
+        "uniq in.txt out.txt",
+        "git diff --output=patch.diff",
+        "git log --output x",
+        "git reflog expire --all",
+        "tail -f app.log",
+        "docker stats",
+        "kubectl logs -f web",
+        "docker logs --follow web",
+        "less README.md",
+        "",
+    ])
+    def test_mutating(self, policy, command):
+        assert policy.classify(command) is CommandClass.MUTATING
+    
+    def test_configured_read_only_commands(self):
+        policy = SecurityPolicy(SecurityConfig(read_only_commands=["kubectx"]))
+        assert policy.is_read_only("kubectx")
+        assert not SecurityPolicy().is_read_only("kubectx")
+
+
+class TestPathRules:
+    """路径访问限制测试"""
+    
+    def test_check_path(self):
+        policy = SecurityPolicy(SecurityConfig(
+            allowed_paths=["/home", "/tmp"],
+            blocked_paths=["/home/user/.ssh"]
+        ))
+        assert policy.check_path("/home/user/project") is None
+        assert policy.check_path("/tmp/../home") is None
+        assert policy.check_path("/homework") is not None
+        assert policy.check_path("/home/user/.ssh/id_rsa") is not None
+        assert policy.check_path("/etc") is not None
+        assert not SecurityPolicy().restricts_paths
+    
+    def test_blocked_paths_under(self):
+        policy = SecurityPolicy(SecurityConfig(blocked_paths=["/home/user/.ssh", "/root"]))
+        assert policy.blocked_paths_under("/home") == ["/home/user/.ssh"]
+        assert policy.blocked_paths_under("/") == ["/home/user/.ssh", "/root"]
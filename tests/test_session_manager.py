@@ -4,6 +4,8 @@
 
 import pytest
 import asyncio
+import os
+import subprocess
 import time
 from unittest.mock import Mock, AsyncMock, patch
 
@@ -11,6 +13,7 @@ from cursor_bridge.session import (
     SessionManager, SessionConfig, SessionType, SessionStatus,
     SessionEventType, TmuxBackend
 )
+from cursor_bridge.session.registry import SessionRegistry
 
 
 class TestSessionManager:
@@ -115,4 +118,103 @@ async def test_session_lifecycle():
         
     finally:
         # 停止管理器
-        await manager.stop()
\ No newline at end of file
+        await manager.stop()
+
+@pytest.mark.asyncio
+async def test_cleanup_idle_sessions():
+    """测试空闲会话回收"""
+    manager = SessionManager({'session_idle_timeout': 60, 'auto_cleanup': False})
+    manager._backend.create_session = AsyncMock(return_value=True)
+    manager._backend.destroy_session = AsyncMock(return_value=True)
+    manager._backend.get_session_info = AsyncMock(return_value=None)
+    manager._backend.list_sessions = AsyncMock(return_value=['idle', 'busy', 'persistent', 'fresh'])
+    manager._backend.is_busy = Mock(side_effect=lambda name: name == 'busy')
+    
+    events = []
+    manager.add_listener(lambda event, info: events.append((event, info.name)))
+    
+    for name in ['idle', 'busy', 'persistent', 'fresh', 'gone']:
+        session_type = SessionType.PERSISTENT if name == 'persistent' else SessionType.INTERACTIVE
+        await manager.create_session(SessionConfig(name=name, server_name='s', session_type=session_type))
+    for name in ['idle', 'busy', 'persistent', 'gone']:
+        manager.get_session(name).last_activity = time.time() - 120
+    
+    removed = await manager.cleanup_idle_sessions()
+    
+    assert sorted(removed) == ['gone', 'idle']
+    assert sorted(info['name'] for info in manager.list_sessions()) == ['busy', 'fresh', 'persistent']
+    assert (SessionEventType.IDLE_REAPED, 'idle') in events
+    assert (SessionEventType.LOST, 'gone') in events
+    manager._backend.destroy_session.assert_awaited_once_with('idle')
+
+
+@pytest.mark.asyncio
+async def test_restore_sessions_from_registry(tmp_path):
+    """测试重启后从注册表接管会话"""
+    config = {'auto_cleanup': False, 'registry_file': str(tmp_path / 'sessions.json')}
+    manager = SessionManager(config)
+    manager._backend.create_session = AsyncMock(return_value=True)
+    manager._backend.get_session_info = AsyncMock(return_value=None)
+    for name in ['alive', 'dead', 'gone']:
+        await manager.create_session(SessionConfig(name=name, server_name='s', environment={'A': '1'}))
+    manager.touch('alive', commands=3)
+    await manager.stop()
+    
+    restarted = SessionManager(config)
+    restarted._backend.destroy_session = AsyncMock(return_value=True)
+    restarted._backend.list_panes = AsyncMock(return_value=[
+        {'session': 'alive', 'window': 'main', 'pane_id': '%1', 'pid': 42,
+         'dead': False, 'activity': None, 'current_path': '/srv'},
+        {'session': 'dead', 'window': 'main', 'pane_id': '%2', 'pid': 43,
+         'dead': True, 'activity': None, 'current_path': '/'},
+    ])
+    events = []
+    restarted.add_listener(lambda event, info: events.append((event, info.name)))
+    
+    await restarted.start()
+    
+    assert events == [(SessionEventType.ADOPTED, 'alive')]
+    info = restarted.get_session('alive')
+    assert info.command_count == 3
+    assert info.pid == 42
+    assert info.working_directory == '/srv'
+    restarted._backend.destroy_session.assert_awaited_once_with('dead')
+    # 注册表只保留接管的会话
+    assert list(SessionManager(config)._registry.load()) == ['alive']
+
+
+def test_registry_shared_between_processes(tmp_path):
+    """测试多个进程共用注册表"""
+    registry = SessionRegistry(str(tmp_path / 'sessions.json'))
+    other = os.getppid()
+    finished = subprocess.Popen(['true'])
+    finished.wait()
+    
+    registry.save({'a': {'server_name': 's'}}, owner=other)
+    registry.save({'b': {'server_name': 's'}, 'c': {'server_name': 's'}}, owner=finished.pid)
+    registry.save({'d': {'server_name': 's'}})
+    # 其他进程的记录不会被覆盖
+    assert sorted(registry.load()) == ['a', 'b', 'c', 'd']
+    
+    # 只能接管所属进程已退出的记录
+    assert registry.claim(['a', 'b', 'd']) == {'b', 'd'}
+    registry.save({'d': {'server_name': 's'}})
+    assert sorted(registry.load()) == ['a', 'c', 'd']
+    assert registry.load()['a']['owner'] == other
+
+
+@pytest.mark.asyncio
+async def test_restore_skips_sessions_of_running_process(tmp_path):
+    """测试不接管其他运行中进程的会话"""
+    config = {'auto_cleanup': False, 'registry_file': str(tmp_path / 'sessions.json')}
+    SessionRegistry(config['registry_file']).save({'theirs': {'server_name': 's'}}, owner=os.getppid())
+    
+    manager = SessionManager(config)
+    manager._backend.list_panes = AsyncMock(return_value=[
+        {'session': 'theirs', 'window': 'main', 'pane_id': '%1', 'pid': 42,
+         'dead': False, 'activity': None, 'current_path': '/srv'},
+    ])
+    
+    assert await manager.restore_sessions() == []
+    assert manager.get_session('theirs') is None
+    assert list(manager._registry.load()) == ['theirs']
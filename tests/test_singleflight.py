@@ -0,0 +1,81 @@
+"""
+请求合并测试
+"""
+
+import asyncio
+
+import pytest
+
+from cursor_bridge.execution import SingleFlight
+
+
+class TestSingleFlight:
+    """single-flight合并测试"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_execution(self):
+        flight = SingleFlight()
+        calls = 0
+        
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.1)
+            return {"stdout": "ok"}
+        
+        results = await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+        
+        assert calls == 1
+        assert [shared for _, shared in results].count(False) == 1
+        assert all(result["stdout"] == "ok" for result, _ in results)
+        assert flight.get_stats()["coalesced"] == 4
+        assert flight.in_flight == 0
+    
+    @pytest.mark.asyncio
+    async def test_sequential_calls_execute_again(self):
+        flight = SingleFlight()
+        calls = 0
+        
+        async def work():
+            nonlocal calls
+            calls += 1
+            return calls
+        
+        await flight.do("k", work)
+        await flight.do("k", work)
+        assert calls == 2
+    
+    @pytest.mark.asyncio
+    async def test_cancel_one_waiter_keeps_execution(self):
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.1)
+            return "done"
+        
+        first = asyncio.create_task(flight.do("k", work))
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        
+        result, shared = await second
+        assert result == "done"
+        assert shared is True
+    
+    @pytest.mark.asyncio
+    async def test_cancel_all_waiters_cancels_execution(self):
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+        
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        
+        task = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
@@ -0,0 +1,64 @@
+"""
+MCP资源订阅测试
+"""
+
+import asyncio
+
+import pytest
+
+from cursor_bridge.subscriptions import ResourceSubscriptions
+
+
+class FakeSource:
+    """按顺序返回预设内容的数据源"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.stopped = False
+
+    async def start(self):
+        pass
+
+    async def poll(self):
+        return self.chunks.pop(0) if self.chunks else ""
+
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.mark.asyncio
+async def test_updates_are_pushed_until_source_ends():
+    updates = []
+
+    async def notify(uri, text, truncated, ended):
+        updates.append((uri, text, truncated, ended))
+
+    subscriptions = ResourceSubscriptions(notify, interval=0.01, max_chunk=4)
+    source = FakeSource(["a\n", "", "line\nmore\n", None])
+    await subscriptions.subscribe("cursor-bridge://session-logs/s1", source)
+    for _ in range(100):
+        if source.stopped:
+            break
+        await asyncio.sleep(0.01)
+
+    # 没有新增内容的间隔不推送，超过上限时只推送最后的部分
+    assert updates == [
+        ("cursor-bridge://session-logs/s1", "a\n", False, False),
+        ("cursor-bridge://session-logs/s1", "ore\n", True, False),
+        ("cursor-bridge://session-logs/s1", "", False, True),
+    ]
+    assert "cursor-bridge://session-logs/s1" not in subscriptions
+
+
+@pytest.mark.asyncio
+async def test_unsubscribe_stops_source():
+    async def notify(uri, text, truncated, ended):
+        pass
+
+    subscriptions = ResourceSubscriptions(notify, interval=0.01)
+    source = FakeSource([])
+    await subscriptions.subscribe("cursor-bridge://file-tail/s1/var/log/app.log", source)
+
+    assert await subscriptions.unsubscribe("cursor-bridge://file-tail/s1/var/log/app.log")
+    assert source.stopped
+    assert not await subscriptions.unsubscribe("cursor-bridge://file-tail/s1/var/log/app.log")
@@ -0,0 +1,111 @@
+"""
+终端模型测试
+"""
+
+from cursor_bridge.session.terminal import (
+    PaneLogReader, PaneStream, TerminalEmulator, clean_pane_log, strip_ansi
+)
+
+
+class TestTerminalEmulator:
+    """增量VT100解析测试"""
+
+    def test_progress_bar_collapses(self):
+        term = TerminalEmulator()
+        for i in range(0, 101, 10):
+            term.feed(f"\rDownloading {i:3d}%")
+        term.feed("\r\nDone\r\n")
+
+        assert term.text() == "Downloading 100%\nDone\n"
+
+    def test_cursor_up_and_erase_line(self):
+        # docker pull 风格的多行进度
+        term = TerminalEmulator()
+        term.feed("layer1: 10%\r\nlayer2: 10%\r\n")
+        term.feed("\x1b[2A\x1b[2Klayer1: done\r\n\x1b[2Klayer2: done\r\n")
+
+        assert term.text() == "layer1: done\nlayer2: done\n"
+
+    def test_wrapped_lines_are_joined(self):
+        term = TerminalEmulator(width=10)
+        term.feed("x" * 25 + "\r\n")
+
+        assert term.text() == "x" * 25 + "\n"
+        assert term.line_count == 4
+
+    def test_split_escape_sequence_and_utf8(self):
+        term = TerminalEmulator()
+        data = "\x1b[31m红色\x1b[0m\r\n".encode("utf-8")
+        for i in range(len(data)):
+            term.feed(data[i:i + 1])
+
+        assert term.text() == "红色\n"
+
+    def test_backspace_osc_and_sgr(self):
+        term = TerminalEmulator()
+        term.feed("\x1b]0;title\x07abc\bX\x1b[1;32m!\x1b[0m")
+
+        assert term.text() == "abX!"
+
+    def test_text_since_absolute_line(self):
+        term = TerminalEmulator(max_lines=5)
+        for i in range(10):
+            term.feed(f"line{i}\r\n")
+
+        assert term.cursor_line == 10
+        assert term.text(8) == "line8\nline9\n"
+        # 已丢弃的行不再返回
+        assert term.text(0).startswith("line6")
+
+    def test_complete_lines_exclude_cursor_line(self):
+        term = TerminalEmulator(width=10)
+        term.feed("one\r\ntwo\r\n" + "y" * 15)
+
+        # 光标所在的行（含折行部分）还可能被改写，不返回
+        lines, next_line = term.complete_lines(0)
+        assert lines == ["one", "two"]
+        assert next_line == 2
+
+        term.feed("\r\n50%\r100%")
+        lines, next_line = term.complete_lines(next_line)
+        assert lines == ["y" * 15]
+        assert next_line == 4
+
+
+def test_pane_stream_read_in_chunks(tmp_path):
+    path = tmp_path / "pane.log"
+    path.write_bytes(b"".join(b"line%d\r\n" % i for i in range(10)))
+    stream = PaneStream("test:0", max_lines=4)
+    stream.path = str(path)
+
+    # 分块读取时每块的行在被丢弃之前都能取到
+    forwarded, lines = 0, []
+    while stream.read(max_lines=2):
+        chunk, forwarded = stream.emulator.complete_lines(forwarded)
+        lines.extend(chunk)
+    assert lines == [f"line{i}" for i in range(10)]
+    assert stream.emulator.first_line > 0
+
+
+def test_pane_log_reader_skips_internal_lines(tmp_path):
+    path = tmp_path / "pane.log"
+    path.write_bytes(b"")
+    stream = PaneStream("test:0")
+    stream.path = str(path)
+    reader = PaneLogReader(stream)
+
+    with open(path, "ab") as f:
+        f.write(
+            b"$ printf '%s_S_%d\\n' __CB_abc 0; make \r\x1b[Kmore\r\n"
+            b"__CB_abc_S_0\r\n\x1b[32mok\x1b[0m\r\n10%\r100%\r\n"
+            b"__CBF_def_B\r\nH4sIAAAA\r\n__CBF_def_F\r\n$ "
+        )
+    assert reader.read() == "ok\n100%\n"
+    # 未换行的提示符在没有新输出时返回
+    assert reader.read() == "$\n"
+
+    assert clean_pane_log("__CB_abc_DONE host /\nbuild done") == "build done"
+
+
+def test_strip_ansi():
+    assert strip_ansi("\x1b[1;31merror\x1b[0m: x") == "error: x"
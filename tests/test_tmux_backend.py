@@ -0,0 +1,345 @@
+"""
+tmux后端测试
+"""
+
+import base64
+import gzip
+import re
+import socket
+import subprocess
+
+import pytest
+
+from cursor_bridge.session.tmux_backend import TmuxSession
+
+
+class TestBatchScript:
+    """批处理脚本生成与解析测试"""
+    
+    def test_marker_not_in_typed_script(self):
+        token = "__CB_test"
+        script = TmuxSession._build_batch_script(["echo hi", "ls"], token, True)
+        
+        # 回显的脚本中不能出现完整的标记行
+        assert f"{token}_S_0" not in script
+        assert f"{token}_DONE" not in script
+        assert "if [ $__cb_rc -eq 0 ]" in script
+    
+    def test_parse_output(self):
+        token = "__CB_test"
+        output = "\n".join([
+            "$ __cb_rc=0; printf ...",
+            f"{token}_S_0_1000000000",
+            "hello",
+            "world",
+            f"{token}_E_0_0_1500000000",
+            f"{token}_S_1_1500000000",
+            "boom",
+            f"{token}_E_1_2_1600000000",
+            f"{token}_DONE",
+            "$ "
+        ])
+        
+        steps = TmuxSession._parse_batch_output(output, ["echo", "fail", "never"], token)
+        
+        assert steps[0]["stdout"] == "hello\nworld"
+        assert steps[0]["exit_code"] == 0
+        assert steps[0]["execution_time"] == pytest.approx(0.5)
+        assert steps[1]["status"] == "failed"
+        assert steps[1]["exit_code"] == 2
+        assert steps[2]["status"] == "skipped"
+    
+    def test_parse_partial_output(self):
+        token = "__CB_test"
+        output = f"{token}_S_0_x\nstill running"
+        
+        steps = TmuxSession._parse_batch_output(output, ["sleep 100"], token)
+        
+        assert steps[0]["status"] == "running"
+        assert steps[0]["stdout"] == "still running"
+    
+    def test_parse_lost_start_marker(self):
+        # 输出超过历史缓冲区，起始标记已被丢弃
+        token = "__CB_test"
+        output = f"2999\n3000\n{token}_E_0_0_2\n{token}_DONE"
+        
+        steps = TmuxSession._parse_batch_output(output, ["seq 1 3000"], token)
+        
+        assert steps[0]["status"] == "completed"
+        assert steps[0]["stdout"] == "2999\n3000"
+        assert steps[0]["truncated"] is True
+
+    def test_output_without_trailing_newline(self):
+        token = "__CB_test"
+        script = TmuxSession._build_batch_script(["printf abc", "echo ok", "printf 'x\\n\\n'"], token, True)
+        output = subprocess.run(["bash", "-c", script], capture_output=True, text=True).stdout
+
+        steps = TmuxSession._parse_batch_output(output, ["printf abc", "echo ok", "printf"], token)
+
+        assert [step["stdout"] for step in steps] == ["abc", "ok", "x"]
+        assert [step["exit_code"] for step in steps] == [0, 0, 0]
+
+    def test_setup_folded_into_script(self):
+        token = "__CB_test"
+        setup = TmuxSession._build_setup("/srv/my app", {"MODE": "a b"})
+        script = TmuxSession._build_batch_script(["make"], token, True, setup)
+
+        assert "cd '/srv/my app'" in script
+        assert "export MODE='a b'" in script
+        # 设置失败时不执行命令，结束标记上报当前目录
+        assert script.index(setup) < script.index("eval make")
+        assert script.endswith("\"$PWD\"")
+        assert TmuxSession._build_setup(None, {}) is None
+    
+    def test_setup_compares_environment_in_shell(self):
+        setup = TmuxSession._build_setup(None, {"MODE": "a b"})
+        
+        # 不依赖记录的状态：值不同（如中断后换了新的shell）时重新导出
+        for current in ["", "MODE=old; ", "export MODE='a b'; "]:
+            result = subprocess.run(
+                ["sh", "-c", f'{current}{setup} && sh -c \'printf %s "$MODE"\''],
+                capture_output=True, text=True
+            )
+            assert result.stdout == "a b"
+
+    def test_parse_setup_failure(self):
+        token = "__CB_test"
+        output = "\n".join([
+            f"{token}_P",
+            "bash: cd: /missing: No such file or directory",
+            f"{token}_Q_1",
+            f"{token}_DONE /home/user",
+        ])
+
+        assert TmuxSession._parse_setup_output(output, token) == (
+            1, "bash: cd: /missing: No such file or directory"
+        )
+        assert TmuxSession._parse_setup_output(f"{token}_DONE /", token) is None
+
+    def test_parse_read_output(self):
+        token = "__CBF_test"
+        data = "第一行\n" * 100
+        payload = base64.encodebytes(gzip.compress(data.encode())).replace(b"\n", b"\r\n")
+        raw = b"".join([
+            # 回显的命令中标记被拆开，不会被误识别
+            f"$ printf '%s_B\\n' {token}; cat x | gzip -c | base64\r\n".encode(),
+            f"{token}_M 1000 abc123\r\n{token}_B\r\n".encode(),
+            payload,
+            f"{token}_F\r\n".encode(),
+        ])
+        
+        size, checksum, content, transfer_bytes = TmuxSession._parse_read_output(raw, token, True)
+        assert (size, checksum) == (1000, "abc123")
+        assert content.decode() == data
+        assert transfer_bytes == len(payload)
+        # 结束标记还没写入时视为不完整
+        assert TmuxSession._parse_read_output(raw[:-20], token, True) is None
+    
+    def test_read_command_frames_range(self):
+        command = TmuxSession._build_read_command("/tmp/my file", "__CBF_test", 100, 50, False)
+        
+        assert "__cb_f='/tmp/my file'" in command
+        assert "tail -c +101" in command and "head -c 50" in command
+        assert "gzip" not in command
+        assert "__CBF_test_B" not in command
+    
+    def test_tree_command_and_entries(self):
+        command = TmuxSession._build_tree_command(
+            "/srv/app", "__CBT_test", 2, ["*.py"], [".git"], ["/srv/app/secrets"], 100, True
+        )
+        assert "-maxdepth 2" in command
+        assert "\\( -name .git -o -path /srv/app/secrets \\) -prune -o \\( -name '*.py' \\)" in command
+        assert "head -n 101" in command
+        
+        data = b"d\t4096\t1700000000.5\tsrc\nf\t12\t1700000001.25\tsrc/a.py\nbroken line\n"
+        assert TmuxSession._parse_tree_entries(data) == [
+            {"path": "src", "type": "dir", "size": 4096, "mtime": 1700000000},
+            {"path": "src/a.py", "type": "file", "size": 12, "mtime": 1700000001},
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_search_groups_rg_json(self, monkeypatch):
+        session = TmuxSession("test")
+        records = [
+            '{"type":"begin","data":{"path":{"text":"src/a.py"}}}',
+            '{"type":"match","data":{"path":{"text":"src/a.py"},"lines":{"text":"def foo():\\n"},"line_number":3}}',
+            '{"type":"match","data":{"path":{"text":"src/a.py"},"lines":{"text":"foo()\\n"},"line_number":9}}',
+            '{"type":"end","data":{"path":{"text":"src/a.py"}}}',
+            '{"type":"begin","data":{"path":{"text":"src/b.py"}}}',
+            '{"type":"match","data":{"path":{"text":"src/b.py"},"lines":{"bytes":"Zm9vIFx4ZmY="},"line_number":1}}',
+        ]
+        
+        async def fake_batch(commands, **kwargs):
+            token = re.search(r"(__CBS_\w+)", commands[0]).group(1)
+            kwargs["on_output"]("\n".join([f"{token}_R rg", *records]) + "\n")
+            return {"exit_code": 0, "stdout": "", "stderr": "", "status": "completed"}
+        
+        monkeypatch.setattr(session, "execute_batch", fake_batch)
+        streamed = []
+        result = await session.search("foo", "src", max_matches=3, on_file=streamed.append)
+        
+        assert result["tool"] == "rg"
+        # 每个文件的匹配结束后立即回调
+        assert [group["path"] for group in streamed] == ["src/a.py", "src/b.py"]
+        assert result["files"][0]["matches"] == [
+            {"line": 3, "text": "def foo():"}, {"line": 9, "text": "foo()"}
+        ]
+        assert result["files"][1]["matches"][0]["text"] == "foo \\xff"
+        assert result["match_count"] == 3 and result["truncated"] is True
+    
+    def test_parse_grep_line(self):
+        assert TmuxSession._parse_search_line("src/a.py:12:x = 1:2", "grep") == ("src/a.py", 12, "x = 1:2")
+        assert TmuxSession._parse_search_line("grep: Unmatched ( or \\(", "grep") is None
+    
+    def test_parse_stat_line(self):
+        token = "__CBF_test"
+        raw = f"{token}_S 1700000000 120 1690000000 4242\r\n{token}_M 120 abc\r\n".encode()
+        assert TmuxSession._parse_stat_line(raw, token) == (1700000000, (120, 1690000000, 4242))
+        # 远程没有GNU stat
+        raw = f"{token}_S 1700000000 \r\n".encode()
+        assert TmuxSession._parse_stat_line(raw, token) == (1700000000, None)
+
+
+class HungPane(TmuxSession):
+    """模拟一个命令卡住的面板：只有第二次 C-c 才能中断"""
+    
+    def __init__(self):
+        super().__init__("fake")
+        self.screen = []
+        self.keys = []
+        self.running = False
+    
+    async def _send_literal(self, text):
+        if self.running:
+            return 0, ""
+        if "_DONE" in text:
+            token = re.search(r"__CB_[0-9a-f]+", text).group(0)
+            self.screen += [f"{token}_S_0_1", "partial line"]
+            self.running = True
+        elif "_READY" in text:
+            self.screen.append(f"{text.split()[-1]}_READY")
+        return 0, ""
+    
+    async def _send_keys(self, *keys):
+        self.keys.append(keys)
+        if keys == ("C-c",) and len(self.keys) >= 3:
+            self.running = False
+        return 0
+    
+    async def get_position(self):
+        return {"line": 0, "history_size": 0, "history_limit": 2000}
+    
+    async def capture_output(self, lines=100, join_lines=False, start=None):
+        return "\n".join(self.screen[start:] if start else self.screen)
+
+
+class TestDeadline:
+    """超时中断测试"""
+    
+    @pytest.mark.asyncio
+    async def test_timeout_interrupts_and_recovers(self):
+        pane = HungPane()
+        result = await pane.run_command("sleep 100", timeout=0.3, poll_interval=0.05)
+        
+        assert result["status"] == "timeout"
+        assert result["exit_code"] == 124
+        assert result["stdout"] == "partial line"
+        assert result["recovered"] is True
+        # Enter, 第一次C-c无效, 第二次C-c后面板恢复
+        assert [k for k in pane.keys if k != ("Enter",)] == [("C-c",), ("C-c",)]
+    
+    @pytest.mark.asyncio
+    async def test_stuck_pane_is_reprobed_before_next_command(self):
+        pane = HungPane()
+        pane.INTERRUPT_SEQUENCE = (("C-\\",),)
+        result = await pane.run_command("sleep 100", timeout=0.3, poll_interval=0.05)
+        
+        assert result["recovered"] is False
+        assert pane.healthy is False
+        # 程序仍卡住时不能交给下一条命令
+        assert await pane.ensure_ready(0.2) is False
+        
+        pane.running = False
+        assert await pane.ensure_ready(0.2) is True
+        assert pane.healthy is True
+
+
+class DroppedPane(TmuxSession):
+    """模拟内层SSH已断开、回到本机shell的面板"""
+    
+    def __init__(self):
+        super().__init__("fake")
+        self.screen = []
+        self.connected = False
+        self.remote_commands = []
+    
+    @property
+    def current_host(self):
+        return "remotebox" if self.connected else socket.gethostname()
+    
+    async def _send_literal(self, text):
+        token = re.search(r"__CB_[0-9a-f]+", text)
+        if text.startswith("ssh "):
+            self.connected = True
+        elif "_HOST_" in text:
+            self.screen.append(f"{token.group(0)}_HOST_{self.current_host}")
+        elif "_DONE" in text:
+            token = token.group(0)
+            if not self.connected:
+                self.screen.append(f"{token}_H_{self.current_host}")
+            else:
+                self.remote_commands.append(text)
+                self.screen += [f"{token}_S_0_1", "ok", f"{token}_E_0_0_2"]
+            self.screen.append(f"{token}_DONE {self.current_host} /root")
+        return 0, ""
+    
+    async def _send_keys(self, *keys):
+        return 0
+    
+    async def get_position(self):
+        return {"line": 0, "history_size": 0, "history_limit": 2000}
+    
+    async def capture_since(self, position, join_lines=True):
+        return "\n".join(self.screen)
+    
+    async def capture_output(self, lines=100, join_lines=False, start=None):
+        return "\n".join(self.screen)
+
+
+class TestReconnect:
+    """内层SSH断开后的自动重连测试"""
+    
+    def test_host_guard_wraps_script(self):
+        token = "__CB_test"
+        script = TmuxSession._build_batch_script(["ls"], token, True, None, "[ x = y ]")
+        
+        assert script.startswith("if [ x = y ]; then ")
+        assert "'%s_H_%s\\n'" in script
+    
+    @pytest.mark.asyncio
+    async def test_reconnect_and_rerun(self):
+        pane = DroppedPane()
+        pane.configure_reconnect(["ssh user@remotebox"], "remotebox", timeout=2)
+        
+        result = await pane.run_command("make", poll_interval=0.01)
+        
+        assert result["status"] == "completed"
+        assert result["stdout"] == "ok"
+        assert result["reconnected"] is True
+        # 断开期间命令没有在本机执行，重连后只执行了一次
+        assert len(pane.remote_commands) == 1
+        assert pane.host == "remotebox"
+        assert pane.reconnects == 1
+    
+    def test_connection_lost_only_checks_stalled_output(self):
+        pane = TmuxSession("cb-test", "main")
+        
+        # 命令正常结束时输出中的断开提示只是普通输出
+        finished = {"stdout": "BrokenPipeError: [Errno 32] Broken pipe", "timed_out": False}
+        assert not pane._connection_lost(finished)
+        
+        stalled = {"stdout": "building...\nConnection to remotebox closed.", "timed_out": True, "recovered": True}
+        assert pane._connection_lost(stalled)
+        
+        earlier = {"stdout": "Connection closed by 10.0.0.1\n" + "line\n" * 10, "timed_out": True, "recovered": True}
+        assert not pane._connection_lost(earlier)